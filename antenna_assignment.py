@@ -0,0 +1,308 @@
+from collections import deque
+
+import numpy as np
+import tabulate
+
+ROOT = 'Kerbin'
+
+
+def edge_disjoint_paths(adjacency, source, sink, limit):
+    '''
+    Number of edge-disjoint paths between source and sink in an undirected
+    graph given as a dict of neighbour sets, stopping at limit.
+    Plain augmenting paths with BFS, every edge has capacity one.
+    '''
+    flow = {}
+    paths = 0
+    while paths < limit:
+        parent = {source: None}
+        queue = deque([source])
+        while queue and sink not in parent:
+            u = queue.popleft()
+            for v in adjacency[u]:
+                if v not in parent and flow.get((u, v), 0) < 1:
+                    parent[v] = u
+                    queue.append(v)
+        if sink not in parent:
+            break
+        v = sink
+        while parent[v] is not None:
+            u = parent[v]
+            flow[(u, v)] = flow.get((u, v), 0) + 1
+            flow[(v, u)] = flow.get((v, u), 0) - 1
+            v = u
+        paths += 1
+    return paths
+
+
+class AntennaAssignment():
+    '''
+    Chooses RemoteTech dish targets for a constellation.
+
+    Each link between two vessels uses one dish on each end, a link to
+    Kerbin uses one dish. Links are only placed where feasible (range and
+    line of sight, e.g. from connectivity.LinkGraph). The solver adds links
+    in rounds so that every vessel first gets one, then up to k
+    edge-disjoint paths to Kerbin. Each round grows outward from vessels
+    that already have paths, preferring partners that are well connected,
+    close to the ground and have free dishes. Required links are placed
+    first and current links that close are kept when keep_existing is set.
+
+    Links are scored by the paths summed over all vessels, each capped at
+    k: a link is only placed if that sum grows. The rounds run twice,
+    linking Kerbin before or after other vessels, and the better result
+    is kept. Going to a neighbour first saves the ground dish to close a
+    loop later, e.g. three satellites with two dishes each.
+
+    nodes       vessel keys in matrix order, e.g. DataFrame row positions;
+                names are not unique within a constellation
+    slots       number of assignable dishes per vessel
+    feasible    (n, n) bool, vessel to vessel links that can close
+    ground      (n,) bool, vessels that can link to Kerbin directly
+    required    list of (node, target) links that must exist
+    current     dict node -> list of current dish targets, None if unset
+    labels      display names per node, only used for printing
+    '''
+    def __init__(self, nodes, slots, feasible, ground, required=None, current=None,
+                 k=2, keep_existing=True, labels=None):
+        self.nodes = list(nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self.labels = [str(n) for n in self.nodes] if labels is None else list(labels)
+        self.slots = np.asarray(slots, dtype=int)
+        self.feasible = np.asarray(feasible, dtype=bool)
+        self.ground = np.asarray(ground, dtype=bool)
+        self.required = required or []
+        self.current = current or {}
+        self.k = k
+        self.keep_existing = keep_existing
+
+        self.adjacency = {node: set() for node in self.nodes + [ROOT]}
+        self.used = np.zeros(len(self.nodes), dtype=int)
+
+    def can_link(self, a, b):
+        if b in self.adjacency[a]:
+            return False
+        i = self.index[a]
+        if self.used[i] >= self.slots[i]:
+            return False
+        if b == ROOT:
+            return bool(self.ground[i])
+        j = self.index.get(b)
+        if j is None:
+            # target outside the constellation, only this end needs a dish
+            return True
+        return bool(self.feasible[i, j]) and self.used[j] < self.slots[j]
+
+    def link(self, a, b):
+        self.adjacency[a].add(b)
+        self.adjacency.setdefault(b, set()).add(a)
+        self.used[self.index[a]] += 1
+        if b in self.index:
+            self.used[self.index[b]] += 1
+
+    def unlink(self, a, b):
+        self.adjacency[a].discard(b)
+        self.adjacency[b].discard(a)
+        self.used[self.index[a]] -= 1
+        if b in self.index:
+            self.used[self.index[b]] -= 1
+
+    def try_link(self, a, b, connectivity):
+        '''
+        Links a and b if that grows the paths summed over all vessels.
+        Both ends and every vessel that reaches them without passing
+        Kerbin can gain a path, those still below k are counted again.
+        Returns the updated connectivity (capped at k), or None if the link
+        gained nothing and was not kept.
+        '''
+        self.link(a, b)
+        check = np.array(sorted(self.index[n] for n in self.component(a)
+                                if n in self.index and connectivity[self.index[n]] < self.k), dtype=int)
+        counts = np.array([edge_disjoint_paths(self.adjacency, self.nodes[i], ROOT, self.k) for i in check],
+                          dtype=int)
+        if not len(check) or (counts <= connectivity[check]).all():
+            self.unlink(a, b)
+            return None
+        connectivity = connectivity.copy()
+        connectivity[check] = counts
+        return connectivity
+
+    def component(self, start):
+        ''' Nodes reachable from start over vessel links, Kerbin is not crossed '''
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            u = queue.popleft()
+            for v in self.adjacency[u]:
+                if v not in seen and v != ROOT:
+                    seen.add(v)
+                    queue.append(v)
+        return seen
+
+    def hops(self):
+        ''' BFS distance to Kerbin over the current links '''
+        distance = {ROOT: 0}
+        queue = deque([ROOT])
+        while queue:
+            u = queue.popleft()
+            for v in self.adjacency[u]:
+                if v not in distance:
+                    distance[v] = distance[u] + 1
+                    queue.append(v)
+        return distance
+
+    def connectivity(self, limit=None):
+        ''' Edge-disjoint paths to Kerbin per vessel, capped at limit (default k) '''
+        limit = self.k if limit is None else limit
+        return np.array([edge_disjoint_paths(self.adjacency, node, ROOT, limit) for node in self.nodes], dtype=int)
+
+    def score(self):
+        ''' Paths to Kerbin summed over all vessels, each capped at k '''
+        return int(self.connectivity().sum())
+
+    def state(self):
+        return {node: set(targets) for node, targets in self.adjacency.items()}, self.used.copy()
+
+    def restore(self, state):
+        adjacency, used = state
+        self.adjacency = {node: set(targets) for node, targets in adjacency.items()}
+        self.used = used.copy()
+
+    def solve(self):
+        ''' Returns dict node -> list of dish targets, Kerbin first '''
+        for a, b in self.required:
+            if self.can_link(a, b):
+                self.link(a, b)
+            else:
+                print(f'AntennaAssignment: required link {self.label(a)} -> {self.label(b)} not possible')
+
+        if self.keep_existing:
+            # keep links that already close: both ends point at each other
+            for a, targets in self.current.items():
+                for b in targets:
+                    if b is None:
+                        continue
+                    closes = b == ROOT or b not in self.index or a in self.current.get(b, [])
+                    if a in self.index and closes and self.can_link(a, b):
+                        self.link(a, b)
+
+        start = self.state()
+        best = None
+        for ground_first in (True, False):
+            self.restore(start)
+            self.grow(ground_first)
+            self.repair()
+            score = self.score()
+            if best is None or score > best[0]:
+                best = (score, self.state())
+        self.restore(best[1])
+        return self.assignment()
+
+    def grow(self, ground_first=True):
+        '''
+        Rounds of links per level, Kerbin is tried before (ground_first)
+        or after the vessel partners
+        '''
+        for level in range(1, self.k + 1):
+            # grow outward from vessels that already have enough paths until nothing changes
+            changed = True
+            while changed:
+                changed = False
+                # other vessels can gain paths through a new link too
+                connectivity = self.connectivity()
+                hops = self.hops()
+                # vessels with few options first
+                order = np.argsort(self.feasible.sum(axis=1) + self.ground * len(self.nodes), kind='stable')
+                for i in order:
+                    node = self.nodes[i]
+                    if connectivity[i] >= level or self.used[i] >= self.slots[i]:
+                        continue
+                    candidates = [self.nodes[j] for j in np.flatnonzero(self.feasible[i])
+                                  if connectivity[j] >= level - 1 and connectivity[j] > 0
+                                  and self.can_link(node, self.nodes[j])]
+                    # best connected, then closest to the ground, then most free dishes
+                    candidates.sort(key=lambda c: (
+                        connectivity[self.index[c]],
+                        -hops.get(c, len(self.nodes)),
+                        self.slots[self.index[c]] - self.used[self.index[c]]), reverse=True)
+                    if self.can_link(node, ROOT):
+                        candidates.insert(0 if ground_first else len(candidates), ROOT)
+                    for partner in candidates:
+                        linked = self.try_link(node, partner, connectivity)
+                        if linked is not None:
+                            connectivity = linked
+                            changed = True
+                            break
+
+    def repair(self):
+        '''
+        The rounds never drop a link, so a vessel that linked early can be
+        stuck below k when its partners have no dishes left. Such vessels
+        with a free dish try swapping one of their links for new ones, the
+        swap is kept if no vessel loses a path and the paths summed over
+        all vessels (capped at k) grow.
+        '''
+        required = [{a, b} for a, b in self.required]
+        connectivity = self.connectivity()
+        for i in np.flatnonzero((connectivity < self.k) & (self.used < self.slots)):
+            node = self.nodes[i]
+            for old in list(self.adjacency[node]):
+                if {node, old} in required or connectivity[i] >= self.k:
+                    continue
+                # only vessels that reach one of the ends can lose a path
+                check = np.array(sorted(self.index[n] for n in self.component(node) if n in self.index), dtype=int)
+                self.unlink(node, old)
+                trial = connectivity.copy()
+                trial[check] = [edge_disjoint_paths(self.adjacency, self.nodes[j], ROOT, self.k) for j in check]
+                added = []
+                for partner in [ROOT] + [self.nodes[j] for j in np.flatnonzero(self.feasible[i])]:
+                    if partner != old and self.can_link(node, partner):
+                        linked = self.try_link(node, partner, trial)
+                        if linked is not None:
+                            trial = linked
+                            added.append(partner)
+                if (trial >= connectivity).all() and trial.sum() > connectivity.sum():
+                    connectivity = trial
+                    continue
+                for partner in added:
+                    self.unlink(node, partner)
+                self.link(node, old)
+
+    def label(self, target):
+        if target == ROOT:
+            return ROOT
+        if target in self.index:
+            return self.labels[self.index[target]]
+        return getattr(target, 'name', str(target))
+
+    def assignment(self):
+        result = {}
+        for node in self.nodes:
+            result[node] = sorted(self.adjacency[node], key=lambda t: (t != ROOT, self.index.get(t, len(self.nodes))))
+        return result
+
+    def changes(self, assignment=None):
+        '''
+        Dish slots whose target differs from current, as
+        (node, slot, old target, new target). Targets already set on some
+        dish of the vessel are kept in place.
+        '''
+        assignment = self.assignment() if assignment is None else assignment
+        changed = []
+        for node, targets in assignment.items():
+            current = list(self.current.get(node, []))
+            current += [None] * (self.slots[self.index[node]] - len(current))
+            wanted = [t for t in targets if t not in current]
+            for slot, old in enumerate(current):
+                if old in targets:
+                    continue
+                new = wanted.pop(0) if wanted else None
+                if new != old and new is not None:
+                    changed.append((node, slot, old, new))
+        return changed
+
+    def print_assignment(self):
+        connectivity = self.connectivity()
+        rows = [[node, self.labels[i], connectivity[i], ', '.join(self.label(t) for t in self.assignment()[node])]
+                for i, node in enumerate(self.nodes)]
+        print(tabulate.tabulate(rows, headers=['Node', 'Vessel', 'Paths to Kerbin', 'Targets'], tablefmt='fancy_grid'))
@@ -0,0 +1,145 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import tabulate
+
+from utils.ascent_sim import AscentPlant, simulate_ascent
+
+
+def _evaluate_chunk(args):
+    ''' Process pool worker, simulates one chunk of ascent profiles '''
+    plant, profiles, kwargs = args
+    result = simulate_ascent(plant,
+                             turn_start_altitude=profiles[:, 0],
+                             turn_end_altitude=profiles[:, 1],
+                             max_q=profiles[:, 2],
+                             end_stage=profiles[:, 3],
+                             **kwargs)
+    return result['dv_spent'] + result['dv_circularize'], result['reached_target']
+
+
+class AscentOptimizer():
+    '''
+    Offline search for the LaunchManager ascent parameters that reach
+    target_altitude with the least delta v (ascent plus circularization).
+
+    The vessel is described by an AscentPlant, see utils.ascent_sim.
+    Evaluated points are memoized, so refining or re-running with an
+    overlapping search space only simulates new profiles.
+
+    opt = AscentOptimizer(plant, target_altitude=150000)
+    profile = opt.optimize()
+    LaunchManager(**profile)
+    '''
+    def __init__(self, plant, target_altitude=150000, roll=90, inclination=0,
+                 turn_start_range=(500, 20000), turn_end_range=(20000, 150000),
+                 max_q_range=(10000, 60000), end_stages=None,
+                 pid_gains=(.001, 0.0001, 0.01), dt=0.2, max_time=600., processes=0):
+        self.plant = plant
+        self.target_altitude = target_altitude
+        # roll and inclination do not change the planar ascent, they are passed through
+        self.roll = roll
+        self.inclination = inclination
+
+        self.ranges = np.array([turn_start_range, turn_end_range, max_q_range], dtype=float)
+        # resolution used for memoization keys
+        self.resolution = np.array([100., 500., 500.])
+        if end_stages is None:
+            end_stages = [int(plant.stage_number[-1]) - 1]
+        self.end_stages = list(end_stages)
+
+        P, I, D = pid_gains
+        self.sim_kwargs = {
+            'kp': P, 'ki': I, 'kd': D,
+            'target_altitude': target_altitude,
+            'dt': dt,
+            'max_time': max_time,
+        }
+        self.processes = processes or os.cpu_count()
+        self.cache = {}
+
+    def quantize(self, profiles):
+        profiles = profiles.copy()
+        profiles[:, :3] = np.round(profiles[:, :3] / self.resolution) * self.resolution
+        return profiles
+
+    def evaluate(self, profiles, pool=None):
+        '''
+        Returns total delta v for every profile row
+        (turn_start_altitude, turn_end_altitude, max_q, end_stage),
+        inf where the target is not reached. Only uncached rows are simulated.
+        '''
+        profiles = self.quantize(np.asarray(profiles, dtype=float))
+        keys = [tuple(p) for p in profiles]
+        todo = np.array([p for k, p in dict(zip(keys, profiles)).items() if k not in self.cache])
+
+        if len(todo):
+            todo = todo[todo[:, 0] < todo[:, 1]]
+        if len(todo):
+            chunks = [c for c in np.array_split(todo, self.processes) if len(c)]
+            jobs = [(self.plant, c, self.sim_kwargs) for c in chunks]
+            results = pool.map(_evaluate_chunk, jobs) if pool is not None else map(_evaluate_chunk, jobs)
+            for chunk, (dv, reached) in zip(chunks, results):
+                for p, d, ok in zip(chunk, dv, reached):
+                    self.cache[tuple(p)] = d if ok else np.inf
+
+        return np.array([self.cache.get(k, np.inf) for k in keys])
+
+    def grid(self, ranges, points):
+        axes = [np.linspace(lo, hi, points) for lo, hi in ranges]
+        mesh = np.meshgrid(*axes, self.end_stages, indexing='ij')
+        return np.stack([m.ravel() for m in mesh], axis=1)
+
+    def optimize(self, points=8, refine_points=5, rounds=4):
+        '''
+        Coarse grid over the search ranges followed by rounds of
+        finer grids around the best profile so far.
+        Returns the best profile as LaunchManager keyword arguments.
+        '''
+        start = time.time()
+        ranges = self.ranges.copy()
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            profiles = self.grid(ranges, points)
+            dv = self.evaluate(profiles, pool)
+            best, best_dv = profiles[np.argmin(dv)], dv.min()
+
+            for _ in range(rounds):
+                if not np.isfinite(best_dv):
+                    break
+                span = (ranges[:, 1] - ranges[:, 0]) / (points - 1)
+                ranges = np.stack([np.maximum(best[:3] - span, self.ranges[:, 0]),
+                                   np.minimum(best[:3] + span, self.ranges[:, 1])], axis=1)
+                points = refine_points
+                profiles = self.grid(ranges, points)
+                dv = self.evaluate(profiles, pool)
+                if dv.min() < best_dv:
+                    best, best_dv = profiles[np.argmin(dv)], dv.min()
+
+        print(f'AscentOptimizer: {len(self.cache)} profiles evaluated in {time.time() - start:.2f} s')
+        if not np.isfinite(best_dv):
+            print('AscentOptimizer: no profile reached the target altitude')
+            return None
+
+        best = self.quantize(best[None, :])[0]
+        self.best_dv = best_dv
+        return {
+            'target_altitude': self.target_altitude,
+            'turn_start_altitude': float(best[0]),
+            'turn_end_altitude': float(best[1]),
+            'max_q': float(best[2]),
+            'end_stage': int(best[3]),
+            'roll': self.roll,
+            'inclination': self.inclination,
+        }
+
+    def results_df(self):
+        ''' Returns all evaluated profiles, best first '''
+        df = pd.DataFrame([(*k, v) for k, v in self.cache.items()],
+                          columns=['turn_start_altitude', 'turn_end_altitude', 'max_q', 'end_stage', 'delta_v'])
+        return df.sort_values(by='delta_v').reset_index(drop=True)
+
+    def print_results(self, n=10):
+        print(tabulate.tabulate(self.results_df().head(n), headers='keys', tablefmt='fancy_grid'))
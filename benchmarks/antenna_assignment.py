@@ -0,0 +1,69 @@
+'''
+AntennaAssignment on small constellations and a random relay field.
+
+The constellations share one vessel name like ComSat_Network finds them,
+every satellite sees the others and the ground. The field is --relays
+vessels scattered on a plane with a fixed link range and one to three
+dishes each, the ones near one edge see the ground. For every case the
+solver's links are checked: no vessel uses more dishes than it has and
+every link is listed on both ends. The constellations have to reach their
+best possible paths to Kerbin, e.g. three satellites with two dishes each
+close a ring over the ground and all get two.
+
+python benchmarks/antenna_assignment.py --relays 300
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from antenna_assignment import AntennaAssignment
+
+
+def constellation(n, dishes, k):
+    return AntennaAssignment(range(n), [dishes] * n, ~np.eye(n, dtype=bool), np.ones(n, dtype=bool),
+                             k=k, labels=['ComSat'] * n)
+
+
+def field(n, link_range=1.5, seed=0):
+    rng = np.random.default_rng(seed)
+    position = rng.uniform(0, 10, (n, 2))
+    distance = np.linalg.norm(position[:, None] - position[None], axis=-1)
+    feasible = (distance < link_range) & ~np.eye(n, dtype=bool)
+    return rng.integers(1, 4, n), feasible, position[:, 0] < 1
+
+
+def check(name, solver, expected=None):
+    start = time.perf_counter()
+    assignment = solver.solve()
+    elapsed = time.perf_counter() - start
+    paths = solver.connectivity()
+    print(f'{name:36s} {elapsed * 1e3:8.1f} ms  paths per vessel {np.bincount(paths, minlength=solver.k + 1)}'
+          f'  score {paths.sum()}')
+    if expected is not None:
+        assert (paths >= expected).all(), (name, paths)
+    assert all(len(assignment[node]) <= solver.slots[i] for i, node in enumerate(solver.nodes)), name
+    # every link is listed on both ends
+    assert all(node in assignment[t] for node, targets in assignment.items() for t in targets if t in assignment)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--relays', type=int, default=300)
+    args = parser.parse_args()
+
+    # (satellites, dishes, k, paths every satellite reaches)
+    for n, dishes, k, expected in [(3, 3, 2, 2), (3, 2, 2, 2), (3, 1, 2, 1), (4, 3, 2, 2), (6, 3, 2, 2),
+                                   (6, 4, 3, 3)]:
+        check(f'{n} satellites, {dishes} dishes, k={k}', constellation(n, dishes, k), expected)
+    for k in (1, 2, 3):
+        slots, feasible, ground = field(args.relays)
+        check(f'{args.relays} relays, k={k}', AntennaAssignment(range(args.relays), slots, feasible, ground, k=k))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+'''
+RPCs and time saved by the session body catalogue, needs a running
+kRPC server with a vessel on the pad or in flight.
+
+Compares reading the constants of every body one property at a time
+with BodyCatalogue's batched load, and the per tick reads of the launch
+loop (atmosphere depth in staging, mu and surface gravity in the
+circularization burn) through vessel.orbit.body against the catalogue.
+
+python benchmarks/body_constants.py --ticks 200
+'''
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import krpc
+
+from bodies import FIELDS, BodyCatalogue
+from utils.rpc_profiler import profiler
+
+
+def measure(name, func, repeat=1):
+    profiler.reset()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    df = profiler.summary(by='procedure')
+    calls = int(df['calls'].sum()) if len(df) else 0
+    print(f'{name:42s} {calls:6d} requests  {elapsed * 1e3:9.1f} ms')
+    return calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ticks', type=int, default=200)
+    args = parser.parse_args()
+
+    profiler.enable()
+    conn = krpc.connect(name='body constants benchmark')
+    vessel = conn.space_center.active_vessel
+
+    def one_by_one():
+        for body in conn.space_center.bodies.values():
+            for field in FIELDS:
+                getattr(body, field)
+            orbit = body.orbit
+            if orbit is not None:
+                orbit.body.name
+
+    catalogue = None
+
+    def batched():
+        nonlocal catalogue
+        catalogue = BodyCatalogue(conn)
+
+    print('body constants of the whole system')
+    measure('one property per request', one_by_one)
+    measure('BodyCatalogue, batched', batched)
+
+    body = catalogue[vessel.orbit.body.name]
+
+    def tick_rpc():
+        vessel.orbit.body.atmosphere_depth
+        vessel.orbit.body.gravitational_parameter
+        vessel.orbit.body.surface_gravity
+
+    def tick_cached():
+        body.atmosphere_depth
+        body.gravitational_parameter
+        body.surface_gravity
+
+    print(f'launch loop constants, {args.ticks} ticks')
+    before, _ = measure('vessel.orbit.body.*', tick_rpc, args.ticks)
+    after, _ = measure('catalogue', tick_cached, args.ticks)
+    print(f'saved {(before - after) / args.ticks:.0f} requests per tick')
+
+    profiler.disable()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+'''
+Refresh time and memory of the typed FleetTable against the object frames
+of VesselManager(orbit_flag=True), whose cells hold stream handles that
+every consumer evaluates with df.apply(lambda x: x.apply(...)).
+
+Streams are stand ins returning a cached value like a kRPC stream does,
+so only the Python and pandas side is measured, no server is needed.
+
+python benchmarks/fleet_table.py --vessels 500 --repeat 50
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet_table import FleetTable
+from vessels import VesselManager
+
+
+class Stream():
+    def __init__(self, func, *args):
+        self.value = func(*args)
+
+    def __call__(self):
+        return self.value
+
+    def remove(self):
+        pass
+
+
+class Body():
+    name = 'Kerbin'
+
+
+class Orbit():
+    def __init__(self, rng):
+        self.body = Body()
+        self.eccentricity = rng.random() * 0.1
+        self.inclination = rng.random()
+        self.semi_major_axis = 7e5 + rng.random() * 2e6
+        self.longitude_of_ascending_node = rng.random() * 6
+        self.argument_of_periapsis = rng.random() * 6
+        self.true_anomaly = rng.random() * 6
+        self.apoapsis_altitude = self.semi_major_axis * 1.05 - 6e5
+        self.periapsis_altitude = self.semi_major_axis * 0.95 - 6e5
+        self.period = 3600 * rng.random()
+        self.time_to_apoapsis = 0.
+        self.time_to_periapsis = 0.
+
+
+class Vessel():
+    def __init__(self, i, rng):
+        self.name = f'ComSat {i % 50}'
+        self.orbit = Orbit(rng)
+
+
+class SpaceCenter():
+    def __init__(self, vessels):
+        self.vessels = vessels
+
+
+class Connection():
+    def __init__(self, vessels):
+        self.space_center = SpaceCenter(vessels)
+        self.mech_jeb = None
+
+    def add_stream(self, func, *args):
+        return Stream(func, *args)
+
+
+def dtypes(df):
+    counts = df.reset_index().dtypes.astype(str).value_counts()
+    return ' '.join(f'{t}:{n}' for t, n in counts.items())
+
+
+def best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vessels', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    conn = Connection([Vessel(i, rng) for i in range(args.vessels)])
+
+    manager = VesselManager(vessel_list=conn.space_center.vessels, orbit_flag=True, conn=conn)
+    evaluate = lambda: manager.df.apply(lambda x: x.apply(lambda y: y() if callable(y) else y))
+    evaluated = evaluate()
+    table = FleetTable(conn.space_center.vessels, conn=conn)
+
+    rows = [
+        ('object frame, apply(apply)', best(evaluate, args.repeat),
+         manager.df.memory_usage(deep=True).sum(), evaluated.memory_usage(deep=True).sum(),
+         dtypes(evaluated)),
+        ('FleetTable.refresh', best(table.refresh, args.repeat),
+         None, table.df.memory_usage(deep=True).sum(), dtypes(table.df)),
+    ]
+    print(f'{args.vessels} vessels, {len(table.columns)} numeric columns, best/median of {args.repeat}')
+    for name, (fastest, median), handles, data, objects in rows:
+        handles = '-' if handles is None else f'{handles / 1e3:.0f} kB'
+        print(f'{name:28s} refresh {fastest * 1e3:7.2f} / {median * 1e3:7.2f} ms   '
+              f'frame with handles {handles:>8s}   data {data / 1e3:6.0f} kB   dtypes incl. index {objects}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+'''
+Throughput of the local reference frame math in utils.frames and, with
+--server, its accuracy against kRPC's own transforms.
+
+The server check snapshots the active vessel's frame and its body's
+rotating frame relative to the body's non-rotating frame in one batch,
+converts random vectors locally and through transform_position /
+transform_direction, and repeats the comparison after --wait seconds to
+check propagation of the body's spin.
+
+python benchmarks/frames.py --vectors 100000
+python benchmarks/frames.py --server --samples 200 --wait 5
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frames import Frame, angle_between, transform_direction, transform_position
+
+
+def best(func, repeat=20):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def throughput(n):
+    rng = np.random.default_rng(0)
+    q = rng.normal(size=(2, 4))
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    source = Frame(rng.normal(size=3) * 1e6, q[0], velocity=rng.normal(size=3), angular_velocity=(0, 2.9e-4, 0))
+    target = Frame(rng.normal(size=3) * 1e6, q[1])
+    vectors = rng.normal(size=(n, 3)) * 1e5
+    other = rng.normal(size=(n, 3))
+
+    print(f'{n} vectors')
+    for name, func in [
+        ('transform_position', lambda: transform_position(vectors, source, target)),
+        ('transform_position, propagated', lambda: transform_position(vectors, source, target, ut=3600.)),
+        ('transform_direction', lambda: transform_direction(vectors, source, target)),
+        ('angle_between', lambda: angle_between(vectors, other)),
+    ]:
+        seconds = best(func)
+        print(f'{name:32s} {n / seconds / 1e3:10.0f} per ms')
+
+
+def server(samples, wait):
+    import krpc
+    from utils.frames import snapshot_frames
+
+    conn = krpc.connect(name='frames benchmark')
+    sc = conn.space_center
+    vessel = sc.active_vessel
+    body = vessel.orbit.body
+    base = body.non_rotating_reference_frame
+    kinds = {'vessel': vessel.reference_frame, 'body': body.reference_frame}
+
+    frames = snapshot_frames(conn, base, kinds)
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(samples, 3)) * 1e5
+
+    def compare(ut=None):
+        errors = {}
+        start = time.perf_counter()
+        for name, frame in kinds.items():
+            local_p = transform_position(vectors, frames[name], frames['base'], ut)
+            local_d = transform_direction(vectors, frames[name], frames['base'], ut)
+            remote_p = np.array([sc.transform_position(tuple(v), frame, base) for v in vectors])
+            remote_d = np.array([sc.transform_direction(tuple(v), frame, base) for v in vectors])
+            errors[name] = (np.abs(local_p - remote_p).max(), np.degrees(angle_between(local_d, remote_d)).max())
+        rpc = (time.perf_counter() - start) / (4 * samples)
+        return errors, rpc
+
+    errors, rpc = compare()
+    print(f'at the snapshot, kRPC takes {rpc * 1e3:.2f} ms per transform')
+    for name, (position, direction) in errors.items():
+        print(f'{name:8s} position error {position:.3e} m, direction error {direction:.3e} deg')
+
+    time.sleep(wait)
+    # the vessel frame moves on its own, only the body spin is propagated exactly
+    errors, _ = compare(sc.ut)
+    print(f'{wait} s later, body frame propagated locally')
+    position, direction = errors['body']
+    print(f'body     position error {position:.3e} m, direction error {direction:.3e} deg')
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vectors', type=int, default=100000)
+    parser.add_argument('--server', action='store_true')
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--wait', type=float, default=5.)
+    args = parser.parse_args()
+    throughput(args.vectors)
+    if args.server:
+        server(args.samples, args.wait)
+
+
+if __name__ == '__main__':
+    main()
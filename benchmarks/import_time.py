@@ -0,0 +1,67 @@
+'''
+Import time budget for the headless entry points.
+
+Every module is imported in a fresh interpreter a few times, the median
+wall time is compared with its budget and the modules that must stay
+unloaded (GUI and plotting, or anything lazy that got touched) are
+checked. Exits non-zero if a budget is exceeded.
+
+python benchmarks/import_time.py
+'''
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds, median of fresh interpreter imports
+BUDGET = {
+    'mission': 0.05,
+    'nodes': 0.25,
+    'vessels': 0.25,
+    'orbits': 0.25,
+    'launch': 0.25,
+    'comsat_network': 0.25,
+    'communications': 0.25,
+    'network_monitor': 0.25,
+}
+
+# must not be executed by importing any of the modules above
+FORBIDDEN = ['bokeh', 'matplotlib', 'apscheduler', 'pandas', 'numpy', 'scipy']
+
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {forbidden!r} if m in sys.modules]
+print(elapsed, ','.join(loaded))
+'''
+
+
+def measure(module, runs=5):
+    times, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module, forbidden=FORBIDDEN)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        if len(out) > 1:
+            loaded.update(out[1].split(','))
+    return statistics.median(times), sorted(loaded)
+
+
+def main():
+    failed = False
+    print(f'{"module":<18}{"median":>10}{"budget":>10}  loaded')
+    for module, budget in BUDGET.items():
+        elapsed, loaded = measure(module)
+        ok = elapsed <= budget and not loaded
+        failed |= not ok
+        print(f'{module:<18}{elapsed * 1e3:>8.1f}ms{budget * 1e3:>8.0f}ms  '
+              f'{", ".join(loaded) or "-"}{"" if ok else "  OVER BUDGET"}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
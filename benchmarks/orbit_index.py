@@ -0,0 +1,107 @@
+'''
+OrbitIndex queries against masking the snapshot DataFrame.
+
+A synthetic FleetTable-like snapshot (categorical name and body, orbit
+columns in radians and metres, int64 vessel_id index) with constellations
+in shared planes and random traffic around three bodies. Every query is
+checked against the equivalent pandas mask and timed, median of --repeat.
+
+python benchmarks/orbit_index.py --vessels 5000
+'''
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orbit_index import OrbitIndex
+from utils.kepler import orbit_normal
+
+RADIUS = {'Kerbin': 600000., 'Mun': 200000., 'Minmus': 60000.}
+
+
+def snapshot(n, seed=0):
+    rng = np.random.default_rng(seed)
+    body = rng.choice(list(RADIUS), n, p=[0.8, 0.12, 0.08])
+    radius = np.array([RADIUS[b] for b in body])
+    sma = radius + rng.uniform(70e3, 5000e3, n)
+    e = rng.uniform(0, 0.2, n)
+    inclination = rng.uniform(0, np.pi, n)
+    raan = rng.uniform(0, 2 * np.pi, n)
+    # every tenth vessel belongs to one of 20 constellation planes
+    plane = rng.integers(0, 20, n)
+    member = np.arange(n) % 10 == 0
+    inclination[member] = np.radians(plane[member] * 9.)
+    raan[member] = np.radians(plane[member] * 18.)
+    df = pd.DataFrame({
+        'name': pd.Categorical([f'Vessel {i}' for i in range(n)]),
+        'body': pd.Categorical(body),
+        'eccentricity': e,
+        'inclination': inclination,
+        'semi_major_axis': sma,
+        'longitude_of_ascending_node': raan,
+        'apoapsis': sma * (1 + e) - radius,
+        'periapsis': sma * (1 - e) - radius,
+    }, index=pd.Index(np.arange(n, dtype='int64') * 3 + 7, name='vessel_id'))
+    return df
+
+
+def median(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vessels', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    df = snapshot(args.vessels)
+    build = median(lambda: OrbitIndex(df), 20)
+    index = OrbitIndex(df)
+    print(f'{args.vessels} vessels, index built in {build * 1e3:.2f} ms')
+
+    member = df.index[0]
+    normals = orbit_normal(df['inclination'].to_numpy(), df['longitude_of_ascending_node'].to_numpy())
+    own = normals[0]
+    deg = np.degrees
+    cases = [
+        ('Kerbin, 2000-3000 km altitude',
+         lambda: index.query('Kerbin', altitude=(2000e3, 3000e3)),
+         lambda: df[(df['body'] == 'Kerbin') & (df['periapsis'] >= 2000e3) & (df['apoapsis'] <= 3000e3)].index),
+        ('polar, any body',
+         lambda: index.polar(),
+         lambda: df[(deg(df['inclination']) >= 80) & (deg(df['inclination']) <= 100)].index),
+        ('Kerbin, RAAN 350-10 deg, sma < 1500 km',
+         lambda: index.query('Kerbin', raan=(350, 10), semi_major_axis=(None, 1500e3)),
+         lambda: df[(df['body'] == 'Kerbin') & ((deg(df['longitude_of_ascending_node']) >= 350)
+                                                | (deg(df['longitude_of_ascending_node']) <= 10))
+                    & (df['semi_major_axis'] <= 1500e3)].index),
+        ('Kerbin, RAAN 0-360 deg, polar',
+         lambda: index.query('Kerbin', raan=(0, 360), inclination=(80, 100)),
+         lambda: df[(df['body'] == 'Kerbin') & (deg(df['inclination']) >= 80)
+                    & (deg(df['inclination']) <= 100)].index),
+        ('coplanar with a constellation member, 1 deg',
+         lambda: index.coplanar(member, tolerance=1.),
+         lambda: df[(df['body'] == df['body'].iloc[0]).to_numpy()
+                    & (normals @ own >= np.cos(np.radians(1.)))].index),
+    ]
+    print(f'{"query":46s} {"found":>6s} {"index":>10s} {"pandas":>10s}')
+    for name, indexed, masked in cases:
+        assert set(indexed()) == set(masked()), name
+        t_index = median(indexed, args.repeat)
+        t_pandas = median(masked, max(args.repeat // 10, 5))
+        print(f'{name:46s} {len(indexed()):6d} {t_index * 1e6:8.1f} us {t_pandas * 1e6:8.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+'''
+Cold versus warm startup with the on-disk static cache.
+
+Each run is a fresh interpreter so no session cache survives: cold runs
+start without a cache file, warm runs reuse the one the cold run wrote.
+Measured are ComSatNetwork.init_existing_network and
+Communication.init_existing_network + display_network_info against a
+running kRPC server, requests counted with the RPC profiler and the two
+second vessel switch sleeps left out of the wall time.
+
+--offline skips the server and only times reading a cache file of
+realistic size, the part that has to stay in the millisecond range.
+
+python benchmarks/static_cache.py --constellation ComSat
+python benchmarks/static_cache.py --offline
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CASES = ['comsat_network', 'communications']
+
+RUN = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+from utils.rpc_profiler import profiler
+profiler.enable(sleep=True)
+start = time.perf_counter()
+if {case!r} == 'comsat_network':
+    from comsat_network import ComSatNetwork
+    ComSatNetwork().init_existing_network({name!r})
+else:
+    from communications import Communication
+    com = Communication()
+    com.init_existing_network({name!r})
+    com.display_network_info()
+elapsed = time.perf_counter() - start
+df = profiler.summary(by='procedure')
+sleep = df.loc[df['procedure'] == 'time.sleep', 'total_ms'].sum() / 1e3
+print(json.dumps({{'seconds': elapsed - sleep, 'requests': int(df.loc[df['procedure'] != 'time.sleep', 'calls'].sum())}}))
+'''
+
+
+def run(case, name, cache_dir):
+    env = dict(os.environ, KSP_STUFF_CACHE=cache_dir)
+    out = subprocess.run([sys.executable, '-c', RUN.format(root=ROOT, case=case, name=name)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def online(name, repeat):
+    for case in CASES:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = run(case, name, cache_dir)
+            warm = [run(case, name, cache_dir) for _ in range(repeat)]
+        warm_seconds = sorted(w['seconds'] for w in warm)[len(warm) // 2]
+        print(f'{case:16s} cold {cold["seconds"] * 1e3:8.1f} ms {cold["requests"]:6d} requests   '
+              f'warm {warm_seconds * 1e3:8.1f} ms {warm[0]["requests"]:6d} requests')
+
+
+class Conn():
+    ''' Just enough of a client for the fingerprint '''
+    class krpc():
+        @staticmethod
+        def get_status():
+            return type('Status', (), {'version': 'offline'})
+
+    class space_center():
+        game_mode = 'sandbox'
+
+
+def offline(repeat):
+    import static_cache
+
+    bodies = {f'Body{i}': {'name': f'Body{i}', 'gravitational_parameter': 3.5e12, 'equatorial_radius': 6e5,
+                           'sphere_of_influence': 8.4e7, 'rotational_period': 21549.4, 'has_atmosphere': True,
+                           'atmosphere_depth': 7e4, 'surface_gravity': 9.81, 'parent': 'Sun'} for i in range(17)}
+    designs = {f'ComSat {i}': {'parts': 40, 'antennas': [(j, 'RTLongAntenna2', [(0, 'ModuleRTAntenna')])
+                                                          for j in range(4)]} for i in range(50)}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = static_cache.StaticCache(Conn(), directory=cache_dir)
+        cache.put('bodies', bodies)
+        cache.put('designs', designs)
+        cache.put('antenna_ranges', {'RTLongAntenna2': 5e6, 'RTGigaDish1': 4e10})
+        size = os.path.getsize(cache.path)
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            warm = static_cache.StaticCache(Conn(), directory=cache_dir)
+            times.append(time.perf_counter() - start)
+        assert warm.warm and warm.get('designs') == designs
+    times.sort()
+    print(f'cache file {size / 1e3:.1f} kB, load {times[len(times) // 2] * 1e3:.3f} ms median, '
+          f'{times[-1] * 1e3:.3f} ms max of {repeat}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--constellation', default='ComSat')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--offline', action='store_true')
+    args = parser.parse_args()
+    if args.offline:
+        offline(max(args.repeat, 100))
+    else:
+        online(args.constellation, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+'''
+End to end latency and CPU cost of the shared memory telemetry ring.
+
+A writer process publishes samples at a fixed rate, a reader process
+polls the ring like the Bokeh periodic callback would and measures the
+age of every record when it is first seen. Both report CPU time per
+sample.
+
+python benchmarks/telemetry_bus.py --rate 1000 --samples 20000
+'''
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry_bus import TelemetryRing
+
+
+def writer(name, samples, rate, results):
+    ring = TelemetryRing.attach(name)
+    period = 1 / rate
+    cpu = time.process_time()
+    busy = 0.
+    next_time = time.monotonic()
+    for i in range(samples):
+        start = time.perf_counter()
+        ring.publish(ut=float(i), met=float(i), altitude=i * 10.)
+        busy += time.perf_counter() - start
+        next_time += period
+        delay = next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    results['writer_cpu'] = time.process_time() - cpu
+    results['publish'] = busy / samples
+    ring.close()
+
+
+def reader(name, samples, poll, results):
+    ring = TelemetryRing.attach(name)
+    latencies = []
+    seen = 0
+    busy = 0.
+    cpu = time.process_time()
+    deadline = time.monotonic() + 60
+    while seen < samples and time.monotonic() < deadline:
+        start = time.perf_counter()
+        records = ring.read_new()
+        now = time.monotonic()
+        busy += time.perf_counter() - start
+        if len(records):
+            latencies.append(now - records['published'])
+            seen += len(records)
+        time.sleep(poll)
+    results['reader_cpu'] = time.process_time() - cpu
+    results['read'] = busy / max(seen, 1)
+    results['seen'] = seen
+    results['latency'] = np.concatenate(latencies) if latencies else np.empty(0)
+    ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--rate', type=float, default=1000)
+    parser.add_argument('--poll', type=float, default=0.001)
+    parser.add_argument('--capacity', type=int, default=4096)
+    args = parser.parse_args()
+
+    ring = TelemetryRing.create(args.capacity)
+    with multiprocessing.Manager() as manager:
+        results = manager.dict()
+        r = multiprocessing.Process(target=reader, args=(ring.name, args.samples, args.poll, results))
+        w = multiprocessing.Process(target=writer, args=(ring.name, args.samples, args.rate, results))
+        r.start()
+        w.start()
+        w.join()
+        r.join()
+        results = dict(results)
+    ring.close()
+
+    latency = results['latency'] * 1e3
+    print(f'{args.samples} samples at {args.rate:.0f} Hz, reader polling every {args.poll * 1e3:.1f} ms')
+    print(f'received       {results["seen"]} ({results["seen"] / args.samples:.1%})')
+    print(f'latency ms     p50 {np.percentile(latency, 50):.3f}  p99 {np.percentile(latency, 99):.3f}  '
+          f'max {latency.max():.3f}')
+    print(f'publish        {results["publish"] * 1e6:.2f} us/sample, writer CPU '
+          f'{results["writer_cpu"] / args.samples * 1e6:.2f} us/sample incl. pacing')
+    print(f'read           {results["read"] * 1e6:.2f} us/sample, reader CPU '
+          f'{results["reader_cpu"] / max(results["seen"], 1) * 1e6:.2f} us/sample incl. polling')
+
+
+if __name__ == '__main__':
+    main()
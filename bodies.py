@@ -0,0 +1,110 @@
+import collections
+import threading
+
+from utils.batch import batch_call
+
+BodyConstants = collections.namedtuple('BodyConstants', [
+    'name',
+    'gravitational_parameter',
+    'equatorial_radius',
+    'sphere_of_influence',
+    'rotational_period',
+    'has_atmosphere',
+    'atmosphere_depth',
+    'surface_gravity',
+    'parent',
+])
+
+# kRPC CelestialBody properties fetched for every body
+FIELDS = ['gravitational_parameter', 'equatorial_radius', 'sphere_of_influence', 'rotational_period',
+          'has_atmosphere', 'atmosphere_depth', 'surface_gravity']
+
+
+class BodyCatalogue():
+    '''
+    Constants of every celestial body on one server, they never change
+    during a session. Loading takes three requests for the whole system:
+    the body list, one batch with every constant and orbit of every body,
+    and one batch for the parents. With constants from the static cache
+    only the body list is fetched, orbits follow in one batch when needed.
+
+    catalogue = body_catalogue(conn)
+    catalogue['Kerbin'].gravitational_parameter
+    catalogue.object('Kerbin')      # the CelestialBody, e.g. for antenna targets
+    '''
+    def __init__(self, conn, constants=None):
+        self.conn = conn
+        self.objects = dict(conn.space_center.bodies)
+        self.orbits = None
+        # cached constants are only trusted for the same set of bodies
+        if constants is not None and set(constants) == set(self.objects):
+            self.bodies = {n: BodyConstants(**c) for n, c in constants.items()}
+            self.cached = True
+        else:
+            self.load()
+            self.cached = False
+
+    def load(self):
+        names = list(self.objects)
+        calls = [(getattr, self.objects[n], f) for n in names for f in FIELDS]
+        calls += [(getattr, self.objects[n], 'orbit') for n in names]
+        values = [None if isinstance(v, Exception) else v for v in batch_call(self.conn, calls)]
+
+        # the sun has no orbit
+        orbits = values[len(names) * len(FIELDS):]
+        self.orbits = {n: o for n, o in zip(names, orbits) if o is not None}
+        parents = batch_call(self.conn, [(getattr, o, 'body') for o in self.orbits.values()])
+        names_by_body = {body: name for name, body in self.objects.items()}
+        parent = {n: names_by_body.get(p) for n, p in zip(self.orbits, parents)}
+
+        self.bodies = {}
+        for i, name in enumerate(names):
+            constants = dict(zip(FIELDS, values[i * len(FIELDS):(i + 1) * len(FIELDS)]))
+            if not constants['has_atmosphere']:
+                constants['atmosphere_depth'] = 0.
+            self.bodies[name] = BodyConstants(name=name, parent=parent.get(name), **constants)
+
+    def orbit(self, name):
+        ''' Orbit object of a body, all of them in one batch on first use '''
+        if self.orbits is None:
+            names = [n for n, b in self.bodies.items() if b.parent is not None]
+            self.orbits = dict(zip(names, batch_call(self.conn, [(getattr, self.objects[n], 'orbit') for n in names])))
+        return self.orbits[name]
+
+    def __getitem__(self, name):
+        return self.bodies[name]
+
+    def __contains__(self, name):
+        return name in self.bodies
+
+    def __iter__(self):
+        return iter(self.bodies)
+
+    def object(self, name):
+        return self.objects[name]
+
+    def constants(self, name):
+        ''' Plain dict of a body, the form DeploymentPlanner and LinkGraph use '''
+        return self.bodies[name]._asdict()
+
+    def satellites(self, name):
+        return [n for n, b in self.bodies.items() if b.parent == name]
+
+
+_catalogues = {}
+_lock = threading.Lock()
+
+
+def body_catalogue(conn):
+    ''' The session catalogue of the server conn talks to, from the static cache or the server '''
+    rpc = conn._rpc_connection
+    key = (rpc._address, rpc._port)
+    with _lock:
+        if key not in _catalogues:
+            from static_cache import static_cache
+            cache = static_cache(conn)
+            catalogue = BodyCatalogue(conn, cache.get('bodies'))
+            if not catalogue.cached:
+                cache.put('bodies', {n: b._asdict() for n, b in catalogue.bodies.items()})
+            _catalogues[key] = catalogue
+        return _catalogues[key]
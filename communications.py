@@ -1,12 +1,17 @@
 import math
 import time
 import krpc
-import pandas as pd
-from tabulate import tabulate
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+tabulate = lazy_import('tabulate')
 
+from bodies import body_catalogue
+from static_cache import static_cache
 from orbits import OrbitManager
 from vessels import VesselManager
 
+ANTENNA_MODULES = ['ModuleRTAntenna', 'ModuleDeployableAntenna']
+
 class Communication:
     def __init__(self):
         self.conn = krpc.connect(name="ComSat_Network")
@@ -105,17 +110,49 @@ class Communication:
         else:
             return 'N/A'
 
-    def display_antenna_info(self, vessel):
+    def antenna_layout(self, vessel, name=None):
+        '''
+        Antenna parts of a vessel and their RT modules as
+        [(part, part name, [(module, module name), ...]), ...]. Which parts
+        and modules these are is kept per design (vessel name) in the static
+        cache. Vessels of the same name can differ (a carrier before and
+        after staging), so a changed part count or any cached antenna index
+        pointing at a part of another name triggers a rescan.
+        '''
+        from utils.batch import batch_call
+
+        cache = static_cache(self.conn)
+        name = vessel.name if name is None else name
+        parts = vessel.parts.all
+        design = cache.get('designs', name)
+        if design is not None and design['parts'] == len(parts):
+            names = batch_call(self.conn, [(getattr, parts[i], 'name') for i, _, _ in design['antennas']])
+            if any(found != part_name for found, (_, part_name, _) in zip(names, design['antennas'])):
+                design = None
+        if design is None or design['parts'] != len(parts):
+            design = {'parts': len(parts), 'antennas': []}
+            for i, part in enumerate(parts):
+                part_name = part.name
+                if 'Antenna' in part_name:
+                    modules = [(j, m.name) for j, m in enumerate(part.modules)]
+                    design['antennas'].append((i, part_name, [(j, m) for j, m in modules if m in ANTENNA_MODULES]))
+            cache.put('designs', design, key=name)
+
+        layout = []
+        for i, part_name, modules in design['antennas']:
+            part_modules = parts[i].modules
+            layout.append((parts[i], part_name, [(part_modules[j], m) for j, m in modules]))
+        return layout
+
+    def display_antenna_info(self, vessel, name=None):
         """Collect and return information about the antennas of a given vessel"""
-        antenna_parts = [part for part in vessel.parts.all if 'Antenna' in part.name]
         info = []
-        for antenna_part in antenna_parts:
+        for antenna_part, part_name, modules in self.antenna_layout(vessel, name):
             antenna = self.conn.remote_tech.antenna(antenna_part)
-            for module in antenna_part.modules:
-                if module.name in ['ModuleRTAntenna', 'ModuleDeployableAntenna']:
-                    target = self.get_antenna_target(antenna)
-                    state = self.get_antenna_state(module)
-                    info.append([antenna_part.name, module.name, target, state])
+            for module, module_name in modules:
+                target = self.get_antenna_target(antenna)
+                state = self.get_antenna_state(module)
+                info.append([part_name, module_name, target, state])
         return info
 
     def switch_to_vessel(self, vessel):
@@ -128,8 +165,9 @@ class Communication:
         nested_info = []
         for vessel in self.vessel_list:
             self.switch_to_vessel(vessel)
+            name = vessel.name
             vessel_info = [
-                vessel.name,
+                name,
                 vessel.orbit.body.name,
                 vessel.orbit.inclination,
                 vessel.orbit.apoapsis_altitude,
@@ -138,12 +176,24 @@ class Communication:
             ]
             nested_info.append(vessel_info)
 
-            antenna_info = self.display_antenna_info(vessel)
+            antenna_info = self.display_antenna_info(vessel, name)
             for antenna in antenna_info:
                 nested_info.append([''] * 6 + antenna)
 
         headers = ["Vessel Name", "Body", "Inclination", "Apoapsis", "Periapsis", "Period", "Antenna Part Name", "Module Name", "Target", "State"]
-        print(tabulate(nested_info, headers=headers, tablefmt="fancy_grid"))
+        print(tabulate.tabulate(nested_info, headers=headers, tablefmt="fancy_grid"))
+
+    def monitor_network(self, drift_tolerance=1.0):
+        '''
+        Watches the network with streams and prints link, target, ground
+        connection and orbit drift changes until interrupted, instead of
+        rebuilding everything like display_network_info
+        '''
+        from network_monitor import NetworkMonitor
+
+        monitor = NetworkMonitor(self.vessel_list, drift_tolerance=drift_tolerance)
+        monitor.watch()
+        return monitor
 
     def setup_communications(self, antenna_targets_dict):
         '''
@@ -154,8 +204,10 @@ class Communication:
         If the value is 'setup_network', it will setup the network among the satellites and Kerbin.
         '''
 
-        # Get the vessel objects for the names in the targets
-        vessel_name_to_object = {v.name: v for v in self.conn.space_center.vessels}
+        # Get the vessel objects for the names in the targets, satellites of a constellation share a name
+        vessel_name_to_objects = {}
+        for v in self.conn.space_center.vessels:
+            vessel_name_to_objects.setdefault(v.name, []).append(v)
 
         distance_dict = {}
         for vessel in self.vessel_list:
@@ -191,18 +243,20 @@ class Communication:
                         for i, part in enumerate(antenna_parts):
                             antenna = self.conn.remote_tech.antenna(part)
                             if i == 0:
-                                antenna.target_body = self.conn.space_center.bodies['Kerbin']
+                                antenna.target_body = body_catalogue(self.conn).object('Kerbin')
                             else:
                                 nearest_index = (i - 1) % len(nearest_vessels)
                                 antenna.target_vessel = nearest_vessels[nearest_index]
                     else:
                         for target in targets:
                             if target == 'Kerbin':
-                                antenna.target_body = self.conn.space_center.bodies['Kerbin']
+                                antenna.target_body = body_catalogue(self.conn).object('Kerbin')
                             elif target == 'active_vessel':
                                 antenna.target = self.conn.remote_tech.Target.active_vessel
-                            elif target in vessel_name_to_object:
-                                antenna.target_vessel = vessel_name_to_object[target]
+                            elif len(vessel_name_to_objects.get(target, [])) > 1:
+                                print(f"Warning: Target '{target}' is not unique, antenna '{antenna_part.name}' not set.")
+                            elif target in vessel_name_to_objects:
+                                antenna.target_vessel = vessel_name_to_objects[target][0]
                             else:
                                 print(f"Warning: Target '{target}' not found for antenna '{antenna_part.name}'.")
 
@@ -214,3 +268,153 @@ class Communication:
                         print(f"Warning: Antenna part {i} of type '{antenna_name}' is not available for vessel {vessel.name}.")
                     if nearest_vessels[0] is None or nearest_vessels[1] is None:
                         print(f"Warning: Nearest vessels not properly identified for vessel {vessel.name}.")
+
+    def build_link_graph(self, antenna_ranges, range_model='standard'):
+        '''
+        LinkGraph of the constellation from the current element snapshot.
+        antenna_ranges maps vessel names to their antenna range in metres,
+        or is a sequence with one range per row of self.df.
+        '''
+        from connectivity import LinkGraph, snapshot_bodies
+
+        relays = self.df.copy()
+        if isinstance(antenna_ranges, dict):
+            relays['range'] = relays['name'].map(antenna_ranges).fillna(0.)
+        else:
+            relays['range'] = list(antenna_ranges)
+
+        catalogue = body_catalogue(self.conn)
+        names = set(relays['body']) | {'Kerbin'}
+        for name in list(names):
+            names.update(catalogue.satellites(name))
+        return LinkGraph(relays, snapshot_bodies(self.conn, names), self.sc.ut, range_model=range_model)
+
+    def link_coverage(self, antenna_ranges, samples=360, range_model='standard'):
+        '''
+        Fraction of one orbital period each vessel has a path to a ground station.
+        antenna_ranges maps vessel names to their longest antenna range in metres.
+        Propagated locally from the current element snapshot, see connectivity.LinkGraph.
+        '''
+        graph = self.build_link_graph(antenna_ranges, range_model)
+        coverage = graph.evaluate(samples=samples)
+        graph.print_summary()
+        return coverage
+
+    def dish_inventory(self, dish_ranges=None):
+        '''
+        Assignable dishes per row of self.df from its antennas,
+        dish_ranges maps antenna part names to their range in metres.
+        Ranges are remembered in the static cache, without dish_ranges
+        the cached ones are used.
+        Satellites of a constellation share a name, so the inventory is a
+        list in row order and dish targets are row positions, 'Kerbin' or
+        the vessel outside the constellation.
+        '''
+        cache = static_cache(self.conn)
+        known = cache.get('antenna_ranges', default={})
+        if dish_ranges is None:
+            dish_ranges = known
+        elif any(known.get(k) != v for k, v in dish_ranges.items()):
+            cache.put('antenna_ranges', {**known, **dish_ranges})
+        rows = {vessel: i for i, vessel in enumerate(self.df.index)}
+        inventory = []
+        for vessel, row in self.df.iterrows():
+            dishes = [a for a in row['antennas'] if a.part.name in dish_ranges]
+            inventory.append({
+                'vessel': vessel,
+                'name': row['name'],
+                'dishes': dishes,
+                'range': max((dish_ranges[a.part.name] for a in dishes), default=0.),
+                'targets': [self.antenna_target_node(a, rows) for a in dishes],
+            })
+        return inventory
+
+    def antenna_target_node(self, antenna, rows):
+        '''Target of a dish as an assignment node: 'Kerbin', a row in rows, another vessel or None'''
+        try:
+            target = antenna.target
+            if target == self.conn.remote_tech.Target.celestial_body and antenna.target_body.name == 'Kerbin':
+                return 'Kerbin'
+            if target == self.conn.remote_tech.Target.vessel:
+                vessel = antenna.target_vessel
+                return rows.get(vessel, vessel)
+        except Exception:
+            pass
+        return None
+
+    def assignment_node(self, key, rows):
+        '''
+        Row position for a vessel object, row position or unique vessel name,
+        'Kerbin' as is; vessels outside the constellation are returned as objects.
+        '''
+        if key == 'Kerbin' or isinstance(key, int):
+            return key
+        if key in rows:
+            return rows[key]
+        matches = [i for i, name in enumerate(self.df['name']) if name == key]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise ValueError(f"Vessel name '{key}' is not unique in the constellation, pass the vessel or its row")
+        outside = [v for v in self.conn.space_center.vessels if v.name == key]
+        if not outside:
+            raise ValueError(f"Vessel '{key}' not found")
+        return outside[0]
+
+    def optimize_antenna_targets(self, dish_ranges=None, k=2, required=None, min_fraction=0.95,
+                                 samples=360, apply=True):
+        '''
+        Assigns dish targets that maximize the number of independent paths to
+        Kerbin (up to k) under the dish count of every vessel, then applies
+        only the targets that changed, switching once per changed vessel.
+        A link counts as feasible if it closes for min_fraction of an orbit.
+        required is a list of (vessel, target) links that must exist, each a
+        vessel object, row of self.df, unique vessel name or 'Kerbin'.
+        Nodes of the assignment are the rows of self.df.
+        '''
+        from antenna_assignment import AntennaAssignment
+
+        inventory = self.dish_inventory(dish_ranges)
+        rows = {vessel: i for i, vessel in enumerate(self.df.index)}
+        graph = self.build_link_graph([dishes['range'] for dishes in inventory])
+        graph.evaluate(samples=samples)
+
+        solver = AntennaAssignment(
+            range(len(inventory)),
+            slots=[len(dishes['dishes']) for dishes in inventory],
+            feasible=graph.adjacency.mean(axis=0) >= min_fraction,
+            ground=graph.ground.mean(axis=0) >= min_fraction,
+            required=[(self.assignment_node(a, rows), self.assignment_node(b, rows)) for a, b in required or []],
+            current={i: dishes['targets'] for i, dishes in enumerate(inventory)},
+            k=k,
+            labels=[dishes['name'] for dishes in inventory])
+        solver.solve()
+        solver.print_assignment()
+
+        changes = solver.changes()
+        print(f'{len(changes)} antenna targets to change')
+        if apply:
+            self.apply_antenna_targets(inventory, changes)
+        return changes
+
+    def apply_antenna_targets(self, inventory, changes):
+        '''
+        Applies (row, slot, old, new) target changes grouped by vessel, new
+        is a row of the inventory, 'Kerbin' or a vessel outside it
+        '''
+        by_row = {}
+        for row, slot, old, new in changes:
+            by_row.setdefault(row, []).append((slot, new))
+
+        for row, slots in by_row.items():
+            self.switch_to_vessel(inventory[row]['vessel'])
+            for slot, new in slots:
+                antenna = inventory[row]['dishes'][slot]
+                if new == 'Kerbin':
+                    antenna.target_body = body_catalogue(self.conn).object('Kerbin')
+                elif isinstance(new, int):
+                    antenna.target_vessel = inventory[new]['vessel']
+                elif new is not None:
+                    antenna.target_vessel = new
+                else:
+                    print(f"Warning: No target for antenna '{antenna.part.name}'.")
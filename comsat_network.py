@@ -1,14 +1,15 @@
 import math
 import time
 import krpc
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import tabulate
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+tabulate = lazy_import('tabulate')
 import operator
+from bodies import body_catalogue
 from orbits import OrbitManager
 from nodes import NodeManager
 from vessels import VesselManager, Vessel
+from timeline import ManeuverTimeline
 
 from utils.handle_orientation import orientate_vessel
 from utils.handle_vessels import (
@@ -29,14 +30,19 @@ class ComSatNetwork():
         self.constellation_name = self.vessel_name
         print("ComSatNetwork connected ...")
 
+        self.resonance_numerator = 2
+        self.resonance_denominator = 3
+        self.orbits_between = 1
+        from deployment import DeploymentPlanner
+        self.planner = DeploymentPlanner(self.conn)
+
         self.vessel_list = [self.vessel]
+        self.vessels = None
+        self.events = None
         if self.vessel_list:
             self.df = self.update_df()
 
 
-        self.resonance_numerator = 2
-        self.resonance_denominator = 3
-
 
         self.executor = self.conn.mech_jeb.node_executor
         self.executor.tolerance = 0.1
@@ -44,16 +50,48 @@ class ComSatNetwork():
 
 
     def update_df(self):
-        ves = VesselManager(orbit_flag=True, node_flag=False, vessel_list=self.vessel_list)
-        self.df = ves.df.apply(lambda x: x .apply(
+        # streams of vessels already tracked are reused, only changes in vessel_list cost RPCs
+        if self.vessels is None:
+            self.vessels = VesselManager(orbit_flag=True, node_flag=False, vessel_list=self.vessel_list)
+        else:
+            self.vessels.remove_vessels([v for v in self.vessels.vessel_list if v not in self.vessel_list])
+            self.vessels.add_vessels(self.vessel_list)
+        self.df = self.vessels.df.loc[self.vessel_list].apply(lambda x: x .apply(
             lambda y: y() if callable(y) else y))
 
         self.df['period_diff'] = self.df['period'] - self.df['period'].mean()
+        # the carrier is not part of the rings, it keeps no phasing values
+        self.df['ring'] = np.nan
+        self.df['phase_deviation'] = np.nan
+        satellites = self.satellites_df()
+        if len(satellites):
+            phasing = self.phasing_analyzer().analyze(satellites)
+            self.df.loc[satellites.index, ['ring', 'phase_deviation']] = \
+                phasing[['ring', 'phase_deviation']].to_numpy(dtype=float)
         print(tabulate.tabulate(self.df[['name', 'body', 'inclination',
-                                         'apoapsis', 'periapsis', 'period', 'period_diff' ]],
+                                         'apoapsis', 'periapsis', 'period', 'period_diff',
+                                         'ring', 'phase_deviation']],
               headers='keys', tablefmt='fancy_grid'))
 
         return self.df
+
+    def satellites_df(self):
+        ''' Rows of self.df without the carrier '''
+        return self.df.drop(self.vessel, errors='ignore')
+
+    def phasing_analyzer(self, tolerance=1.0):
+        from phasing import ConstellationPhasing
+        bodies = {name: self.planner.body_constants(name) for name in self.df['body'].unique()}
+        return ConstellationPhasing(bodies, tolerance=tolerance)
+
+    def phasing_corrections(self, tolerance=1.0):
+        '''
+        Returns the phasing burns that restore even spacing within
+        tolerance (degrees) for the current constellation
+        '''
+        corrections = self.phasing_analyzer(tolerance).solve(self.satellites_df(), self.sc.ut)
+        print(tabulate.tabulate(corrections, headers='keys', tablefmt='fancy_grid'))
+        return corrections
     def return_antennas(self, vessel):
         '''
         Switches to vessel and returns all
@@ -77,6 +115,11 @@ class ComSatNetwork():
 
     def exec_burn(self, vessel):
         self.sc.active_vessel = vessel
+        self.prepare_burn(vessel)
+        NodeManager().execute_node()
+
+    def prepare_burn(self, vessel):
+        ''' Falls back to RCS fore by throttle if vessel has no active engines '''
         # Check for active engines
         engines = self.sc.active_vessel.parts.engines
         active_engines = [engine for engine in engines if engine.active]
@@ -91,14 +134,12 @@ class ComSatNetwork():
             print(f'Using RCS for vessel {vessel.name}')
         else:
             print(f'Using engines for vessel {vessel.name}')
-        
-        NodeManager().execute_node()
 
 
 
     def recircularize_multiple_sats(self):
-        node_list = []
-        for i, vessel in enumerate(self.df.index):
+        timeline = ManeuverTimeline(lead_time=self.executor.lead_time, tolerance=self.executor.tolerance)
+        for vessel in self.df.index:
             self.sc.active_vessel = vessel
 
             recirc = self.mj.maneuver_planner.operation_circularize
@@ -107,29 +148,12 @@ class ComSatNetwork():
             else:
                 recirc.time_selector.time_reference = self.mj.TimeReference.apoapsis
 
+            # overlapping burns are moved by whole orbits in the timeline
             node = recirc.make_nodes()[0]
-            node.ut = node.ut + (vessel.orbit.period * i)
-            node_list.append(node)
+            timeline.add_node(vessel, node)
 
-        ves = VesselManager(vessel_list=self.df.index, orbit_flag=True, node_flag=True)
-
-        self.df = ves.df.apply(lambda x: x.apply(
-            lambda y: y() if callable(y) else y))
-        self.df = self.df.sort_values(by='next_node_time_to', ascending=True)
-
-        print(tabulate.tabulate(self.df[['name', 'body', 'inclination',
-                                        'apoapsis', 'periapsis', 'period',
-                                        'next_node_time_to', 'next_node_remaining_dv']],
-                                headers='keys', tablefmt='fancy_grid'))
-        for vessel in self.df.index:
-            self.sc.active_vessel = vessel
-            time.sleep(2)
-            self.mj.smart_ass.autopilot_mode = self.mj.SmartASSAutopilotMode.node
-            self.mj.smart_ass.update(True)
-
-        for vessel in self.df.index:
-            print(f'Burning {vessel}')
-            self.exec_burn(vessel)
+        timeline.resolve_overlaps()
+        timeline.run(before_burn=self.prepare_burn)
 
 
         def fine_tune_orbital_period(self):
@@ -197,6 +221,7 @@ class ComSatNetwork():
         self.prepare_vessels()
         print('Vessels prepared')
         self.update_df()
+        self.screen_conjunctions()
 
     def prepare_vessels(self):        # Prepare command stuff
         for vessel in self.vessel_list:
@@ -214,7 +239,7 @@ class ComSatNetwork():
                 #     antenna.target_body = self.conn.space_center.bodies['Kerbin']
 
                 if antenna.part.name == 'restock-relay-radial-2.v2':
-                    antenna.target_body = self.conn.space_center.bodies['Kerbin']
+                    antenna.target_body = body_catalogue(self.conn).object('Kerbin')
 
                 for module in antenna.part.modules:
                     if module.name == 'ModuleRTAntenna':
@@ -281,7 +306,7 @@ class ComSatNetwork():
 
                 if i == 0:
                     # The first antenna targets Kerbin
-                    antenna.target_body = self.conn.space_center.bodies['Kerbin']
+                    antenna.target_body = body_catalogue(self.conn).object('Kerbin')
                 elif i < len(nearest_vessels) + 1:
                     # Subsequent antennas target the nearest satellites or specified vessels
                     antenna.target_vessel = nearest_vessels[i - 1]
@@ -294,29 +319,122 @@ class ComSatNetwork():
             if nearest_vessels[0] is None or nearest_vessels[1] is None:
                 print(f"Warning: Nearest vessels not properly identified for vessel {vessel.name}.")
 
+    def watch_vessels(self):
+        '''
+        Starts a VesselEventFeed, afterwards vessel lookups by name are
+        served from its cache instead of reading every vessel name
+        '''
+        from vessel_events import VesselEventFeed
+
+        if self.events is None:
+            self.events = VesselEventFeed()
+            self.events.start()
+        return self.events
+
     def init_existing_network(self, constellation_name):
         self.constellation_name = constellation_name
         self.vessel_list = []
 
-        for vessel in self.conn.space_center.vessels:
-            if vessel.name == constellation_name:
-                self.vessel_list.append(vessel)
+        if self.events is not None:
+            self.vessel_list = self.events.named(constellation_name)
+        else:
+            for vessel in self.conn.space_center.vessels:
+                if vessel.name == constellation_name:
+                    self.vessel_list.append(vessel)
 
         print(
             f'{len(self.vessel_list)} preexisting satellites found with name {constellation_name}')
 
         self.update_df()
-    def release_sats_triangle_orbit(self,nr_sats=5):
+    def plan_deployment(self, nr_sats, objective='time'):
+        '''
+        Picks the resonance ratio for nr_sats satellites on the current orbit
+        with the local DeploymentPlanner, objective is 'time' or 'delta_v'
+        '''
+        orbit = self.vessel.orbit
+        plan = self.planner.plan(orbit.body.name, orbit.apoapsis_altitude, nr_sats, objective)
+        if plan is not None:
+            self.resonance_numerator = plan['resonance_numerator']
+            self.resonance_denominator = plan['resonance_denominator']
+            self.orbits_between = plan['orbits_between']
+            self.planner.print_plan(plan, self.sc.ut)
+        return plan
+
+    def evaluate_coverage(self, nr_sats, inclination=None, elevation_mask=10., altitudes=None, inclinations=None):
+        '''
+        Surface coverage of nr_sats evenly spaced satellites at the current
+        apoapsis and inclination (degrees). If altitudes or inclinations
+        are given (lists or arrays), sweeps all combinations in parallel
+        instead.
+        '''
+        from coverage import CoverageSweep, evaluate_design
+
+        orbit = self.vessel.orbit
+        body = self.planner.body_constants(orbit.body.name)
+        if inclination is None:
+            inclination = math.degrees(orbit.inclination)
+        if altitudes is None and inclinations is None:
+            result = evaluate_design({'altitude': orbit.apoapsis_altitude, 'inclination': inclination,
+                                      'n_sats': nr_sats}, body, elevation_mask=elevation_mask)
+            print(tabulate.tabulate([result], headers='keys', tablefmt='fancy_grid'))
+            return result
+        sweep = CoverageSweep(body, elevation_mask=elevation_mask)
+        df = sweep.run(altitudes if altitudes is not None else [orbit.apoapsis_altitude],
+                       inclinations if inclinations is not None else [inclination],
+                       nr_sats if hasattr(nr_sats, '__len__') else [nr_sats])
+        sweep.print_results()
+        return df
+
+    def screen_conjunctions(self, vessels=None, threshold=200., orbits=3):
+        '''
+        Close approaches between the carrier and the released satellites
+        (or vessels, e.g. self.sc.vessels for the whole debris field) over
+        the next orbits of the carrier
+        '''
+        from conjunctions import ConjunctionScreener
+
+        if vessels is None:
+            vessels = [self.vessel] + [v for v in self.vessel_list if v != self.vessel]
+        screener = ConjunctionScreener(self.conn, threshold=threshold)
+        df = screener.screen(vessels, duration=orbits * self.vessel.orbit.period)
+        screener.print_conjunctions(df)
+        return df
+
+    def release_sats_triangle_orbit(self,nr_sats=5, objective=None, job=None):
+            '''
+            Releases nr_sats satellites from resonant orbits. job is an
+            optional MissionWorker job, checked for cancellation before
+            every burn and given the progress after every release.
+            '''
+            if objective is not None:
+                self.plan_deployment(nr_sats, objective)
             # reset vessel list, release satelittes will create updated one
             self.release_satellite()
+            if job is not None:
+                job.report(1 / nr_sats, f'satellite 1/{nr_sats} released')
 
             for i in range(nr_sats-1):
+                if job is not None:
+                    job.check()
                 self.resonant_orbit()
+                self.wait_resonant_orbits()
+                if job is not None:
+                    job.check()
                 self.recircularize()
                 self.release_satellite()
+                if job is not None:
+                    job.report((i + 2) / nr_sats, f'satellite {i + 2}/{nr_sats} released')
 
             self.update_df()
 
+    def wait_resonant_orbits(self):
+        '''
+        Warps through all orbits_between resonant orbits of the plan, back
+        to the apsis of the resonant burn where the next satellite is
+        released. recircularize only plans its node, it does not wait.
+        '''
+        self.sc.warp_to(self.sc.ut + self.orbits_between * self.vessel.orbit.period)
+
     def recircularize(self):
         recirc = self.mj.maneuver_planner.operation_circularize
         if self.resonance_numerator > self.resonance_denominator:
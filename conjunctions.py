@@ -0,0 +1,269 @@
+import time
+
+import krpc
+import numpy as np
+import pandas as pd
+import tabulate
+from scipy.spatial import cKDTree
+
+from utils.kepler import mean_motion, mean_to_eccentric_anomaly, perifocal_axes, position_from_elements, vis_viva
+
+ELEMENTS = ['semi_major_axis', 'eccentricity', 'inclination',
+            'longitude_of_ascending_node', 'argument_of_periapsis', 'mean_anomaly']
+
+
+def apsides(elements):
+    ''' Periapsis and apoapsis radius, not altitude '''
+    a = np.asarray(elements['semi_major_axis'], dtype=float)
+    e = np.asarray(elements['eccentricity'], dtype=float)
+    return a * (1 - e), a * (1 + e)
+
+
+def band_filter(periapsis, apoapsis, margin=0.):
+    '''
+    Orbits whose radius band [periapsis, apoapsis] comes within margin of
+    another orbit's band, as a bool mask, and the number of such pairs.
+    Two orbits whose bands do not overlap can never meet. Sorted by
+    periapsis the partners of every orbit are one contiguous run, so no
+    pair is materialized.
+    '''
+    order = np.argsort(periapsis, kind='stable')
+    # partners of sorted position k are k + 1 .. end[k] - 1
+    end = np.searchsorted(periapsis[order], apoapsis[order] + margin, side='right')
+    index = np.arange(len(order))
+    count = np.maximum(end - index - 1, 0)
+    reached = np.maximum.accumulate(np.concatenate([[0], end[:-1]])) > index
+    mask = np.empty(len(order), dtype=bool)
+    mask[order] = (count > 0) | reached
+    return mask, int(count.sum())
+
+
+def _positions(elements, mu, index, times):
+    ''' Positions of orbits index at times, both (E, S) or broadcastable '''
+    a = elements['semi_major_axis'][index][:, None]
+    mean_anomaly = elements['mean_anomaly'][index][:, None] + np.sqrt(mu / a ** 3) * times
+    return position_from_elements(a, elements['eccentricity'][index][:, None],
+                                  elements['inclination'][index][:, None],
+                                  elements['longitude_of_ascending_node'][index][:, None],
+                                  elements['argument_of_periapsis'][index][:, None],
+                                  mean_anomaly)
+
+
+def _relative_motion(elements, mu, i, j, t, h=0.05):
+    ''' Position and velocity of orbits i relative to orbits j at times t, velocity by central difference '''
+    times = np.stack([t - h, t + h], axis=1)
+    relative = _positions(elements, mu, i, times) - _positions(elements, mu, j, times)
+    return relative.mean(axis=1), (relative[:, 1] - relative[:, 0]) / (2 * h)
+
+
+def _no_conjunctions():
+    return pd.DataFrame({'a': pd.Series(dtype='int64'), 'b': pd.Series(dtype='int64'),
+                         'tca': pd.Series(dtype='float64'), 'miss_distance': pd.Series(dtype='float64'),
+                         'relative_speed': pd.Series(dtype='float64')})
+
+
+def screen_orbits(elements, mu, duration, threshold=1000., step=20., samples=16, iterations=5):
+    '''
+    Close approaches under threshold metres between orbits around one body
+    within duration seconds of the elements' epoch.
+
+    Orbits are prefiltered on their apsis bands, the survivors propagated
+    on a time grid and paired per step with a k-d tree. The tree radius is
+    threshold plus the distance two objects at the body's fastest
+    periapsis speed can close head on within one step, so no approach
+    falls between grid points. Every local minimum of a pair's distance
+    over the grid is an event, dropped if a straight line through it stays
+    clear of the threshold by more than the orbits can bend in one step,
+    otherwise refined by repeated vectorized sampling around it.
+
+    Returns a DataFrame with a, b (row positions in elements), tca
+    (seconds after epoch), miss_distance and relative_speed, and a dict of
+    counts. Approaches that are already receding at the epoch are left
+    out, hyperbolic orbits are skipped.
+    '''
+    elements = {e: np.asarray(elements[e], dtype=float) for e in ELEMENTS}
+    empty = _no_conjunctions()
+    stats = {'objects': len(elements['semi_major_axis']), 'band_survivors': 0, 'band_pairs': 0,
+             'steps': 0, 'tree_hits': 0, 'events': 0, 'refined': 0}
+
+    periapsis, apoapsis = apsides(elements)
+    closed = np.flatnonzero((elements['eccentricity'] < 1) & (elements['semi_major_axis'] > 0))
+    mask, stats['band_pairs'] = band_filter(periapsis[closed], apoapsis[closed], threshold)
+    index = closed[mask]
+    stats['band_survivors'] = len(index)
+    if len(index) < 2:
+        return empty, stats
+
+    sub = {e: v[index] for e, v in elements.items()}
+    pe, ap = periapsis[index], apoapsis[index]
+    speed = vis_viva(pe, sub['semi_major_axis'], mu).max()
+    n_steps = max(int(np.ceil(duration / step)), 1)
+    times = np.linspace(0., duration, n_steps + 1)
+    step = duration / n_steps
+    radius = threshold + speed * step
+    stats['steps'] = len(times)
+
+    a, e = sub['semi_major_axis'], sub['eccentricity']
+    motion = mean_motion(a, mu)
+    P, Q = perifocal_axes(sub['inclination'], sub['longitude_of_ascending_node'], sub['argument_of_periapsis'])
+    semi_minor = a * np.sqrt(1 - e ** 2)
+    mean_anomaly = sub['mean_anomaly'] % (2 * np.pi)
+    E = mean_to_eccentric_anomaly(mean_anomaly, e)
+    hits = []
+    for k, t in enumerate(times):
+        # Newton from the previous step's anomaly, a few iterations are plenty
+        M = mean_anomaly + motion * t
+        for _ in range(3):
+            E = E - (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        p = (a * (np.cos(E) - e))[:, None] * P + (semi_minor * np.sin(E))[:, None] * Q
+        pairs = cKDTree(p).query_pairs(radius, output_type='ndarray')
+        if len(pairs):
+            distance = np.linalg.norm(p[pairs[:, 0]] - p[pairs[:, 1]], axis=1)
+            hits.append((pairs[:, 0], pairs[:, 1], np.full(len(pairs), k), distance))
+    if not hits:
+        return empty, stats
+    i, j, k, distance = (np.concatenate(h) for h in zip(*hits))
+    # the tree radius is wider than the threshold, keep what the bands allow
+    overlap = (pe[j] <= ap[i] + threshold) & (pe[i] <= ap[j] + threshold)
+    i, j, k, distance = i[overlap], j[overlap], k[overlap], distance[overlap]
+    stats['tree_hits'] = len(i)
+    if not len(i):
+        return empty, stats
+
+    # consecutive steps of one pair are one run, every local minimum of the
+    # distance along a run is an event, seeded at that step
+    order = np.lexsort((k, j, i))
+    i, j, k, distance = i[order], j[order], k[order], distance[order]
+    start = np.ones(len(i), dtype=bool)
+    start[1:] = (i[1:] != i[:-1]) | (j[1:] != j[:-1]) | (k[1:] != k[:-1] + 1)
+    end = np.r_[start[1:], True]
+    before = np.where(start, np.inf, np.r_[np.inf, distance[:-1]])
+    after = np.where(end, np.inf, np.r_[distance[1:], np.inf])
+    seed = np.flatnonzero((distance <= before) & (distance < after))
+    i, j, seed_time = i[seed], j[seed], times[k[seed]]
+    stats['events'] = len(seed)
+
+    # the straight line through the seed is off by at most the bend two
+    # orbits can add within one step, 1/2 * 2 g_max * step^2
+    r, v = _relative_motion(sub, mu, i, j, seed_time)
+    tau = np.clip(-(r * v).sum(axis=1) / np.maximum((v * v).sum(axis=1), 1e-12), -step, step)
+    bend = mu / pe.min() ** 2 * step ** 2
+    close = np.linalg.norm(r + v * tau[:, None], axis=1) < threshold + bend
+    i, j, seed_time = i[close], j[close], seed_time[close]
+    stats['refined'] = len(i)
+
+    lo = np.maximum(seed_time - step, 0.)
+    hi = np.minimum(seed_time + step, duration)
+    grid = np.linspace(0., 1., samples)
+    rows = np.arange(len(i))
+    for _ in range(iterations):
+        t = lo[:, None] + (hi - lo)[:, None] * grid
+        d = np.linalg.norm(_positions(sub, mu, i, t) - _positions(sub, mu, j, t), axis=-1)
+        best = d.argmin(axis=1)
+        spacing = (hi - lo) / (samples - 1)
+        tca, miss = t[rows, best], d[rows, best]
+        lo, hi = np.maximum(tca - spacing, 0.), np.minimum(tca + spacing, duration)
+
+    relative_speed = np.linalg.norm(_relative_motion(sub, mu, i, j, tca)[1], axis=1)
+
+    keep = (miss < threshold) & (tca > 0)
+    return pd.DataFrame({'a': index[i[keep]], 'b': index[j[keep]], 'tca': tca[keep],
+                         'miss_distance': miss[keep], 'relative_speed': relative_speed[keep]}), stats
+
+
+class ConjunctionScreener():
+    '''
+    Screens vessels for close approaches over the coming hours.
+
+    Elements of every vessel are read at one UT in two batched requests,
+    everything after that is local: per body an apsis band prefilter, a
+    k-d tree of positions per time step and a refinement of the flagged
+    pairs (see screen_orbits). Thousands of objects take seconds instead of
+    one closest approach RPC per pair.
+
+    screener = ConjunctionScreener(threshold=500)
+    df = screener.screen(duration=6 * 3600)
+    screener.print_conjunctions(df)
+    '''
+    def __init__(self, conn=None, threshold=1000., step=20.):
+        self.conn = krpc.connect(name='ConjunctionScreener') if conn is None else conn
+        self.sc = self.conn.space_center
+        self.threshold = threshold
+        self.step = step
+
+        self.vessels = []
+        self.ut = None
+        self.df = None
+        self.stats = {}
+
+    def read(self, vessels=None):
+        '''
+        Names, bodies and elements of vessels (default every vessel) as a
+        DataFrame, row i belongs to self.vessels[i]. Vessels on the ground
+        are left out, they do not follow their orbit.
+        '''
+        from bodies import body_catalogue
+        from utils.batch import batch_call
+
+        vessels = list(self.sc.vessels if vessels is None else vessels)
+        grounded = {self.sc.VesselSituation.landed, self.sc.VesselSituation.splashed,
+                    self.sc.VesselSituation.pre_launch}
+        values = batch_call(self.conn, [(getattr, v, a) for v in vessels for a in ('name', 'situation', 'orbit')])
+        rows = [(v, *values[3 * n:3 * n + 3]) for n, v in enumerate(vessels)]
+        rows = [r for r in rows if not any(isinstance(x, Exception) for x in r) and r[2] not in grounded]
+
+        calls = [(getattr, orbit, a) for _, _, _, orbit in rows for a in ['body'] + ELEMENTS]
+        values = batch_call(self.conn, calls + [(getattr, self.sc, 'ut')])
+        self.ut = values[-1]
+
+        catalogue = body_catalogue(self.conn)
+        body_names = {catalogue.object(n): n for n in catalogue}
+        width = len(ELEMENTS) + 1
+        self.vessels, records = [], []
+        for n, (vessel, name, _, _) in enumerate(rows):
+            body, *elements = values[n * width:(n + 1) * width]
+            if isinstance(body, Exception) or any(isinstance(e, Exception) for e in elements):
+                continue
+            self.vessels.append(vessel)
+            records.append({'name': name, 'body': body_names[body], **dict(zip(ELEMENTS, elements))})
+        return pd.DataFrame(records, columns=['name', 'body'] + ELEMENTS)
+
+    def screen(self, vessels=None, duration=21600., threshold=None):
+        '''
+        Conjunctions within duration seconds from now, closest first in
+        time. Columns a and b index self.vessels.
+        '''
+        threshold = self.threshold if threshold is None else threshold
+        start = time.time()
+        from bodies import body_catalogue
+
+        elements = self.read(vessels)
+        catalogue = body_catalogue(self.conn)
+        frames = []
+        self.stats = {}
+        for body, group in elements.groupby('body', sort=False):
+            found, stats = screen_orbits(group, catalogue[body].gravitational_parameter, duration,
+                                         threshold, self.step)
+            rows = group.index.to_numpy()
+            frames.append(found.assign(a=rows[found['a']], b=rows[found['b']], body=body))
+            for key, value in stats.items():
+                self.stats[key] = self.stats.get(key, 0) + value
+
+        df = pd.concat(frames, ignore_index=True) if frames else _no_conjunctions().assign(body='')
+        df.insert(0, 'vessel_a', elements['name'].to_numpy()[df['a']])
+        df.insert(1, 'vessel_b', elements['name'].to_numpy()[df['b']])
+        df['ut'] = self.ut + df['tca']
+        self.df = df.sort_values('tca', ignore_index=True)[
+            ['vessel_a', 'vessel_b', 'body', 'ut', 'tca', 'miss_distance', 'relative_speed', 'a', 'b']]
+
+        print(f'ConjunctionScreener: {len(elements)} vessels, {self.stats.get("band_survivors", 0)} after band filter, '
+              f'{len(self.df)} conjunctions under {threshold:.0f} m in {time.time() - start:.2f} s')
+        return self.df
+
+    def print_conjunctions(self, df=None):
+        df = self.df if df is None else df
+        if df is None or df.empty:
+            print('No conjunctions')
+            return
+        print(tabulate.tabulate(df.drop(columns=['a', 'b']), headers='keys', tablefmt='fancy_grid',
+                                showindex=False, floatfmt='.1f'))
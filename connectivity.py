@@ -0,0 +1,232 @@
+import time
+
+import numpy as np
+import pandas as pd
+import tabulate
+
+from utils.kepler import orbital_period, propagate_positions, true_to_mean_anomaly
+
+ELEMENTS = ['semi_major_axis', 'eccentricity', 'inclination',
+            'longitude_of_ascending_node', 'argument_of_periapsis']
+
+# RemoteTech mission control at KSC
+KSC = {
+    'name': 'Mission Control',
+    'body': 'Kerbin',
+    'latitude': -0.1313,
+    'longitude': -74.5947,
+    'altitude': 75.,
+    'range': 75e6,
+}
+
+
+def line_of_sight(a, b, centers, radii):
+    '''
+    True where the segment a-b misses every sphere.
+    a and b are (..., 3), centers is (..., K, 3) broadcasting against them
+    and radii is (K,). Bodies are tested one at a time to keep temporaries
+    the size of a single distance array.
+    '''
+    d = b - a
+    length2 = np.maximum((d * d).sum(axis=-1), 1e-9)
+    miss = np.ones(length2.shape, dtype=bool)
+    for k, radius in enumerate(radii):
+        ca = centers[..., k, :] - a
+        projection = (ca * d).sum(axis=-1)
+        t = np.clip(projection / length2, 0., 1.)
+        # |ca - t d|^2 without building the closest point
+        distance2 = (ca * ca).sum(axis=-1) - 2 * t * projection + t * t * length2
+        miss &= distance2 >= radius ** 2
+    return miss
+
+
+def link_range(range_a, range_b, model='standard'):
+    ''' Maximum link distance between two antennas, RemoteTech range models '''
+    low = np.minimum(range_a, range_b)
+    if model == 'root':
+        return np.minimum(low + np.sqrt(range_a * range_b), 100 * low)
+    return low
+
+
+def snapshot_bodies(conn, names):
+    '''
+    Body description for LinkGraph from the server: constants, rotation and,
+    for bodies whose parent is also in names, their orbit elements.
+    Constants come from the session catalogue, the rest is one batch.
+    '''
+    from bodies import body_catalogue
+    from utils.batch import batch_call
+
+    catalogue = body_catalogue(conn)
+    elements = ['semi_major_axis', 'eccentricity', 'inclination', 'longitude_of_ascending_node',
+                'argument_of_periapsis', 'mean_anomaly']
+    names = list(names)
+    orbiting = [n for n in names if catalogue[n].parent in names]
+    calls = [(getattr, catalogue.object(n), 'rotation_angle') for n in names]
+    calls += [(getattr, catalogue.orbit(n), e) for n in orbiting for e in elements]
+    values = batch_call(conn, calls)
+
+    bodies = {}
+    for name, rotation_angle in zip(names, values):
+        constants = catalogue[name]
+        bodies[name] = {
+            'gravitational_parameter': constants.gravitational_parameter,
+            'equatorial_radius': constants.equatorial_radius,
+            'rotational_period': constants.rotational_period,
+            'rotation_angle': rotation_angle,
+        }
+    for i, name in enumerate(orbiting):
+        start = len(names) + i * len(elements)
+        bodies[name]['parent'] = catalogue[name].parent
+        bodies[name].update(zip(elements, values[start:start + len(elements)]))
+    return bodies
+
+
+class LinkGraph():
+    '''
+    Time sampled RemoteTech link graph.
+
+    Every relay and body is propagated locally from one element snapshot,
+    every pair is tested for range and for occlusion by all bodies with
+    vectorized ray-sphere checks, and the resulting graph at each sample is
+    searched for a path to a ground station.
+
+    relays is a DataFrame with the orbit columns of VesselManager.df
+    (body, elements, true_anomaly) and a 'range' column in metres.
+    bodies maps names to dicts with 'gravitational_parameter',
+    'equatorial_radius', 'rotational_period', 'rotation_angle' and, for
+    bodies orbiting another one in the set, 'parent' plus the orbit
+    elements and 'mean_anomaly'. All angles in radians at the snapshot UT.
+    '''
+    def __init__(self, relays, bodies, ut, ground_stations=None, range_model='standard'):
+        self.relays = relays
+        self.bodies = bodies
+        self.ut = ut
+        self.ground_stations = [KSC] if ground_stations is None else ground_stations
+        self.range_model = range_model
+
+        self.names = [str(n) for n in relays.get('name', pd.Series(relays.index, index=relays.index))]
+        self.ranges = relays['range'].to_numpy(dtype=float)
+        self.mean_anomaly = true_to_mean_anomaly(relays['true_anomaly'].to_numpy(dtype=float),
+                                                 relays['eccentricity'].to_numpy(dtype=float))
+        self.body_names = list(bodies)
+        self.radii = np.array([bodies[b]['equatorial_radius'] for b in self.body_names])
+
+        self.adjacency = None
+        self.ground = None
+        self.connected = None
+
+    def body_positions(self, times):
+        ''' Positions of all bodies in the frame of the root body, (T, K, 3) '''
+        positions = {}
+
+        def position(name):
+            if name not in positions:
+                body = self.bodies[name]
+                parent = body.get('parent')
+                if parent is None or parent not in self.bodies:
+                    positions[name] = np.zeros((len(times), 3))
+                else:
+                    mu = self.bodies[parent]['gravitational_parameter']
+                    positions[name] = position(parent) + propagate_positions(body, mu, times)[:, 0]
+            return positions[name]
+
+        return np.stack([position(name) for name in self.body_names], axis=1)
+
+    def relay_positions(self, times, body_positions):
+        ''' Positions of all relays, (T, N, 3) '''
+        positions = np.empty((len(times), len(self.relays), 3))
+        for body, rows in self.relays.groupby('body').indices.items():
+            elements = {e: self.relays[e].to_numpy(dtype=float)[rows] for e in ELEMENTS}
+            elements['mean_anomaly'] = self.mean_anomaly[rows]
+            mu = self.bodies[body]['gravitational_parameter']
+            k = self.body_names.index(body)
+            positions[:, rows] = body_positions[:, k, None] + propagate_positions(elements, mu, times)
+        return positions
+
+    def station_positions(self, times, body_positions):
+        ''' Ground station positions on their rotating bodies, (T, S, 3) '''
+        positions = []
+        for station in self.ground_stations:
+            body = self.bodies[station['body']]
+            k = self.body_names.index(station['body'])
+            lat = np.radians(station['latitude'])
+            angle = (body['rotation_angle'] + np.radians(station['longitude'])
+                     + 2 * np.pi / body['rotational_period'] * times)
+            r = body['equatorial_radius'] + station['altitude']
+            offset = r * np.stack([np.cos(lat) * np.cos(angle), np.cos(lat) * np.sin(angle),
+                                   np.full_like(angle, np.sin(lat))], axis=1)
+            positions.append(body_positions[:, k] + offset)
+        return np.stack(positions, axis=1)
+
+    def evaluate(self, duration=None, samples=360, chunk=16):
+        '''
+        Builds the link graph at every sample over duration seconds
+        (default: the longest relay period) and returns per vessel the
+        fraction of samples with a path to a ground station.
+        '''
+        start = time.time()
+        if duration is None:
+            mu = self.relays['body'].map(lambda b: self.bodies[b]['gravitational_parameter'])
+            duration = orbital_period(self.relays['semi_major_axis'].to_numpy(dtype=float),
+                                      mu.to_numpy(dtype=float)).max()
+        self.times = np.linspace(0., duration, samples, endpoint=False)
+
+        n = len(self.relays)
+        stations = [s['range'] for s in self.ground_stations]
+        i, j = np.triu_indices(n, k=1)
+        pair_ok_range = link_range(self.ranges[i], self.ranges[j], self.range_model)
+        station_ok_range = link_range(self.ranges[:, None], np.array(stations)[None, :], self.range_model)
+
+        self.adjacency = np.zeros((samples, n, n), dtype=bool)
+        self.ground = np.zeros((samples, n), dtype=bool)
+
+        for c in range(0, samples, chunk):
+            times = self.times[c:c + chunk]
+            bodies = self.body_positions(times)
+            relays = self.relay_positions(times, bodies)
+
+            # occlusion is only tested for pairs within range
+            a, b = relays[:, i], relays[:, j]
+            in_range = np.linalg.norm(a - b, axis=-1) <= pair_ok_range
+            t, p = np.nonzero(in_range)
+            visible = np.zeros_like(in_range)
+            visible[t, p] = line_of_sight(a[t, p], b[t, p], bodies[t], self.radii)
+            self.adjacency[c:c + chunk, i, j] = visible
+            self.adjacency[c:c + chunk, j, i] = visible
+
+            station_pos = self.station_positions(times, bodies)
+            a = np.broadcast_to(relays[:, :, None], (len(times), n, len(stations), 3))
+            b = np.broadcast_to(station_pos[:, None], (len(times), n, len(stations), 3))
+            distance = np.linalg.norm(a - b, axis=-1)
+            visible = (distance <= station_ok_range) & line_of_sight(a, b, bodies[:, None, None], self.radii)
+            self.ground[c:c + chunk] = visible.any(axis=-1)
+
+        # flood fill from the ground linked relays, all samples at once
+        self.connected = self.ground.copy()
+        while True:
+            grown = self.connected | (self.adjacency & self.connected[:, None, :]).any(axis=-1)
+            if (grown == self.connected).all():
+                break
+            self.connected = grown
+
+        print(f'LinkGraph: {n} relays, {samples} samples in {time.time() - start:.2f} s')
+        return pd.Series(self.connected.mean(axis=0), index=self.relays.index, name='connected_fraction')
+
+    def links_at(self, sample):
+        ''' Edge list of the link graph at one sample, ground stations as 'ground' '''
+        i, j = np.nonzero(np.triu(self.adjacency[sample]))
+        edges = [(self.names[a], self.names[b]) for a, b in zip(i, j)]
+        edges += [(self.names[a], 'ground') for a in np.flatnonzero(self.ground[sample])]
+        return edges
+
+    def summary(self):
+        return pd.DataFrame({
+            'name': self.names,
+            'connected_fraction': self.connected.mean(axis=0),
+            'ground_link_fraction': self.ground.mean(axis=0),
+            'mean_links': self.adjacency.sum(axis=2).mean(axis=0),
+        }, index=self.relays.index)
+
+    def print_summary(self):
+        print(tabulate.tabulate(self.summary(), headers='keys', tablefmt='fancy_grid'))
@@ -0,0 +1,138 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import tabulate
+
+from utils.kepler import orbital_period, propagate_positions
+
+
+def walker_constellation(altitude, inclination, n_sats, n_planes=1, phasing=0, radius=600000.):
+    '''
+    Elements of a Walker delta pattern i:T/P/F, inclination in degrees.
+    Returns a dict of arrays for utils.kepler.propagate_positions.
+    '''
+    per_plane = n_sats // n_planes
+    plane, slot = np.divmod(np.arange(per_plane * n_planes), per_plane)
+    return {
+        'semi_major_axis': np.full(len(plane), radius + altitude, dtype=float),
+        'eccentricity': np.zeros(len(plane)),
+        'inclination': np.full(len(plane), np.radians(inclination)),
+        'longitude_of_ascending_node': 2 * np.pi * plane / n_planes,
+        'argument_of_periapsis': np.zeros(len(plane)),
+        'mean_anomaly': 2 * np.pi * slot / per_plane + 2 * np.pi * phasing * plane / (per_plane * n_planes),
+    }
+
+
+def surface_grid(resolution):
+    ''' Cell centre latitudes and longitudes in radians and their area weights '''
+    lat = np.radians(np.arange(-90 + resolution / 2, 90, resolution))
+    lon = np.radians(np.arange(-180 + resolution / 2, 180, resolution))
+    lat, lon = np.meshgrid(lat, lon, indexing='ij')
+    return lat.ravel(), lon.ravel(), np.cos(lat.ravel())
+
+
+def longest_gaps(covered, dt):
+    '''
+    Longest run of uncovered samples per grid point in seconds,
+    covered is (T, G) bool. The time window wraps around.
+    '''
+    samples = covered.shape[0]
+    gap = ~np.concatenate([covered, covered], axis=0)
+    # run length of uncovered samples ending at every step
+    index = np.arange(gap.shape[0])[:, None]
+    last_covered = np.maximum.accumulate(np.where(gap, -1, index), axis=0)
+    runs = np.where(gap, index - last_covered, 0)
+    return np.minimum(runs.max(axis=0), samples) * dt
+
+
+def evaluate_design(design, body, elevation_mask=10., resolution=5., samples=240, duration=None):
+    '''
+    Coverage of one constellation design over duration seconds
+    (default: one rotation of the body). design is a dict with altitude,
+    inclination, n_sats and optionally n_planes and phasing.
+    '''
+    mu = body['gravitational_parameter']
+    radius = body['equatorial_radius']
+    elements = walker_constellation(design['altitude'], design['inclination'], design['n_sats'],
+                                    design.get('n_planes', 1), design.get('phasing', 0), radius)
+    if duration is None:
+        duration = max(body['rotational_period'], orbital_period(elements['semi_major_axis'][0], mu))
+    times = np.linspace(0., duration, samples, endpoint=False)
+
+    # satellites into the rotating body frame instead of rotating the whole grid
+    sats = propagate_positions(elements, mu, times)
+    angle = -2 * np.pi / body['rotational_period'] * times - body.get('rotation_angle', 0.)
+    cos_a, sin_a = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    sats = np.stack([cos_a * sats[..., 0] - sin_a * sats[..., 1],
+                     sin_a * sats[..., 0] + cos_a * sats[..., 1],
+                     sats[..., 2]], axis=-1)
+
+    lat, lon, weights = surface_grid(resolution)
+    up = np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+    # elevation above the mask: (sat - ground) . up >= sin(mask) * |sat - ground|
+    # expanded so the only (T, N, G) product is one matmul
+    sin_mask = np.sin(np.radians(elevation_mask))
+    projection = sats @ up.T
+    sat_r2 = (sats * sats).sum(axis=-1)[..., None]
+    height = projection - radius
+    distance2 = sat_r2 - 2 * radius * projection + radius ** 2
+    visible = (height >= 0) & (height ** 2 >= sin_mask ** 2 * distance2) if sin_mask >= 0 \
+        else height >= sin_mask * np.sqrt(distance2)
+    covered = visible.any(axis=1)
+
+    gaps = longest_gaps(covered, duration / samples)
+    point_coverage = covered.mean(axis=0)
+    return {
+        **design,
+        'coverage': (point_coverage * weights).sum() / weights.sum(),
+        'continuous_coverage': ((point_coverage == 1) * weights).sum() / weights.sum(),
+        'max_revisit_gap': gaps.max(),
+        'mean_revisit_gap': (gaps * weights).sum() / weights.sum(),
+    }
+
+
+def _evaluate_chunk(args):
+    designs, body, kwargs = args
+    return [evaluate_design(d, body, **kwargs) for d in designs]
+
+
+class CoverageSweep():
+    '''
+    Evaluates surface coverage of candidate constellations in parallel.
+
+    sweep = CoverageSweep(KERBIN)
+    df = sweep.run(altitudes=[...], inclinations=[...], n_sats=[3, 4, 6])
+    '''
+    def __init__(self, body, elevation_mask=10., resolution=5., samples=240, processes=0):
+        self.body = body
+        self.kwargs = {'elevation_mask': elevation_mask, 'resolution': resolution, 'samples': samples}
+        self.processes = processes or os.cpu_count()
+        self.df = None
+
+    def designs(self, altitudes, inclinations, n_sats, n_planes=(1,), phasing=(0,)):
+        return [{'altitude': a, 'inclination': i, 'n_sats': n, 'n_planes': p, 'phasing': f}
+                for a, i, n, p, f in itertools.product(altitudes, inclinations, n_sats, n_planes, phasing)
+                if n % p == 0]
+
+    def run(self, altitudes, inclinations, n_sats, n_planes=(1,), phasing=(0,)):
+        start = time.time()
+        designs = self.designs(altitudes, inclinations, n_sats, n_planes, phasing)
+        if not designs:
+            print('CoverageSweep: no designs to evaluate')
+            self.df = pd.DataFrame()
+            return self.df
+        chunks = [designs[i::self.processes] for i in range(self.processes)]
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            results = pool.map(_evaluate_chunk, [(c, self.body, self.kwargs) for c in chunks if c])
+            self.df = pd.DataFrame([r for chunk in results for r in chunk])
+        self.df = self.df.sort_values(by=['coverage', 'max_revisit_gap'], ascending=[False, True])
+        print(f'CoverageSweep: {len(designs)} designs in {time.time() - start:.2f} s')
+        return self.df
+
+    def print_results(self, n=10):
+        print(tabulate.tabulate(self.df.head(n), headers='keys', tablefmt='fancy_grid'))
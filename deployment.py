@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import tabulate
+
+from utils.kepler import circular_velocity, orbital_period, semi_major_axis_from_period, vis_viva
+
+
+class DeploymentPlanner():
+    '''
+    Analytic planner for deploying N satellites from a carrier on a
+    resonant orbit.
+
+    The carrier releases the first satellite on the target circular orbit,
+    burns onto an orbit with period ratio * T and releases one satellite
+    every orbits_between carrier orbits at the shared apsis. Every candidate
+    ratio is evaluated in one vectorized pass and the one with the least
+    total delta v (or deployment time) that spaces the satellites evenly
+    is chosen.
+
+    Candidates whose resonant orbit dips into the atmosphere or leaves the
+    sphere of influence are rejected.
+
+    Plans are memoized per (body, altitude, N, objective) with the altitude
+    rounded to altitude_step metres, so a live orbit hits the cache. Body
+    constants are fetched once per body, so planning costs no RPCs after
+    warm-up.
+    '''
+    def __init__(self, conn=None, max_denominator=12, max_orbits_between=4,
+                 periapsis_margin=10000, ratio_range=(0.5, 2.0), altitude_step=1000.):
+        self.conn = conn
+        self.altitude_step = altitude_step
+        self.max_denominator = max_denominator
+        self.max_orbits_between = max_orbits_between
+        self.periapsis_margin = periapsis_margin
+        self.ratio_range = ratio_range
+
+        self.bodies = {}
+        self.plans = {}
+
+    def body_constants(self, body):
+        ''' Returns mu, radius, atmosphere depth and rotation of a body name, from the session catalogue '''
+        if isinstance(body, dict):
+            return body
+        if body not in self.bodies:
+            from bodies import body_catalogue
+            self.bodies[body] = body_catalogue(self.conn).constants(body)
+        return self.bodies[body]
+
+    def candidates(self, n_sats):
+        '''
+        All (numerator, denominator, orbits_between) whose phase advance per
+        release is k/N of an orbit with gcd(k, N) == 1, so N releases fill
+        N evenly spaced slots.
+        '''
+        num, den, m = np.meshgrid(np.arange(1, 2 * self.max_denominator + 1),
+                                  np.arange(1, self.max_denominator + 1),
+                                  np.arange(1, self.max_orbits_between + 1), indexing='ij')
+        num, den, m = num.ravel(), den.ravel(), m.ravel()
+        ratio = num / den
+        reduced = np.gcd(num, den) == 1
+        in_range = (ratio >= self.ratio_range[0]) & (ratio <= self.ratio_range[1]) & (num != den)
+        # phase advance per release as a fraction k / n_sats
+        advance = np.round((m * num % den) * n_sats / den)
+        exact = np.isclose((m * num % den) / den, advance / n_sats)
+        fills_slots = exact & (advance > 0) & (np.gcd(advance.astype(int), n_sats) == 1)
+        keep = reduced & in_range & fills_slots
+        return num[keep], den[keep], m[keep]
+
+    def plan(self, body, altitude, n_sats, objective='delta_v'):
+        '''
+        Returns the deployment plan as a dict, memoized.
+        objective is 'delta_v' or 'time'.
+        '''
+        constants = self.body_constants(body)
+        altitude = round(altitude / self.altitude_step) * self.altitude_step
+        key = (constants.get('name', id(body)), altitude, n_sats, objective)
+        if key in self.plans:
+            return self.plans[key]
+
+        mu = constants['gravitational_parameter']
+        radius = constants['equatorial_radius'] + altitude
+        min_radius = constants['equatorial_radius'] + constants['atmosphere_depth'] + self.periapsis_margin
+
+        num, den, m = self.candidates(n_sats)
+        ratio = num / den
+        period = orbital_period(radius, mu)
+        sma_res = semi_major_axis_from_period(ratio * period, mu)
+        other_apsis = 2 * sma_res - radius
+        valid = other_apsis >= min_radius
+        soi = constants.get('sphere_of_influence', np.inf)
+        if soi is not None and np.isfinite(soi):
+            valid &= other_apsis <= soi
+
+        v_circ = circular_velocity(radius, mu)
+        v_res = vis_viva(radius, sma_res, mu)
+        dv_each = np.abs(v_circ - v_res)
+        # carrier injection plus one circularization per satellite after the first
+        total_dv = dv_each * n_sats
+        deploy_time = (n_sats - 1) * m * ratio * period
+
+        if not valid.any():
+            print(f'DeploymentPlanner: no resonant orbit between the atmosphere and the SOI at {altitude} m')
+            return None
+
+        score = total_dv if objective == 'delta_v' else deploy_time
+        # ties broken by the other objective
+        tiebreak = deploy_time if objective == 'delta_v' else total_dv
+        order = np.lexsort((tiebreak, np.where(valid, score, np.inf)))
+        i = order[0]
+
+        offsets = np.arange(n_sats) * m[i] * ratio[i] * period
+        release_dv = np.full(n_sats, dv_each[i])
+        release_dv[0] = 0.
+        phase = np.degrees(2 * np.pi * (((n_sats - 1 - np.arange(n_sats)) * m[i] * ratio[i]) % 1))
+
+        plan = {
+            'body': constants.get('name'),
+            'altitude': altitude,
+            'n_sats': n_sats,
+            'resonance_numerator': int(num[i]),
+            'resonance_denominator': int(den[i]),
+            'orbits_between': int(m[i]),
+            'period': period,
+            'resonant_period': ratio[i] * period,
+            'resonant_other_apsis': other_apsis[i] - constants['equatorial_radius'],
+            'carrier_dv': dv_each[i],
+            'release_offsets': offsets,
+            'release_dv': release_dv,
+            'phase': phase,
+            'total_dv': total_dv[i],
+            'deployment_time': deploy_time[i],
+        }
+        self.plans[key] = plan
+        return plan
+
+    def release_uts(self, plan, ut):
+        ''' Absolute release UTs for a plan started at ut '''
+        return ut + plan['release_offsets']
+
+    def plan_df(self, plan, ut=0.):
+        return pd.DataFrame({
+            'release_ut': self.release_uts(plan, ut),
+            'release_dv': plan['release_dv'],
+            'phase': plan['phase'],
+        })
+
+    def print_plan(self, plan, ut=0.):
+        print(f"Resonance {plan['resonance_numerator']}/{plan['resonance_denominator']}, "
+              f"{plan['orbits_between']} orbit(s) between releases, "
+              f"total dv {plan['total_dv']:.1f} m/s, "
+              f"deployment time {plan['deployment_time'] / 3600:.2f} h")
+        print(tabulate.tabulate(self.plan_df(plan, ut), headers='keys', tablefmt='fancy_grid'))
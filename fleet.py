@@ -0,0 +1,163 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import krpc
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+tabulate = lazy_import('tabulate')
+
+
+def parse_endpoint(endpoint):
+    '''
+    Endpoint dict with name, address, rpc_port and stream_port from a
+    dict or an 'address[:rpc_port[:stream_port]]' string
+    '''
+    if isinstance(endpoint, dict):
+        spec = dict(endpoint)
+    else:
+        parts = endpoint.split(':')
+        spec = {'address': parts[0]}
+        if len(parts) > 1:
+            spec['rpc_port'] = int(parts[1])
+        if len(parts) > 2:
+            spec['stream_port'] = int(parts[2])
+    spec.setdefault('address', '127.0.0.1')
+    spec.setdefault('rpc_port', 50000)
+    spec.setdefault('stream_port', spec['rpc_port'] + 1)
+    spec.setdefault('name', f"{spec['address']}:{spec['rpc_port']}")
+    return spec
+
+
+class Fleet():
+    '''
+    Several kRPC servers (KSP instances) behind one object.
+
+    Work is run on every endpoint concurrently, one thread and one
+    connection per server, and results are merged into one view with the
+    server name as the outer index level, since kRPC object ids are only
+    unique per server.
+
+    fleet = Fleet(['127.0.0.1:50000', '127.0.0.1:50010'])
+    df = fleet.snapshot()
+    fleet.orbit_index.query('Kerbin', altitude=(2000e3, 3000e3))
+    '''
+    def __init__(self, endpoints, client_name='Fleet'):
+        self.endpoints = [parse_endpoint(e) for e in endpoints]
+        self.client_name = client_name
+        self.conns = {}
+        self.errors = {}
+        self.df = None
+        self.orbit_index = None
+
+        connected = self.run(lambda conn, spec: krpc.connect(
+            name=client_name, address=spec['address'],
+            rpc_port=spec['rpc_port'], stream_port=spec['stream_port']), pass_spec=True, connect=False)
+        self.conns = {name: conn for name, conn in connected.items() if conn is not None}
+        print(f'Fleet connected to {len(self.conns)}/{len(self.endpoints)} servers ...')
+
+    def run(self, func, *args, pass_spec=False, connect=True, **kwargs):
+        '''
+        Calls func(conn, *args, **kwargs) on every connected server in
+        parallel and returns a dict server name -> result. Failures are
+        kept in self.errors and give None.
+        '''
+        names = [e['name'] for e in self.endpoints if not connect or e['name'] in self.conns]
+        specs = {e['name']: e for e in self.endpoints}
+
+        def call(name):
+            conn = self.conns.get(name)
+            if pass_spec:
+                return func(conn, specs[name], *args, **kwargs)
+            return func(conn, *args, **kwargs)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(len(names), 1)) as pool:
+            futures = {name: pool.submit(call, name) for name in names}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                    self.errors.pop(name, None)
+                except Exception as e:
+                    print(f'Fleet: {name} failed: {e}')
+                    self.errors[name] = e
+                    results[name] = None
+        return results
+
+    def shard(self, items, func, **kwargs):
+        '''
+        Splits items round robin over the connected servers and calls
+        func(conn, chunk, **kwargs) on each in parallel.
+        '''
+        names = list(self.conns)
+        chunks = {name: list(items[i::len(names)]) for i, name in enumerate(names)}
+        return self.run(lambda conn, spec: func(conn, chunks[spec['name']], **kwargs), pass_spec=True)
+
+    def merge(self, results):
+        ''' One DataFrame from per server DataFrames, server as outer index level '''
+        frames = {name: df for name, df in results.items() if df is not None and len(df)}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, names=['server'])
+
+    def snapshot(self, orbit_flag=True, name=None, exact_name=False):
+        '''
+        Values of every vessel on every server (optionally filtered by
+        name) as one typed DataFrame. Streams are only held while reading.
+        '''
+        from fleet_table import FleetTable
+
+        def read(conn):
+            vessels = conn.space_center.vessels
+            if name is not None:
+                vessels = [v for v in vessels if (v.name == name if exact_name else name in v.name)]
+            if not vessels:
+                return None
+            table = FleetTable(vessels, columns=None if orbit_flag else [], conn=conn)
+            df = table.df.copy()
+            table.close()
+            return df
+
+        start = time.time()
+        self.df = self.merge(self.run(read))
+        # categories differ per server and concat falls back to object
+        for column in ('name', 'body'):
+            if column in self.df.columns:
+                self.df[column] = self.df[column].astype('category')
+        if orbit_flag and len(self.df):
+            from orbit_index import OrbitIndex
+            self.orbit_index = OrbitIndex(self.df)
+        print(f'Fleet: {len(self.df)} vessels from {len(self.conns)} servers in {time.time() - start:.2f} s')
+        return self.df
+
+    def latency(self, calls=100):
+        ''' RPC round trip per server, measured on all servers at once '''
+        from utils.rpc_profiler import LatencyHistogram
+
+        def measure(conn):
+            histogram = LatencyHistogram()
+            for _ in range(calls):
+                start = time.perf_counter()
+                conn.space_center.ut
+                histogram.record(time.perf_counter() - start)
+            return pd.DataFrame([{
+                'calls': histogram.count,
+                'mean_ms': histogram.total / histogram.count / 1e3,
+                'p50_ms': histogram.percentile(50),
+                'p99_ms': histogram.percentile(99),
+                'max_ms': histogram.max / 1e3,
+            }])
+
+        df = self.merge(self.run(measure))
+        # no server answered, there is no server level to keep
+        return df if df.empty else df.droplevel(-1)
+
+    def print_fleet(self, columns=('name', 'body', 'apoapsis', 'periapsis', 'period')):
+        if self.df is None:
+            self.snapshot()
+        columns = [c for c in columns if c in self.df.columns]
+        print(tabulate.tabulate(self.df[columns], headers='keys', tablefmt='fancy_grid'))
+
+    def close(self):
+        for conn in self.conns.values():
+            conn.close()
+        self.conns = {}
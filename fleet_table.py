@@ -0,0 +1,119 @@
+import itertools
+
+import krpc
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+tabulate = lazy_import('tabulate')
+
+from orbits import ORBIT_ATTRIBUTES
+
+
+class FleetTable():
+    '''
+    Typed columnar table of the fleet.
+
+    Stream handles live next to the data, one row of streams per vessel,
+    and never inside the DataFrame. refresh() reads every stream into one
+    float64 block and assigns it in one go, name and body are categorical
+    and rows are indexed by a stable integer vessel id that survives adds
+    and removes.
+
+    table = FleetTable()
+    table.refresh()
+    table.df.loc[table.id_of(vessel), 'apoapsis']
+    '''
+    def __init__(self, vessels=None, columns=None, rate=0, conn=None):
+        self.conn = krpc.connect(name='FleetTable') if conn is None else conn
+        self.sc = self.conn.space_center
+
+        self.columns = list(ORBIT_ATTRIBUTES if columns is None else columns)
+        self.rate = rate
+        self.next_id = itertools.count()
+        self.ids = {}
+        self.vessels = {}
+        self.names = {}
+        self.streams = {}
+        self.body_streams = {}
+        self.rows = []
+        self.body_rows = []
+        self.df = self.empty()
+
+        self.add_vessels(self.sc.vessels if vessels is None else vessels)
+
+    def empty(self):
+        df = pd.DataFrame({c: pd.Series(dtype='float64') for c in self.columns},
+                          index=pd.Index([], dtype='int64', name='vessel_id'))
+        df.insert(0, 'name', pd.Categorical([]))
+        df.insert(1, 'body', pd.Categorical([]))
+        return df
+
+    def add_stream(self, func, *args):
+        stream = self.conn.add_stream(func, *args)
+        if self.rate:
+            stream.rate = self.rate
+        return stream
+
+    def add_vessels(self, vessels):
+        ''' Opens streams for vessels not in the table yet, returns their ids '''
+        new = []
+        for v in dict.fromkeys(vessels):
+            if v in self.ids:
+                continue
+            i = next(self.next_id)
+            self.ids[v] = i
+            self.vessels[i] = v
+            self.names[i] = v.name
+            self.streams[i] = [self.add_stream(getattr, v.orbit, ORBIT_ATTRIBUTES[c]) for c in self.columns]
+            self.body_streams[i] = self.add_stream(getattr, v.orbit.body, 'name')
+            new.append(i)
+        if new:
+            self.reindex()
+        return new
+
+    def remove_vessels(self, vessels):
+        ''' Closes the streams of vessels and drops their rows '''
+        gone = [self.ids.pop(v) for v in dict.fromkeys(vessels) if v in self.ids]
+        for i in gone:
+            del self.vessels[i], self.names[i]
+            for stream in self.streams.pop(i):
+                stream.remove()
+            self.body_streams.pop(i).remove()
+        if gone:
+            self.reindex()
+        return gone
+
+    def reindex(self):
+        ''' Rebuilds the frame for the current rows, only on adds and removes '''
+        ids = list(self.vessels)
+        # row major stream handles in frame order, read by refresh
+        self.rows = [s for i in ids for s in self.streams[i]]
+        self.body_rows = [self.body_streams[i] for i in ids]
+        self.df = self.df.reindex(pd.Index(ids, dtype='int64', name='vessel_id'))
+        self.df['name'] = pd.Categorical([self.names[i] for i in ids])
+        self.refresh()
+
+    def refresh(self):
+        ''' Reads the latest stream values into the typed columns, no RPCs '''
+        values = np.fromiter([s() for s in self.rows], dtype='float64', count=len(self.rows))
+        self.df[self.columns] = values.reshape(len(self.df), len(self.columns))
+        self.df['body'] = pd.Categorical([s() for s in self.body_rows])
+        return self.df
+
+    def rename(self, vessel, name):
+        ''' Keeps the name column current, e.g. from a VesselEventFeed vessel_renamed event '''
+        i = self.ids[vessel]
+        self.names[i] = name
+        self.df['name'] = pd.Categorical([self.names[j] for j in self.df.index])
+
+    def id_of(self, vessel):
+        return self.ids[vessel]
+
+    def vessel(self, vessel_id):
+        return self.vessels[vessel_id]
+
+    def print_table(self, columns=('name', 'body', 'apoapsis', 'periapsis', 'period')):
+        print(tabulate.tabulate(self.df[list(columns)], headers='keys', tablefmt='fancy_grid'))
+
+    def close(self):
+        self.remove_vessels(list(self.ids))
@@ -1,4 +1,3 @@
-from numpy import true_divide
 from comsat_network import ComSatNetwork
 from orbits import OrbitManager, Orbit
 from communications import Communication
@@ -7,7 +6,6 @@ from vessels import VesselManager
 from nodes import NodeManager
 import time
 import krpc
-from communications import Communication
 
 conn = krpc.connect()
 sc = conn.space_center
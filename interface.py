@@ -2,6 +2,7 @@ from abc import update_abstractmethods
 import bokeh
 from bokeh.models import Tabs, TabPanel
 from bokeh.plotting import figure, show, output_file
+from bokeh.models import HoverTool
 from bokeh.models import ColumnDataSource, CustomJS, Slider, Button, Div, DataTable, TableColumn, NumberFormatter, StringFormatter, RangeSlider, Select, TextInput, DataTable
 from bokeh.layouts import column, row
 from bokeh.io import curdoc
@@ -17,20 +18,27 @@ import sys
 
 from orbits import OrbitManager
 from vessels import VesselManager, Vessel
+from vessel_pager import VesselPager, ORBIT_ATTRIBUTES
+from orbit_map import OrbitMap
+from bodies import body_catalogue
 from comsat_network import ComSatNetwork
 from launch import LaunchManager
+from mission_worker import MissionWorker
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
 
 class KSPBokehApp():
-    def __init__(self):
+    def __init__(self, launch_in_process=False):
         self.active_vessel = None
+        # ascent in its own process, telemetry through a shared memory ring
+        self.launch_in_process = launch_in_process
 
         # self.vessel_manager = VesselManager(name='ComSat_0.33')
-        self.vessel_manager = VesselManager(name='2')
+        # server side pages, orbit streams only for the rows on screen
+        self.vessel_pager = VesselPager(name='2', page_size=10)
         self.vessel_source = ColumnDataSource(
-            self.bokehfy_df(self.vessel_manager.df))
+            self.bokehfy_df(self.vessel_pager.rows()))
 
         formatter_dict = {
             'vessel': StringFormatter(),
@@ -45,18 +53,30 @@ class KSPBokehApp():
         }
 
         # Vessels
-        # reset index as TableColumns does not support index
+        # fixed columns, a page can be empty; sorting happens on the server
+        # for the whole fleet, so the table itself is not sortable
+        vessel_columns = ['vessel', 'name', 'body'] + list(ORBIT_ATTRIBUTES)
         columns = [TableColumn(field=Ci, title=Ci, formatter=formatter_dict.get(
-            Ci, None)) for Ci in self.vessel_manager.df.reset_index().columns]
+            Ci, None)) for Ci in vessel_columns]
         self.vessel_table = DataTable(
-            source=self.vessel_source, columns=columns, width=400, height=200)
+            source=self.vessel_source, columns=columns, width=400, height=200, sortable=False)
         # width=800, height=280)
 
+        self.previous_page_button = Button(label="<")
+        self.previous_page_button.on_click(self.previous_vessel_page)
+        self.next_page_button = Button(label=">")
+        self.next_page_button.on_click(self.next_vessel_page)
+        self.vessel_page_status = Div(text=self.vessel_pager.status())
+        self.sort_vessel_select = Select(title="Sort by:", value='name', options=vessel_columns[1:])
+        self.sort_vessel_select.on_change('value', self.sort_vessels)
+        self.sort_order_select = Select(title="Order:", value='ascending', options=['ascending', 'descending'])
+        self.sort_order_select.on_change('value', self.sort_vessels)
+
         self.search_vessel_input = TextInput(value="", title="Search Vessel:")
         self.search_vessel_input.on_change('value', self.search_vessel)
 
         self.update_button = Button(label="Update", button_type="success")
-        self.update_button.on_click(self.update_vessel_source)
+        self.update_button.on_click(self.reload_vessels)
 
         # test stuff
         self.test_btn = Button(label="Test", button_type="success")
@@ -84,54 +104,149 @@ class KSPBokehApp():
 
         self.launch_button = Button(label="Launch", button_type="success")
         self.launch_button.on_click(self.go_for_launch)
+        self.cancel_launch_button = Button(label="Cancel", button_type="danger")
+        self.cancel_launch_button.on_click(self.cancel_launch)
+        self.job_status = Div(text='')
 
         self.fig_launch_telemetry = figure(width=500,height=400)
 
         # self.communication_network_tab = TabPanel(child=column(
             # self.vessel_table, self.update_button, self.test_btn, self.text_test, self.search_vessel_input), title='Communication Network')
-        self.launch_slider_column = column(self.slider_target_altitude, self.slider_turn_start_altitude, self.slider_turn_end_altitude, self.slider_inclination, self.slider_roll, self.slider_max_q, self.slider_end_stage, self.launch_button)
+        self.launch_slider_column = column(self.slider_target_altitude, self.slider_turn_start_altitude, self.slider_turn_end_altitude, self.slider_inclination, self.slider_roll, self.slider_max_q, self.slider_end_stage, self.launch_button, self.cancel_launch_button, self.job_status)
         self.launch_telemetry_column = column(self.fig_launch_telemetry, sizing_mode='stretch_both')
         self.launch_tab = TabPanel(child=row(self.launch_slider_column, self.launch_telemetry_column), title='Launch')
 
-        self.vessels_tab=TabPanel(child = column(self.search_vessel_input, self.vessel_table,
+        self.vessels_tab=TabPanel(child = column(row(self.search_vessel_input, self.sort_vessel_select, self.sort_order_select),
+                                  self.vessel_table,
+                                  row(self.previous_page_button, self.next_page_button, self.vessel_page_status),
                                   self.update_button), title = 'Vessels')
         #self.vessels_tab=column(self.search_vessel_input, self.vessel_table, self.test_btn)
 
-        self.tabs=Tabs(tabs = [self.vessels_tab, self.launch_tab])
+        # Orbit map, WebGL so hundreds of outlines stay interactive; the
+        # orbit streams are only opened once the tab is shown
+        self.orbit_map = None
+        self.orbit_line_source = ColumnDataSource(data={'xs': [], 'ys': [], 'name': []})
+        self.orbit_position_source = ColumnDataSource(data={'x': [], 'y': [], 'name': []})
+        self.body_source = ColumnDataSource(data={'x': [0], 'y': [0], 'radius': [0]})
+        self.fig_orbit_map = figure(width=700, height=700, match_aspect=True, output_backend='webgl')
+        self.fig_orbit_map.circle(x='x', y='y', radius='radius', source=self.body_source,
+                                  fill_color='steelblue', fill_alpha=0.3, line_color=None)
+        self.fig_orbit_map.multi_line(xs='xs', ys='ys', source=self.orbit_line_source,
+                                      line_alpha=0.4, line_width=1)
+        positions = self.fig_orbit_map.scatter(x='x', y='y', source=self.orbit_position_source,
+                                               size=5, color='orange')
+        self.fig_orbit_map.add_tools(HoverTool(renderers=[positions], tooltips=[('name', '@name')]))
+        self.orbit_body_select = Select(title="Body:", value='Kerbin', options=['Kerbin'])
+        self.orbit_body_select.on_change('value', self.select_orbit_body)
+        self.orbit_map_tab = TabPanel(child=column(self.orbit_body_select, self.fig_orbit_map), title='Orbit Map')
+
+        self.tabs=Tabs(tabs = [self.vessels_tab, self.launch_tab, self.orbit_map_tab])
+        self.tabs.on_change('active', self.open_orbit_map)
         self.curdoc = curdoc()
+        self.worker = MissionWorker()
+        self.worker.subscribe(self.update_job_status, doc=self.curdoc)
         #self.curdoc.add_periodic_callback(self.select_active_vessel_index_on_vessel_source, 1000)
+        # streamed values of the visible page only, no RPCs
+        self.curdoc.add_periodic_callback(self.update_vessel_source, 1000)
         self.curdoc.add_root(self.tabs)
         #self.curdoc.add_root(self.vessels_tab)
     def go_for_launch(self):
         ''' Launches the vessel '''
-        self.launch=LaunchManager(self.slider_target_altitude.value,
-                               self.slider_turn_start_altitude.value,
-                               self.slider_turn_end_altitude.value,
-                               self.slider_end_stage.value,
-                               self.slider_inclination.value,
-                               self.slider_roll.value,
-                               self.slider_max_q.value,
-                               staging_options = None)
-
-        # plotting stuff
+        if self.launch_in_process:
+            return self.go_for_launch_process()
+        # plotting stuff, samples from the launch telemetry hub are pushed
+        # by the mission worker on the next tick of this document
         launch_data = {'met' : [],
                        'flight_mean_altitude' : []}
         self.launch_source = ColumnDataSource(data=launch_data)
+        self.launch_start_ut = None
         self.fig_launch_telemetry.line(x='met', y='flight_mean_altitude', source=self.launch_source)
-        # periodic callback for live plotting of launch data
-        self.curdoc.add_periodic_callback(self.stream_launch_source, 1000)
-
-        # Gooooooooo 
-        self.launch.ascent()
-
-    def stream_launch_source(self):
-        ''' Streams the launch telemetry plot '''
-        launch_data = {'met' : [self.launch.met()],
-                       'flight_mean_altitude' : [self.launch.flight_mean_altitude()]}
 
-        self.launch_source.stream(launch_data)
-        
-        
+        # Gooooooooo, in the background so the document stays live
+        self.launch_job = self.worker.launch(
+            telemetry=self.stream_launch_samples, doc=self.curdoc,
+            topics=('met', 'flight_mean_altitude'),
+            target_altitude=self.slider_target_altitude.value,
+            turn_start_altitude=self.slider_turn_start_altitude.value,
+            turn_end_altitude=self.slider_turn_end_altitude.value,
+            end_stage=self.slider_end_stage.value,
+            inclination=self.slider_inclination.value,
+            roll=self.slider_roll.value,
+            max_q=self.slider_max_q.value,
+            staging_options=None)
+
+    def cancel_launch(self):
+        if getattr(self, 'launch_job', None) is not None:
+            self.launch_job.cancel()
+        if getattr(self, 'launch_process', None) is not None:
+            self.launch_process.stop()
+
+    def update_job_status(self, job):
+        ''' Mission worker listener, runs on the document's next tick '''
+        self.job_status.text = (f"{job['name']} #{job['id']}: {job['status']} "
+                                f"{job['progress']:.0%} {job['message']}")
+
+    def go_for_launch_process(self):
+        ''' Launches the vessel from a separate control process '''
+        from telemetry_bus import LaunchProcess
+
+        self.launch_process = LaunchProcess(
+            target_altitude=self.slider_target_altitude.value,
+            turn_start_altitude=self.slider_turn_start_altitude.value,
+            turn_end_altitude=self.slider_turn_end_altitude.value,
+            end_stage=self.slider_end_stage.value,
+            inclination=self.slider_inclination.value,
+            roll=self.slider_roll.value,
+            max_q=self.slider_max_q.value).start()
+
+        self.launch_source = ColumnDataSource(data={'met': [], 'flight_mean_altitude': []})
+        self.fig_launch_telemetry.line(x='met', y='flight_mean_altitude', source=self.launch_source)
+        self.curdoc.add_periodic_callback(self.stream_launch_ring, 250)
+
+    def stream_launch_ring(self):
+        ''' Streams new records from the launch process ring into the plot '''
+        records = self.launch_process.ring.read_new()
+        if len(records):
+            self.launch_source.stream({'met': records['met'].tolist(),
+                                       'flight_mean_altitude': records['altitude'].tolist()})
+
+    def stream_launch_samples(self, samples):
+        ''' Streams a batch of launch telemetry samples into the plot '''
+        for sample in samples:
+            if sample.topic == 'met':
+                self.launch_start_ut = sample.ut - sample.value
+        altitude = [s for s in samples if s.topic == 'flight_mean_altitude']
+        if self.launch_start_ut is None or not altitude:
+            return
+        self.launch_source.stream({'met': [s.ut - self.launch_start_ut for s in altitude],
+                                   'flight_mean_altitude': [s.value for s in altitude]})
+
+    def open_orbit_map(self, attr, old, new):
+        ''' Sets up the orbit map the first time its tab is shown '''
+        if self.tabs.tabs[new] is not self.orbit_map_tab or self.orbit_map is not None:
+            return
+        self.orbit_map = OrbitMap(VesselManager(orbit_flag=True), body=self.orbit_body_select.value)
+        self.orbit_body_select.options = sorted(body_catalogue(self.orbit_map.vessel_manager.conn))
+        self.body_source.data = {'x': [0], 'y': [0], 'radius': [self.orbit_map.radius]}
+        self.update_orbit_map()
+        # outlines only go out when elements change, positions every second
+        self.curdoc.add_periodic_callback(self.update_orbit_map, 1000)
+
+    def select_orbit_body(self, attr, old, new):
+        if self.orbit_map is None:
+            return
+        self.orbit_map.set_body(new)
+        self.body_source.data = {'x': [0], 'y': [0], 'radius': [self.orbit_map.radius]}
+        self.update_orbit_map()
+
+    def update_orbit_map(self):
+        ''' Sends changed orbit outlines and the current positions '''
+        lines, patches = self.orbit_map.update()
+        if lines is not None:
+            self.orbit_line_source.data = lines
+        elif patches is not None:
+            self.orbit_line_source.patch(patches)
+        self.orbit_position_source.data = self.orbit_map.positions()
 
     def teeeest(self):
         selected_vessel=self.vessel_source.selected.indices[0]
@@ -140,8 +255,8 @@ class KSPBokehApp():
 
     def select_active_vessel_index_on_vessel_source(self):
         ''' Selects the active vessel on the vessel_source '''
-        df=self.bokehfy_df(self.vessel_manager.df)
-        active_vessel=self.vessel_manager.active_vessel()
+        df=self.bokehfy_df(self.vessel_pager.rows())
+        active_vessel=self.vessel_pager.sc.active_vessel
         try:
             active_vessel_index=df.index[df['vessel'] == str(active_vessel)].tolist()[
                 0]
@@ -150,8 +265,7 @@ class KSPBokehApp():
             pass
 
     def update_on_search_vessel(self, attr, old, new):
-        self.vessel_manager.name = new
-        self.vessel_manager.df = self.vessel_manager.setup_vessels_df()
+        self.vessel_pager.search(new)
         self.update_vessel_source()
 
     # def select_data_table_row(self, attr, old, new):
@@ -162,13 +276,32 @@ class KSPBokehApp():
 
     def search_vessel(self, attr, old, new):
         ''' Searches for vessels containing the search string '''
+        self.vessel_pager.search(new)
+        self.update_vessel_source()
+
+    def sort_vessels(self, attr, old, new):
+        ''' Sorts the whole fleet on the server and shows the first page '''
+        self.vessel_pager.sort(self.sort_vessel_select.value,
+                               ascending=self.sort_order_select.value == 'ascending')
+        self.update_vessel_source()
+
+    def next_vessel_page(self):
+        self.vessel_pager.next_page()
+        self.update_vessel_source()
 
-        df = self.vessel_manager.fuzzy_search_by_name(new)
-        self.vessel_source.data = self.bokehfy_df(df)
+    def previous_vessel_page(self):
+        self.vessel_pager.previous_page()
+        self.update_vessel_source()
+
+    def reload_vessels(self):
+        ''' Rescans vessel names, e.g. after launches or decouplings '''
+        self.vessel_pager.reload()
+        self.update_vessel_source()
 
     def update_vessel_source(self):
-        ''' Updates the source of the vessel table '''
-        self.vessel_source.data = self.bokehfy_df(self.vessel_manager.df)
+        ''' Updates the source of the vessel table with the current page '''
+        self.vessel_source.data = self.bokehfy_df(self.vessel_pager.rows())
+        self.vessel_page_status.text = self.vessel_pager.status()
 
     def bokehfy_df(self, df):
         ''' Returns dataframe with bokeh compatible data types, currently only vessel objects. Also calls streams if necessary '''
@@ -1,14 +1,14 @@
 import math
+import threading
 import time
 import krpc
-from pkg_resources import get_importer
-import utils.pid
-import pandas as pd
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
 
+from bodies import body_catalogue
 from orbits import OrbitManager
 from nodes import NodeManager
-
-from apscheduler.schedulers.background import BackgroundScheduler
+from telemetry import TelemetryHub
 
 from utils.handle_vessels import (
     manipulate_engines_by_name,
@@ -27,13 +27,16 @@ class LaunchManager():
              inclination=0,
              roll=90,
              max_q=20000,
-             staging_options=None):
+             staging_options=None,
+             pid_gains=(.001, 0.0001, 0.01)):
 
         # initilize vessel
         self.conn = krpc.connect(name='LaunchManager')
 
         self.mj = self.conn.mech_jeb
         self.vessel = self.conn.space_center.active_vessel
+        # constants of the launch body from the session catalogue, no RPCs in the loops
+        self.body = body_catalogue(self.conn)[self.vessel.orbit.body.name]
 
         # ascent parameters
         self.roll = roll
@@ -54,34 +57,36 @@ class LaunchManager():
         self.solar_deployed = False
         self.fairings_jettisoned = False
         self.launch_finished = False
+        # set by turn_end_reached, cancel() ends ascent early
+        self.finished = threading.Event()
+        self.cancelled = threading.Event()
 
         # set up PID controllers
-        self.thrust_controller = PID(P=.001, I=0.0001, D=0.01)
+        # gains can be tuned offline with tuning.PIDTuner
+        P, I, D = pid_gains
+        self.thrust_controller = PID(P=P, I=I, D=D)
         self.thrust_controller.ClampI = self.max_q
         self.thrust_controller.setpoint(self.max_q)
 
-        # telemetry
-        self.ut = self.conn.add_stream(getattr, self.conn.space_center, 'ut')
-        self.met = self.conn.add_stream(getattr, self.vessel, 'met')
+        # telemetry, one stream per value shared with any dashboard or logger
+        # through self.telemetry.subscribe, topics are called like streams
+        self.telemetry = TelemetryHub(self.conn)
+        self.ut = self.telemetry.ut
+        self.met = self.telemetry.add('met', getattr, self.vessel, 'met')
 
-        self.flight_mean_altitude = self.conn.add_stream(getattr, self.vessel.flight(
-            self.vessel.orbit.body.non_rotating_reference_frame), 'mean_altitude')
-        self.flight_dynamic_pressure = self.conn.add_stream(getattr, self.vessel.flight(
-            self.vessel.orbit.body.non_rotating_reference_frame), 'dynamic_pressure')
+        flight = self.vessel.flight(self.vessel.orbit.body.non_rotating_reference_frame)
+        self.flight_mean_altitude = self.telemetry.add('flight_mean_altitude', getattr, flight, 'mean_altitude')
+        self.flight_dynamic_pressure = self.telemetry.add('flight_dynamic_pressure', getattr, flight, 'dynamic_pressure')
         # self.vessel = self.conn.add_stream(getattr, self.conn.space_center, 'active_vessel')
 
-        # self.altitude = self.conn.add_stream(
-            # getattr, self.vessel.flight(), 'mean_altitude')
-        self.apoapsis = self.conn.add_stream(
-            getattr, self.vessel.orbit, 'apoapsis_altitude')
-        self.periapsis = self.conn.add_stream(
-            getattr, self.vessel.orbit, 'periapsis_altitude')
-        self.eccentricity = self.conn.add_stream(
-            getattr, self.vessel.orbit, 'eccentricity')
-        self.inclination = self. conn.add_stream(
-            getattr, self.vessel.orbit, 'inclination')
+        self.apoapsis = self.telemetry.add('apoapsis', getattr, self.vessel.orbit, 'apoapsis_altitude')
+        self.periapsis = self.telemetry.add('periapsis', getattr, self.vessel.orbit, 'periapsis_altitude')
+        self.eccentricity = self.telemetry.add('eccentricity', getattr, self.vessel.orbit, 'eccentricity')
+        self.inclination = self.telemetry.add('inclination', getattr, self.vessel.orbit, 'inclination')
 
 
+        # only needed once a launch is set up, keeps headless imports light
+        from apscheduler.schedulers.background import BackgroundScheduler
         self.scheduler = BackgroundScheduler()
         self.df = self.setup_launch_df()
 
@@ -138,7 +143,7 @@ class LaunchManager():
                 self.staging_done_for_current_stage = False
 
         # Fairings and solar panel deployment
-        if not self.solar_deployed and not self.fairings_jettisoned and self.flight_mean_altitude() > self.vessel.orbit.body.atmosphere_depth:
+        if not self.solar_deployed and not self.fairings_jettisoned and self.flight_mean_altitude() > self.body.atmosphere_depth:
             self.fairing_deployment()
             time.sleep(2)
             self.solar_deployment()
@@ -160,9 +165,10 @@ class LaunchManager():
 
     def gravity_turn(self):
         # quadratic gravity turn_start_altitude
+        from utils.ascent_sim import gravity_turn_pitch
         print('Mean Altitude', self.flight_mean_altitude())
-        frac = self.flight_mean_altitude() / self.turn_end_altitude
-        self.vessel.auto_pilot.target_pitch = 90 - (-90 * frac * (frac - 2))
+        self.vessel.auto_pilot.target_pitch = float(gravity_turn_pitch(
+            self.flight_mean_altitude(), self.turn_start_altitude, self.turn_end_altitude))
         # linit max q
         self.vessel.control.throttle = self.thrust_controller.update(
             self.flight_dynamic_pressure())
@@ -204,8 +210,10 @@ class LaunchManager():
             event.add_callback(self.turn_end_reached)
             event.start()
 
-            while self.launch_finished == False:
-                pass
+            # wait instead of spinning, the scheduler and event threads do the work
+            while not self.finished.wait(0.5):
+                if self.cancelled.is_set():
+                    raise KeyboardInterrupt
 
 
         except KeyboardInterrupt:
@@ -237,8 +245,19 @@ class LaunchManager():
 
         self.scheduler.remove_job('autostaging')
         self.launch_finished = True
+        self.finished.set()
         print('Launch finished')
 
+    def cancel(self):
+        ''' Ends a running ascent from another thread '''
+        self.cancelled.set()
+
+    def progress(self):
+        ''' Rough ascent progress from 0 to 1, apoapsis over target, no RPC '''
+        if self.launch_finished:
+            return 1.
+        return min(max(self.apoapsis() / self.target_altitude, 0.), 0.99)
+
     def thrust_throttle_adjustments(self, remaining_delta_v):
         twr = self.vessel.max_thrust / self.vessel.mass
         if remaining_delta_v < twr / 3:
@@ -253,7 +272,7 @@ class LaunchManager():
     def create_circularization_burn(self):
         # Plan circularization burn (using vis-viva equation)
         print('Planning circularization burn')
-        mu = self.vessel.orbit.body.gravitational_parameter
+        mu = self.body.gravitational_parameter
         r = self.vessel.orbit.apoapsis
         a1 = self.vessel.orbit.semi_major_axis
         a2 = r
@@ -265,7 +284,7 @@ class LaunchManager():
 
         # Calculate burn time (using rocket equation)
         F = self.vessel.available_thrust
-        Isp = self.vessel.specific_impulse * self.vessel.orbit.body.surface_gravity
+        Isp = self.vessel.specific_impulse * self.body.surface_gravity
         m0 = self.vessel.mass
         m1 = m0 / math.exp(delta_v/Isp)
         flow_rate = F / Isp
@@ -0,0 +1,103 @@
+'''
+Headless entry point for mission scripts.
+
+Only the manager a command needs is imported, Bokeh and matplotlib are
+never loaded, and pandas/numpy wait until a table is built.
+
+python mission.py launch --altitude 150000 --inclination 0
+python mission.py deploy --sats 3 --objective time
+python mission.py network 'ComSat_AdAstra_0.3 Probe' --monitor
+python mission.py --profile nodes
+'''
+import argparse
+import sys
+
+
+def launch(args):
+    from launch import LaunchManager
+
+    manager = LaunchManager(target_altitude=args.altitude, inclination=args.inclination,
+                            roll=args.roll, max_q=args.max_q, end_stage=args.end_stage)
+    manager.ascent()
+
+
+def deploy(args):
+    from comsat_network import ComSatNetwork
+
+    coms = ComSatNetwork()
+    coms.release_sats_triangle_orbit(nr_sats=args.sats, objective=args.objective)
+
+
+def recircularize(args):
+    from comsat_network import ComSatNetwork
+
+    coms = ComSatNetwork()
+    coms.init_existing_network(args.constellation)
+    coms.recircularize_multiple_sats()
+
+
+def network(args):
+    from communications import Communication
+
+    com = Communication()
+    com.init_existing_network(args.constellation)
+    if args.monitor:
+        com.monitor_network(drift_tolerance=args.drift_tolerance)
+    else:
+        com.display_network_info()
+
+
+def nodes(args):
+    from nodes import NodeManager
+
+    NodeManager().execute_all_nodes()
+
+
+def parser():
+    parser = argparse.ArgumentParser(description='Headless KSP mission scripts')
+    parser.add_argument('--profile', action='store_true',
+                        help='record RPC latencies per manager method and print them at exit')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('launch', help='ascent to orbit with the active vessel')
+    p.add_argument('--altitude', type=float, default=150000)
+    p.add_argument('--inclination', type=float, default=0)
+    p.add_argument('--roll', type=float, default=90)
+    p.add_argument('--max-q', type=float, default=20000)
+    p.add_argument('--end-stage', type=int, default=8)
+    p.set_defaults(func=launch)
+
+    p = commands.add_parser('deploy', help='release a satellite ring from the active carrier')
+    p.add_argument('--sats', type=int, default=3)
+    p.add_argument('--objective', choices=['time', 'delta_v'], default=None)
+    p.set_defaults(func=deploy)
+
+    p = commands.add_parser('recircularize', help='recircularize every satellite of a constellation')
+    p.add_argument('constellation')
+    p.set_defaults(func=recircularize)
+
+    p = commands.add_parser('network', help='print or monitor a RemoteTech network')
+    p.add_argument('constellation')
+    p.add_argument('--monitor', action='store_true')
+    p.add_argument('--drift-tolerance', type=float, default=1.0)
+    p.set_defaults(func=network)
+
+    p = commands.add_parser('nodes', help='execute all maneuver nodes of the active vessel')
+    p.set_defaults(func=nodes)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.profile:
+        from utils.rpc_profiler import profiler
+        profiler.enable(sleep=True)
+    try:
+        args.func(args)
+    finally:
+        if args.profile:
+            profiler.print_summary()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import itertools
+import queue
+import threading
+import time
+from functools import partial
+
+from utils.lazy import lazy_import
+tabulate = lazy_import('tabulate')
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job():
+    '''
+    One background mission. The function gets the job as first argument
+    and reports through job.report(progress, message), checks for
+    cancellation with job.check() and can register job.on_cancel hooks
+    to stop blocking work (e.g. LaunchManager.cancel).
+    '''
+    ids = itertools.count(1)
+
+    def __init__(self, worker, name, func, args, kwargs):
+        self.worker = worker
+        self.id = next(Job.ids)
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'
+        self.progress = 0.
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.started = None
+        self.ended = None
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.cancel_hooks = []
+
+    def report(self, progress=None, message=None):
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+        self.worker.notify(self)
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise Cancelled
+
+    def on_cancel(self, hook):
+        self.cancel_hooks.append(hook)
+        if self.cancel_event.is_set():
+            hook()
+
+    def cancel(self):
+        if self.done_event.is_set():
+            return
+        self.cancel_event.set()
+        for hook in self.cancel_hooks:
+            hook()
+        self.report(message='cancelling')
+
+    def active(self):
+        return not self.done_event.is_set()
+
+    def wait(self, timeout=None):
+        return self.done_event.wait(timeout)
+
+    def snapshot(self):
+        return {'id': self.id, 'name': self.name, 'status': self.status, 'progress': self.progress,
+                'message': self.message, 'error': None if self.error is None else repr(self.error),
+                'runtime': None if self.started is None else (self.ended or time.time()) - self.started}
+
+
+class MissionWorker():
+    '''
+    Runs launches, constellation deployments and node executions as
+    background jobs, one at a time since they share the active vessel.
+
+    Listeners and telemetry are pushed to Bokeh documents with
+    doc.add_next_tick_callback, the only thread safe way into a document,
+    so the UI keeps running its own callbacks during a flight.
+
+    worker = MissionWorker()
+    job = worker.launch(target_altitude=150000)
+    job.cancel()
+    '''
+    def __init__(self):
+        self.jobs = []
+        self.pending = queue.Queue()
+        self.listeners = []
+        self.current = None
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, name, func, *args, **kwargs):
+        ''' Queues func(job, *args, **kwargs) and returns the job '''
+        job = Job(self, name, func, args, kwargs)
+        self.jobs.append(job)
+        self.pending.put(job)
+        self.notify(job)
+        return job
+
+    def run(self):
+        while self.running:
+            try:
+                job = self.pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if job.cancel_event.is_set():
+                job.status = 'cancelled'
+                job.done_event.set()
+                self.notify(job)
+                continue
+
+            self.current = job
+            job.status = 'running'
+            job.started = time.time()
+            self.notify(job)
+            try:
+                job.result = job.func(job, *job.args, **job.kwargs)
+                job.status = 'cancelled' if job.cancel_event.is_set() else 'done'
+                if job.status == 'done':
+                    job.progress = 1.
+            except Cancelled:
+                job.status = 'cancelled'
+            except Exception as e:
+                print(f'MissionWorker: {job.name} failed: {e!r}')
+                job.status = 'failed'
+                job.error = e
+            job.ended = time.time()
+            self.current = None
+            job.done_event.set()
+            self.notify(job)
+
+    def stop(self):
+        for job in self.jobs:
+            if job.active():
+                job.cancel()
+        self.running = False
+        self.thread.join()
+
+    # push to listeners and documents
+
+    def subscribe(self, callback, doc=None):
+        ''' callback(job snapshot) on every job change, on doc's next tick if given '''
+        self.listeners.append((callback, doc))
+
+    def notify(self, job):
+        snapshot = job.snapshot()
+        for callback, doc in self.listeners:
+            self.push(doc, callback, snapshot)
+
+    @staticmethod
+    def push(doc, callback, *args):
+        if doc is None:
+            callback(*args)
+        else:
+            doc.add_next_tick_callback(partial(callback, *args))
+
+    def pump(self, job, subscription, callback, doc=None, rate=10.):
+        '''
+        Forwards telemetry samples of a TelemetryHub subscription in
+        batches of up to rate per second while job is active
+        '''
+        def run():
+            while job.active():
+                samples = subscription.drain()
+                if samples:
+                    self.push(doc, callback, samples)
+                job.done_event.wait(1 / rate)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    # missions
+
+    def launch(self, telemetry=None, doc=None, topics=('flight_mean_altitude',), rate=10., **launch_kwargs):
+        '''
+        LaunchManager ascent as a job, telemetry(samples) gets the
+        launch telemetry hub samples of topics
+        '''
+        def mission(job):
+            from launch import LaunchManager
+
+            launch = LaunchManager(**launch_kwargs)
+            job.launch = launch
+            job.on_cancel(launch.cancel)
+            if telemetry is not None:
+                subscription = launch.telemetry.subscribe(list(topics), maxsize=1000, policy='drop_oldest')
+                self.pump(job, subscription, telemetry, doc, rate)
+
+            progress = threading.Thread(target=self.track, args=(job, launch.progress), daemon=True)
+            progress.start()
+            launch.ascent()
+            job.check()
+            return launch
+
+        return self.submit('launch', mission)
+
+    def track(self, job, progress, interval=1.):
+        ''' Reports progress() every interval while job is active '''
+        while not job.done_event.wait(interval):
+            try:
+                job.report(progress())
+            except Exception:
+                pass
+
+    def deploy(self, nr_sats, objective=None):
+        ''' ComSatNetwork.release_sats_triangle_orbit as a job, cancellable between satellites '''
+        def mission(job):
+            from comsat_network import ComSatNetwork
+
+            coms = ComSatNetwork()
+            coms.release_sats_triangle_orbit(nr_sats, objective, job=job)
+            return coms
+
+        return self.submit('deploy', mission)
+
+    def execute_nodes(self):
+        ''' All maneuver nodes of the active vessel, cancelling aborts the executor '''
+        def mission(job):
+            from nodes import NodeManager
+
+            nodes = NodeManager()
+            executor = nodes.mj.node_executor
+            executor.tolerance = 0.01
+            executor.lead_time = 60
+            total = len(nodes.sc.active_vessel.control.nodes)
+            executor.execute_all_nodes()
+            job.on_cancel(executor.abort)
+
+            with nodes.conn.stream(getattr, executor, 'enabled') as enabled:
+                enabled.rate = 1
+                while enabled() and not job.cancel_event.wait(1):
+                    left = len(nodes.sc.active_vessel.control.nodes)
+                    job.report((total - left) / max(total, 1), f'{left} nodes left')
+            job.check()
+
+        return self.submit('execute_nodes', mission)
+
+    def print_jobs(self):
+        print(tabulate.tabulate([j.snapshot() for j in self.jobs], headers='keys', tablefmt='fancy_grid'))
@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+
+import krpc
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+tabulate = lazy_import('tabulate')
+
+
+class NetworkMonitor():
+    '''
+    Long-running RemoteTech network health monitor.
+
+    Subscribes once per vessel to the few values that matter: ground
+    station connectivity, every antenna's connection and target, and the
+    orbital period for drift. Stream callbacks only enqueue raw updates,
+    a dispatcher thread folds them into the network model and emits an
+    event to subscribers when a status actually changes.
+
+    monitor = NetworkMonitor(vessel_list)
+    monitor.subscribe(print)
+    monitor.start()
+    '''
+    def __init__(self, vessel_list, drift_tolerance=1.0, connection_rate=1.0, orbit_rate=0.1):
+        self.conn = krpc.connect(name='NetworkMonitor')
+        self.sc = self.conn.space_center
+        self.rt = self.conn.remote_tech
+        print('NetworkMonitor connected ...')
+
+        self.ut = self.conn.add_stream(getattr, self.sc, 'ut')
+        self.ut.rate = connection_rate
+
+        self.drift_tolerance = drift_tolerance
+        self.connection_rate = connection_rate
+        self.orbit_rate = orbit_rate
+
+        self.model = {}
+        self.streams = {}
+        self.subscribers = []
+        self.updates = queue.Queue()
+        self.lock = threading.Lock()
+        self.running = False
+        self.dispatcher = None
+
+        for vessel in vessel_list:
+            self.add_vessel(vessel)
+
+    def subscribe(self, callback, event_types=None):
+        ''' callback(event) for every event, or only for the given event types '''
+        self.subscribers.append((callback, None if event_types is None else set(event_types)))
+
+    def add_stream(self, key, rate, func, *args):
+        stream = self.conn.add_stream(func, *args)
+        stream.rate = rate
+        stream.add_callback(lambda value, key=key: self.updates.put((key, value)))
+        # baseline, in case the first update arrived before the callback was added
+        self.updates.put((key, stream()))
+        self.streams[key] = stream
+        return stream
+
+    def add_vessel(self, vessel):
+        ''' Starts watching one vessel, the current values become the baseline '''
+        name = vessel.name
+        comms = self.rt.comms(vessel)
+        antennas = comms.antennas
+        with self.lock:
+            self.model[vessel] = {
+                'name': name,
+                'ground': None,
+                'period': None,
+                'reference_period': vessel.orbit.period,
+                'drifting': False,
+                'antennas': {i: {'part': a.part.name, 'antenna': a, 'connected': None, 'target': None}
+                             for i, a in enumerate(antennas)},
+            }
+
+        self.add_stream((vessel, 'ground'), self.connection_rate, getattr, comms, 'has_connection_to_ground_station')
+        self.add_stream((vessel, 'period'), self.orbit_rate, getattr, vessel.orbit, 'period')
+        for i, antenna in enumerate(antennas):
+            self.add_stream((vessel, 'connected', i), self.connection_rate, getattr, antenna, 'has_connection')
+            self.add_stream((vessel, 'target', i), self.connection_rate, getattr, antenna, 'target')
+
+    def remove_vessel(self, vessel):
+        for key in [k for k in self.streams if k[0] == vessel]:
+            self.streams.pop(key).remove()
+        with self.lock:
+            self.model.pop(vessel, None)
+
+    def target_name(self, antenna, target):
+        ''' Resolves a target enum to a name, one RPC and only on change '''
+        Target = self.rt.Target
+        try:
+            if target == Target.celestial_body:
+                return antenna.target_body.name
+            if target == Target.vessel:
+                return antenna.target_vessel.name
+            if target == Target.ground_station:
+                return antenna.target_ground_station
+            if target == Target.active_vessel:
+                return 'Active vessel'
+        except krpc.error.RPCError:
+            return 'Error retrieving target'
+        return 'No target'
+
+    def apply(self, key, value):
+        ''' Folds one update into the model, returns an event dict or None '''
+        vessel, kind = key[0], key[1]
+        with self.lock:
+            entry = self.model.get(vessel)
+            if entry is None:
+                return None
+            event = {'vessel': entry['name'], 'ut': None}
+
+            if kind == 'ground':
+                old, entry['ground'] = entry['ground'], value
+                if old is None or old == value:
+                    return None
+                event.update(type='ground_connection', old=old, new=value)
+
+            elif kind == 'period':
+                entry['period'] = value
+                drifting = abs(value - entry['reference_period']) > self.drift_tolerance
+                if drifting == entry['drifting']:
+                    return None
+                entry['drifting'] = drifting
+                event.update(type='orbit_drift', old=entry['reference_period'], new=value)
+
+            else:
+                antenna = entry['antennas'][key[2]]
+                if kind == 'connected':
+                    old, antenna['connected'] = antenna['connected'], value
+                    if old is None or old == value:
+                        return None
+                    event.update(type='link', antenna=antenna['part'], old=old, new=value)
+                else:
+                    # resolved outside the lock below
+                    event.update(type='target', antenna=antenna['part'], index=key[2], new=value)
+
+        if event['type'] == 'target':
+            name = self.target_name(entry['antennas'][key[2]]['antenna'], value)
+            with self.lock:
+                antenna = entry['antennas'][key[2]]
+                old, antenna['target'] = antenna['target'], name
+            if old is None or old == name:
+                return None
+            event.update(old=old, new=name)
+        return event
+
+    def emit(self, event):
+        for callback, types in self.subscribers:
+            if types is None or event['type'] in types:
+                callback(event)
+
+    def dispatch(self):
+        while self.running:
+            try:
+                key, value = self.updates.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            event = self.apply(key, value)
+            if event is not None:
+                event['ut'] = self.ut()
+                self.emit(event)
+
+    def start(self):
+        ''' Starts the dispatcher thread, events are emitted from there '''
+        if self.running:
+            return
+        self.running = True
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def stop(self):
+        self.running = False
+        if self.dispatcher is not None:
+            self.dispatcher.join()
+        for stream in self.streams.values():
+            stream.remove()
+        self.streams = {}
+
+    def reset_drift_reference(self):
+        ''' Takes the current periods as the new drift reference '''
+        with self.lock:
+            for entry in self.model.values():
+                if entry['period'] is not None:
+                    entry['reference_period'] = entry['period']
+                    entry['drifting'] = False
+
+    def status_df(self):
+        ''' Current network model as a dataframe, no RPCs '''
+        with self.lock:
+            rows = [{
+                'name': e['name'],
+                'ground': e['ground'],
+                'links': sum(bool(a['connected']) for a in e['antennas'].values()),
+                'antennas': len(e['antennas']),
+                'period': e['period'],
+                'drifting': e['drifting'],
+            } for e in self.model.values()]
+        return pd.DataFrame(rows)
+
+    def print_status(self):
+        print(tabulate.tabulate(self.status_df(), headers='keys', tablefmt='fancy_grid'))
+
+    def watch(self):
+        ''' Prints events until interrupted '''
+        self.subscribe(lambda e: print(f"[UT {e['ut']:.0f}] {e['vessel']}: {e['type']} "
+                                       f"{e.get('antenna', '')} {e['old']} -> {e['new']}"))
+        self.start()
+        self.print_status()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
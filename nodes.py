@@ -1,7 +1,8 @@
 import math
 import time
 import krpc
-import pandas as pd
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
 
 from utils.handle_vessels import (
     manipulate_engines_by_name,
@@ -48,10 +49,10 @@ class NodeManager():
         print(self.nodes_list)
 
 
-    def execute_node(self):
+    def execute_node(self, lead_time=5, tolerance=0.01):
         executor = self.mj.node_executor
-        executor.tolerance = 0.01
-        executor.lead_time = 5
+        executor.tolerance = tolerance
+        executor.lead_time = lead_time
         executor.execute_one_node()
 
         with self.conn.stream(getattr, executor, 'enabled') as enabled:
@@ -78,8 +79,8 @@ class NodeManager():
 
 
 class Node():
-    def __init__(self, vessel=None):
-        self.conn = krpc.connect(name="Vessel")
+    def __init__(self, vessel=None, conn=None):
+        self.conn = krpc.connect(name="Vessel") if conn is None else conn
         self.sc = self.conn.space_center
         self.mj = self.conn.mech_jeb
 
@@ -0,0 +1,168 @@
+import numpy as np
+
+from utils.kepler import orbit_normal
+
+# snapshot columns the index sorts, periapsis and apoapsis are altitudes
+KEYS = ['semi_major_axis', 'inclination', 'longitude_of_ascending_node', 'periapsis', 'apoapsis']
+# query names that differ from the column
+ALIASES = {'raan': 'longitude_of_ascending_node'}
+ANGLES = {'inclination', 'longitude_of_ascending_node'}
+
+
+class _BodyIndex():
+    ''' Sorted copies of every key for the vessels around one body '''
+    def __init__(self, labels, values):
+        self.labels = labels
+        self.values = values
+        self.order = {k: np.argsort(v, kind='stable') for k, v in values.items()}
+        self.sorted = {k: values[k][self.order[k]] for k in values}
+        self.normals = orbit_normal(values['inclination'], values['longitude_of_ascending_node'])
+
+    def slices(self, key, lo, hi):
+        ''' Sorted position ranges with lo <= value <= hi, two if an angle range wraps '''
+        if key == 'longitude_of_ascending_node' and lo is not None and hi is not None and lo > hi:
+            return self.slices(key, lo, None) + self.slices(key, None, hi)
+        values = self.sorted[key]
+        start = 0 if lo is None else int(values.searchsorted(lo, side='left'))
+        end = len(values) if hi is None else int(values.searchsorted(hi, side='right'))
+        return [(start, max(end, start))]
+
+    def contains(self, key, rows, lo, hi):
+        values = self.values[key][rows]
+        if key == 'longitude_of_ascending_node' and lo is not None and hi is not None:
+            return (values - lo) % (2 * np.pi) <= (hi - lo) % (2 * np.pi)
+        inside = np.ones(len(rows), dtype=bool)
+        if lo is not None:
+            inside &= values >= lo
+        if hi is not None:
+            inside &= values <= hi
+        return inside
+
+    def query(self, ranges):
+        ''' Rows inside every range, walking the narrowest sorted slice only '''
+        if not ranges:
+            return np.arange(len(self.labels))
+        slices = {k: self.slices(k, lo, hi) for k, (lo, hi) in ranges.items()}
+        key = min(slices, key=lambda k: sum(end - start for start, end in slices[k]))
+        order = self.order[key]
+        rows = np.concatenate([order[start:end] for start, end in slices[key]]) if len(slices[key]) > 1 \
+            else order[slices[key][0][0]:slices[key][0][1]]
+        for other, (lo, hi) in ranges.items():
+            if other != key and len(rows):
+                rows = rows[self.contains(other, rows, lo, hi)]
+        return rows
+
+    def near_plane(self, normal, tolerance):
+        '''
+        Rows whose orbit normal is within tolerance radians of normal. The
+        normals are at least the inclination difference apart, so only the
+        inclination slice around the plane is compared exactly.
+        '''
+        inclination = np.arccos(np.clip(normal[2], -1, 1))
+        (start, end), = self.slices('inclination', inclination - tolerance, inclination + tolerance)
+        rows = self.order['inclination'][start:end]
+        return rows[self.normals[rows] @ normal >= np.cos(tolerance)]
+
+
+class OrbitIndex():
+    '''
+    Range index over the orbits of a fleet snapshot.
+
+    Per body, semi-major axis, inclination, RAAN and periapsis/apoapsis
+    altitude are kept as sorted arrays, so range questions are a few
+    searchsorted calls and a filter of the narrowest slice instead of a
+    mask over the whole DataFrame. Built from a FleetTable or
+    Fleet.snapshot() frame, update() re-sorts on every new snapshot.
+
+    Queries return index labels of the snapshot (vessel ids, or
+    (server, vessel id) for a Fleet). Angles are in degrees, distances in
+    metres.
+
+    index = OrbitIndex(table.df)
+    index.query('Kerbin', altitude=(2000e3, 3000e3))
+    index.polar('Kerbin')
+    index.coplanar(vessel_id, tolerance=1.)
+    '''
+    def __init__(self, df=None):
+        self.bodies = {}
+        self.locations = {}
+        if df is not None:
+            self.update(df)
+
+    def update(self, df):
+        ''' Rebuilds the index from a snapshot with a body column and the KEYS columns '''
+        self.bodies = {}
+        self.locations = {}
+        df = df.dropna(subset=KEYS)
+        for body, group in df.groupby('body', observed=True, sort=False):
+            labels = np.asarray(group.index)
+            values = {k: group[k].to_numpy(dtype=float) for k in KEYS}
+            self.bodies[body] = _BodyIndex(labels, values)
+            self.locations.update((label, (body, row)) for row, label in enumerate(labels))
+        return self
+
+    def __len__(self):
+        return len(self.locations)
+
+    def ranges(self, semi_major_axis=None, inclination=None, raan=None, periapsis=None, apoapsis=None,
+               altitude=None):
+        ''' Query keywords to (lo, hi) per column, radians for angles, None for an open end '''
+        ranges = {}
+        given = {'semi_major_axis': semi_major_axis, 'inclination': inclination, 'raan': raan,
+                 'periapsis': periapsis, 'apoapsis': apoapsis}
+        if altitude is not None:
+            # the whole orbit between the two altitudes
+            lo, hi = altitude
+            ranges['periapsis'] = (lo, None)
+            ranges['apoapsis'] = (None, hi)
+        for name, bounds in given.items():
+            if bounds is None:
+                continue
+            key = ALIASES.get(name, name)
+            lo, hi = bounds
+            if key == 'longitude_of_ascending_node' and lo is not None and hi is not None and hi - lo >= 360:
+                # the whole circle, both ends would wrap to the same angle
+                continue
+            if key in ANGLES:
+                lo = None if lo is None else np.radians(lo)
+                hi = None if hi is None else np.radians(hi)
+                if key == 'longitude_of_ascending_node':
+                    lo = None if lo is None else lo % (2 * np.pi)
+                    hi = None if hi is None else hi % (2 * np.pi)
+            if key in ranges:
+                old_lo, old_hi = ranges[key]
+                lo = old_lo if lo is None else lo if old_lo is None else max(lo, old_lo)
+                hi = old_hi if hi is None else hi if old_hi is None else min(hi, old_hi)
+            ranges[key] = (lo, hi)
+        return ranges
+
+    def query(self, body=None, **ranges):
+        '''
+        Labels of vessels around body (default every body) inside all
+        given ranges, each a (lo, hi) tuple with None for an open end:
+        semi_major_axis, inclination, raan (wraps, e.g. (350, 10)),
+        periapsis, apoapsis, and altitude for periapsis and apoapsis both
+        inside.
+        '''
+        ranges = self.ranges(**ranges)
+        bodies = self.bodies if body is None else [body] if body in self.bodies else []
+        found = [self.bodies[b].labels[self.bodies[b].query(ranges)] for b in bodies]
+        return np.concatenate(found) if found else np.empty(0, dtype=object)
+
+    def polar(self, body=None, tolerance=10.):
+        ''' Inclination within tolerance degrees of 90, either direction '''
+        return self.query(body, inclination=(90 - tolerance, 90 + tolerance))
+
+    def near_plane(self, body, inclination, raan, tolerance=1.):
+        ''' Vessels around body whose orbit plane is within tolerance degrees of the given plane '''
+        if body not in self.bodies:
+            return np.empty(0, dtype=object)
+        index = self.bodies[body]
+        normal = orbit_normal(np.radians(inclination), np.radians(raan))
+        return index.labels[index.near_plane(normal, np.radians(tolerance))]
+
+    def coplanar(self, label, tolerance=1.):
+        ''' Vessels in the orbit plane of the vessel with this label, itself included '''
+        body, row = self.locations[label]
+        index = self.bodies[body]
+        return index.labels[index.near_plane(index.normals[row], np.radians(tolerance))]
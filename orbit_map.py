@@ -0,0 +1,95 @@
+import numpy as np
+
+from bodies import body_catalogue
+
+from utils.kepler import orbit_polylines, position_from_elements, true_to_mean_anomaly, wrap_angle
+
+ELEMENTS = ['semi_major_axis', 'eccentricity', 'inclination', 'longitude_of_ascending_node', 'argument_of_periapsis']
+
+
+class OrbitMap():
+    '''
+    Top down map of every orbit around one body, computed from the element
+    streams of a VesselManager(orbit_flag=True) with vectorized Kepler math.
+
+    Orbit outlines are cached per vessel and only recomputed when its
+    elements move beyond tolerance (relative for the semi-major axis,
+    absolute for eccentricity and radians for angles), so a steady fleet
+    costs one position update per refresh.
+
+    orbit_map = OrbitMap(VesselManager(orbit_flag=True))
+    lines, patches = orbit_map.update()
+    orbit_map.positions()
+    '''
+    def __init__(self, vessel_manager, body='Kerbin', points=128, tolerance=1e-3):
+        self.vessel_manager = vessel_manager
+        self.points = points
+        self.tolerance = tolerance
+        self.set_body(body)
+
+    def set_body(self, body):
+        ''' Shows orbits around body, drops the outline cache '''
+        self.body = body
+        self.radius = body_catalogue(self.vessel_manager.conn)[body].equatorial_radius
+        self.vessels = []
+        self.names = []
+        self.elements = np.empty((0, len(ELEMENTS)))
+        self.current = self.elements
+        self.true_anomaly = np.empty(0)
+        self.xs = []
+        self.ys = []
+
+    def read(self):
+        ''' Vessels around the body and their elements from the stream caches, no RPCs '''
+        df = self.vessel_manager.df
+        if df is None:
+            return [], [], np.empty((0, len(ELEMENTS))), np.empty(0)
+        df = df[[b() == self.body for b in df['body']]]
+        vessels = list(df.index)
+        elements = np.array([[s() for s in df[c]] for c in ELEMENTS], dtype=float).T.reshape(-1, len(ELEMENTS))
+        true_anomaly = np.array([s() for s in df['true_anomaly']], dtype=float)
+        return vessels, list(df['name']), elements, true_anomaly
+
+    def changed(self, old, new):
+        ''' Rows whose elements moved beyond tolerance '''
+        delta = np.abs(new - old)
+        delta[:, 0] /= np.abs(old[:, 0])
+        delta[:, 2:] = np.abs(wrap_angle(new[:, 2:] - old[:, 2:]))
+        return (delta > self.tolerance).any(axis=1)
+
+    def outlines(self, elements):
+        lines = orbit_polylines(*elements.T, points=self.points)
+        return list(lines[..., 0]), list(lines[..., 1])
+
+    def update(self):
+        '''
+        Refreshes elements and positions. Returns (lines, patches): lines is
+        the full outline data when the set of vessels changed, otherwise
+        patches holds only the outlines that moved, both None when nothing
+        has to be sent.
+        '''
+        vessels, names, elements, self.true_anomaly = self.read()
+        self.current = elements
+        if vessels != self.vessels:
+            self.vessels, self.names, self.elements = vessels, names, elements.copy()
+            self.xs, self.ys = self.outlines(elements)
+            return self.lines(), None
+
+        self.names = names
+        rows = np.flatnonzero(self.changed(self.elements, elements))
+        if not len(rows):
+            return None, None
+        self.elements[rows] = elements[rows]
+        xs, ys = self.outlines(elements[rows])
+        for i, x, y in zip(rows, xs, ys):
+            self.xs[i], self.ys[i] = x, y
+        return None, {'xs': list(zip(rows.tolist(), xs)), 'ys': list(zip(rows.tolist(), ys))}
+
+    def lines(self):
+        return {'xs': self.xs, 'ys': self.ys, 'name': self.names}
+
+    def positions(self):
+        ''' Current positions from the last update '''
+        e = self.current[:, 1]
+        position = position_from_elements(*self.current.T, true_to_mean_anomaly(self.true_anomaly, e))
+        return {'x': position[:, 0], 'y': position[:, 1], 'name': self.names}
@@ -2,10 +2,9 @@ import math
 import time
 
 import krpc
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import tabulate
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+tabulate = lazy_import('tabulate')
 import operator
 
 
@@ -21,6 +20,19 @@ from utils.handle_vessels import (
     switch_vessel,
 )
 
+# numeric orbit columns and their kRPC Orbit attributes
+ORBIT_ATTRIBUTES = {
+    'eccentricity': 'eccentricity',
+    'inclination': 'inclination',
+    'semi_major_axis': 'semi_major_axis',
+    'longitude_of_ascending_node': 'longitude_of_ascending_node',
+    'argument_of_periapsis': 'argument_of_periapsis',
+    'true_anomaly': 'true_anomaly',
+    'apoapsis': 'apoapsis_altitude',
+    'periapsis': 'periapsis_altitude',
+    'period': 'period',
+}
+
 
 class OrbitManager():
     def __init__(self, df=None, instance_name='OrbitManager'):
@@ -173,7 +185,9 @@ class Orbit():
             getattr, self.vessel.orbit, 'argument_of_periapsis')
         self.true_anomaly = self.conn.add_stream(
             getattr, self.vessel.orbit, 'true_anomaly')
+        # only changes on SOI transitions, no need for the full stream rate
         self.body = self.conn.add_stream(getattr, self.vessel.orbit.body, 'name')
+        self.body.rate = 1
 
         # orbital elements
         self.apoapsis = self.conn.add_stream(
@@ -207,6 +221,13 @@ class Orbit():
         df = df.set_index('vessel')
         return df 
 
+    def remove_streams(self):
+        ''' Removes all element streams of this orbit '''
+        for name in ['eccentricity', 'inclination', 'semi_major_axis', 'longitude_of_ascending_node',
+                     'argument_of_periapsis', 'true_anomaly', 'body', 'apoapsis', 'periapsis',
+                     'period', 'time_to_apoapsis', 'time_to_periapsis']:
+            getattr(self, name).remove()
+
     def set_altitude_and_circularize(self, desired_inclination, desired_altitude):
         # inclination
         if abs(self.inclination() * (180 / math.pi) - desired_inclination) > 0.001:
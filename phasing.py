@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import tabulate
+
+from utils.kepler import orbital_period, true_to_mean_anomaly, vis_viva, wrap_angle
+
+
+class ConstellationPhasing():
+    '''
+    Phase spacing analysis and correction for satellite rings.
+
+    Works on one element snapshot (the orbit columns of VesselManager.df,
+    angles in radians as kRPC returns them). Satellites are grouped into
+    rings by body, semi-major axis and orbital plane. Each satellite's
+    mean longitude is compared with ideal 360/N spacing, and a two burn
+    phasing maneuver is solved for every satellite outside tolerance.
+
+    bodies maps body names to dicts with 'gravitational_parameter',
+    'equatorial_radius' and 'atmosphere_depth'.
+    '''
+    def __init__(self, bodies, tolerance=1.0, sma_tolerance=0.01, plane_tolerance=1.0,
+                 max_revolutions=3, periapsis_margin=10000):
+        self.bodies = bodies
+        self.tolerance = np.radians(tolerance)
+        self.sma_tolerance = sma_tolerance
+        self.plane_tolerance = np.radians(plane_tolerance)
+        self.max_revolutions = max_revolutions
+        self.periapsis_margin = periapsis_margin
+
+    def assign_rings(self, df):
+        ''' Ring id per row, rings share body, semi-major axis and plane '''
+        body_codes = pd.factorize(df['body'])[0]
+        sma = df['semi_major_axis'].to_numpy(dtype=float)
+        inc = df['inclination'].to_numpy(dtype=float)
+        lan = df['longitude_of_ascending_node'].to_numpy(dtype=float)
+        normals = np.stack([np.sin(inc) * np.sin(lan), -np.sin(inc) * np.cos(lan), np.cos(inc)], axis=1)
+
+        # split sorted semi-major axes at body changes and relative gaps
+        order = np.lexsort((sma, body_codes))
+        gaps = np.diff(sma[order]) / sma[order][1:] > self.sma_tolerance
+        breaks = np.concatenate([[True], gaps | (np.diff(body_codes[order]) != 0)])
+        shell = np.empty(len(df), dtype=int)
+        shell[order] = np.cumsum(breaks) - 1
+
+        # split every shell by orbital plane
+        ring = np.full(len(df), -1)
+        next_ring = 0
+        for s in np.unique(shell):
+            members = np.flatnonzero(shell == s)
+            while len(members):
+                cos_angle = normals[members] @ normals[members[0]]
+                same_plane = cos_angle >= np.cos(self.plane_tolerance)
+                ring[members[same_plane]] = next_ring
+                members = members[~same_plane]
+                next_ring += 1
+        return ring
+
+    def analyze(self, df):
+        '''
+        Returns ring, mean longitude, ideal slot longitude and the
+        deviation from it (degrees, positive means ahead of the slot)
+        for every satellite.
+        '''
+        mean_anomaly = true_to_mean_anomaly(df['true_anomaly'].to_numpy(dtype=float),
+                                            df['eccentricity'].to_numpy(dtype=float))
+        mean_longitude = (df['longitude_of_ascending_node'].to_numpy(dtype=float)
+                          + df['argument_of_periapsis'].to_numpy(dtype=float)
+                          + mean_anomaly) % (2 * np.pi)
+        ring = self.assign_rings(df)
+        ideal = np.empty(len(df))
+        ring_size = np.empty(len(df), dtype=int)
+
+        for r in np.unique(ring):
+            members = np.flatnonzero(ring == r)
+            members = members[np.argsort(mean_longitude[members])]
+            n = len(members)
+            offsets = mean_longitude[members] - np.arange(n) * 2 * np.pi / n
+            # try every satellite as reference, keep the one leaving the fewest out of tolerance
+            dev = wrap_angle(offsets[None, :] - offsets[:, None])
+            outside = np.abs(dev) > self.tolerance
+            score = outside.sum(axis=1) * 4 * np.pi * n + np.abs(dev).sum(axis=1)
+            k = np.argmin(score)
+            inside = ~outside[k]
+            reference = offsets[k] + np.angle(np.exp(1j * dev[k][inside]).mean())
+            ideal[members] = (reference + np.arange(n) * 2 * np.pi / n) % (2 * np.pi)
+            ring_size[members] = n
+
+        return pd.DataFrame({
+            'ring': ring,
+            'ring_size': ring_size,
+            'mean_longitude': np.degrees(mean_longitude),
+            'ideal_longitude': np.degrees(ideal),
+            'phase_deviation': np.degrees(wrap_angle(mean_longitude - ideal)),
+        }, index=df.index)
+
+    def solve(self, df, ut, analysis=None):
+        '''
+        Phasing burns for every satellite outside tolerance, solved for
+        all satellites and revolution counts at once. The first burn is
+        at periapsis, the second one after the phasing orbits restores the
+        original orbit. Returns a DataFrame of corrections.
+        '''
+        if analysis is None:
+            analysis = self.analyze(df)
+        needs = np.abs(np.radians(analysis['phase_deviation'].to_numpy())) > self.tolerance
+        if not needs.any():
+            return pd.DataFrame(columns=['revolutions', 'phasing_period', 'burn_dv',
+                                         'total_dv', 'burn_ut', 'return_ut'])
+        sats = df[needs]
+        deviation = np.radians(analysis['phase_deviation'].to_numpy()[needs])
+
+        mu = sats['body'].map(lambda b: self.bodies[b]['gravitational_parameter']).to_numpy(dtype=float)
+        min_radius = sats['body'].map(lambda b: self.bodies[b]['equatorial_radius']
+                                      + self.bodies[b]['atmosphere_depth']).to_numpy(dtype=float)
+        min_radius = min_radius + self.periapsis_margin
+        sma = sats['semi_major_axis'].to_numpy(dtype=float)
+        ecc = sats['eccentricity'].to_numpy(dtype=float)
+        period = orbital_period(sma, mu)
+        r_burn = sma * (1 - ecc)
+
+        # (satellites, revolutions) grid
+        revolutions = np.arange(1, self.max_revolutions + 1)[None, :]
+        phasing_period = period[:, None] * (1 + deviation[:, None] / (2 * np.pi * revolutions))
+        phasing_sma = sma[:, None] * (phasing_period / period[:, None]) ** (2 / 3)
+        other_apsis = 2 * phasing_sma - r_burn[:, None]
+        burn_dv = vis_viva(r_burn[:, None], phasing_sma, mu[:, None]) - vis_viva(r_burn, sma, mu)[:, None]
+        total_dv = np.where(np.minimum(other_apsis, r_burn[:, None]) >= min_radius[:, None],
+                            2 * np.abs(burn_dv), np.inf)
+        best = np.argmin(total_dv, axis=1)
+        rows = np.arange(len(sats))
+
+        mean_anomaly = true_to_mean_anomaly(sats['true_anomaly'].to_numpy(dtype=float), ecc)
+        burn_ut = ut + ((2 * np.pi - mean_anomaly) % (2 * np.pi)) / (2 * np.pi) * period
+
+        corrections = pd.DataFrame({
+            'ring': analysis['ring'].to_numpy()[needs],
+            'phase_deviation': np.degrees(deviation),
+            'revolutions': revolutions[0, best],
+            'phasing_period': phasing_period[rows, best],
+            'burn_dv': burn_dv[rows, best],
+            'total_dv': total_dv[rows, best],
+            'burn_ut': burn_ut,
+            'return_ut': burn_ut + revolutions[0, best] * phasing_period[rows, best],
+        }, index=sats.index)
+        if not np.isfinite(corrections['total_dv']).all():
+            print('ConstellationPhasing: some corrections would lower periapsis into the atmosphere')
+        return corrections
+
+    def print_corrections(self, corrections):
+        print(tabulate.tabulate(corrections, headers='keys', tablefmt='fancy_grid'))
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+MAGIC = b'KSPSTAT'
+VERSION = 1
+# magic, format version, fingerprint digest
+HEADER = struct.Struct('<7sH16s')
+
+CACHE_DIR = os.environ.get('KSP_STUFF_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'ksp_stuff'))
+
+
+class StaticCache():
+    '''
+    On disk cache of game data that does not change within a save: the body
+    catalogue, the antenna layout of known vessel designs and antenna
+    ratings. One file per game fingerprint (server version, game mode and
+    an optional save name), zlib compressed pickle of plain dicts behind a
+    fixed header, so a file from another save or format is just ignored.
+
+    Entries are validated when used, not when loaded, e.g. a design is
+    rediscovered once its part count no longer matches.
+
+    cache = static_cache(conn)
+    cache.get('bodies')
+    cache.put('antenna_ranges', {'RTLongAntenna2': 5e6})
+    '''
+    def __init__(self, conn, save=None, directory=CACHE_DIR):
+        self.directory = directory
+        self.save = os.environ.get('KSP_SAVE') if save is None else save
+        self.fingerprint = self.game_fingerprint(conn)
+        self.path = os.path.join(directory, f'{self.fingerprint.hex()}.bin')
+        self.lock = threading.Lock()
+        self.data = self.load() or {}
+        self.warm = bool(self.data)
+
+    def game_fingerprint(self, conn):
+        version = conn.krpc.get_status().version
+        game_mode = str(conn.space_center.game_mode)
+        key = f'{version}|{game_mode}|{self.save or ""}'.encode()
+        return hashlib.blake2b(key, digest_size=16).digest()
+
+    def load(self):
+        ''' Cached sections, None if there is no valid file for this fingerprint and version '''
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            magic, version, fingerprint = HEADER.unpack_from(raw)
+            if magic != MAGIC or version != VERSION or fingerprint != self.fingerprint:
+                return None
+            return pickle.loads(zlib.decompress(raw[HEADER.size:]))
+        except (OSError, struct.error, zlib.error, pickle.UnpicklingError, EOFError):
+            return None
+
+    def write(self):
+        ''' Replaces the file atomically, readers never see half a cache '''
+        os.makedirs(self.directory, exist_ok=True)
+        payload = zlib.compress(pickle.dumps(self.data, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.fingerprint) + payload)
+        os.replace(tmp, self.path)
+
+    def get(self, section, key=None, default=None):
+        with self.lock:
+            entries = self.data.get(section)
+            if key is None:
+                return default if entries is None else entries
+            return default if entries is None else entries.get(key, default)
+
+    def put(self, section, value, key=None):
+        ''' Stores plain data (dicts, lists, str, numbers) and writes the file '''
+        with self.lock:
+            if key is None:
+                self.data[section] = value
+            else:
+                self.data.setdefault(section, {})[key] = value
+            self.write()
+
+    def clear(self):
+        with self.lock:
+            self.data = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def static_cache(conn):
+    ''' The session cache of the game conn talks to, read from disk on first use '''
+    rpc = conn._rpc_connection
+    key = (rpc._address, rpc._port)
+    with _lock:
+        if key not in _caches:
+            _caches[key] = StaticCache(conn)
+        return _caches[key]
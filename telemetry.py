@@ -0,0 +1,240 @@
+import collections
+import threading
+import time
+
+import krpc
+from utils.lazy import lazy_import
+tabulate = lazy_import('tabulate')
+
+Sample = collections.namedtuple('Sample', ['topic', 'ut', 'value'])
+
+POLICIES = ('latest', 'drop_oldest', 'drop_newest')
+
+
+class Topic():
+    '''
+    One kRPC stream shared by all subscribers. Calling it returns the last
+    value, so it can stand in for the stream itself.
+    '''
+    def __init__(self, hub, name, stream):
+        self.hub = hub
+        self.name = name
+        self.stream = stream
+        self.sample = Sample(name, hub.ut(), stream())
+        self.subscriptions = []
+        stream.add_callback(self.publish)
+
+    def __call__(self):
+        return self.sample.value
+
+    def publish(self, value):
+        self.sample = Sample(self.name, self.hub.ut(), value)
+        for subscription in self.subscriptions:
+            subscription.offer(self.sample)
+        self.hub.wake()
+
+
+class Subscription():
+    '''
+    Per consumer queue with its own rate limit and overflow policy.
+
+    max_rate     deliveries per second, samples in between are coalesced
+                 and the newest one is delivered once the interval is over
+    maxsize      queue length
+    policy       'latest' keeps only the newest sample, 'drop_oldest'
+                 evicts from the front, 'drop_newest' rejects new samples
+    callback     called with each sample from the hub thread; without it
+                 samples are pulled with get() or drain()
+    '''
+    def __init__(self, topics, callback=None, max_rate=None, maxsize=1, policy='latest'):
+        if policy not in POLICIES:
+            raise ValueError(f'policy must be one of {POLICIES}')
+        self.topics = topics
+        self.callback = callback
+        self.interval = 1. / max_rate if max_rate else 0.
+        self.policy = policy
+        self.maxsize = 1 if policy == 'latest' else maxsize
+        self.queue = collections.deque()
+        self.held = {}
+        self.last = {}
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        # reentrant, get() asks next_flush while holding it
+        self.ready = threading.Condition(threading.RLock())
+
+    def offer(self, sample):
+        now = time.monotonic()
+        with self.ready:
+            if now - self.last.get(sample.topic, -self.interval) < self.interval:
+                if sample.topic in self.held:
+                    self.coalesced += 1
+                self.held[sample.topic] = sample
+                return
+            self.held.pop(sample.topic, None)
+            self.enqueue(sample, now)
+
+    def enqueue(self, sample, now):
+        self.last[sample.topic] = now
+        if len(self.queue) >= self.maxsize:
+            if self.policy == 'drop_newest':
+                self.dropped += 1
+                return
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(sample)
+        self.ready.notify_all()
+
+    def flush(self, now=None):
+        ''' Enqueues held samples whose rate limit interval has passed '''
+        now = time.monotonic() if now is None else now
+        with self.ready:
+            for topic, sample in list(self.held.items()):
+                if now - self.last.get(topic, -self.interval) >= self.interval:
+                    del self.held[topic]
+                    self.enqueue(sample, now)
+
+    def next_flush(self):
+        ''' Seconds until the next held sample is due, None if nothing is held '''
+        with self.ready:
+            if not self.held:
+                return None
+            return max(0., min(self.last[t] + self.interval for t in self.held) - time.monotonic())
+
+    def get(self, timeout=None):
+        ''' Next sample, blocks up to timeout, None if nothing arrived '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.flush()
+            with self.ready:
+                if self.queue:
+                    self.delivered += 1
+                    return self.queue.popleft()
+                wait = self.next_flush()
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.ready.wait(wait)
+
+    def drain(self):
+        ''' All queued samples without blocking '''
+        self.flush()
+        with self.ready:
+            samples = list(self.queue)
+            self.queue.clear()
+            self.delivered += len(samples)
+        return samples
+
+
+class TelemetryHub():
+    '''
+    In-process telemetry fan-out.
+
+    Owns one kRPC stream per value, stamps every update with UT and hands
+    it to any number of subscribers, each with its own rate limit and queue
+    policy. Adding a dashboard or logger costs no extra server load.
+
+    hub = TelemetryHub(conn)
+    altitude = hub.add('altitude', getattr, flight, 'mean_altitude')
+    altitude()                      # last value, like a stream
+    sub = hub.subscribe('altitude', max_rate=2, maxsize=100, policy='drop_oldest')
+    sub.drain()                     # [Sample(topic, ut, value), ...]
+    '''
+    def __init__(self, conn=None, ut_rate=0):
+        self.conn = krpc.connect(name='TelemetryHub') if conn is None else conn
+        self.ut = self.conn.add_stream(getattr, self.conn.space_center, 'ut')
+        if ut_rate:
+            self.ut.rate = ut_rate
+        self.topics = {}
+        self.subscriptions = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.dispatcher = None
+
+    def add(self, name, func, *args, rate=0):
+        ''' Topic for one value, the stream is only created once per name '''
+        with self.lock:
+            if name not in self.topics:
+                stream = self.conn.add_stream(func, *args)
+                if rate:
+                    stream.rate = rate
+                self.topics[name] = Topic(self, name, stream)
+            return self.topics[name]
+
+    def __getitem__(self, name):
+        return self.topics[name]
+
+    def latest(self, name):
+        ''' Last Sample of a topic, no RPC '''
+        return self.topics[name].sample
+
+    def subscribe(self, names, callback=None, max_rate=None, maxsize=1, policy='latest'):
+        ''' Subscription to one topic name or a list of them '''
+        names = [names] if isinstance(names, str) else list(names)
+        subscription = Subscription(names, callback, max_rate, maxsize, policy)
+        with self.lock:
+            for name in names:
+                self.topics[name].subscriptions.append(subscription)
+            self.subscriptions.append(subscription)
+        if callback is not None:
+            self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for name in subscription.topics:
+                self.topics[name].subscriptions.remove(subscription)
+            self.subscriptions.remove(subscription)
+
+    def wake(self):
+        self.wakeup.set()
+
+    def dispatch(self):
+        ''' Hub thread: runs callbacks and releases rate limited samples '''
+        while self.running:
+            self.wakeup.clear()
+            with self.lock:
+                subscriptions = [s for s in self.subscriptions if s.callback is not None]
+            timeout = 0.5
+            for subscription in subscriptions:
+                for sample in subscription.drain():
+                    subscription.callback(sample)
+                due = subscription.next_flush()
+                if due is not None:
+                    timeout = min(timeout, due)
+            self.wakeup.wait(timeout)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.dispatcher is not None:
+            self.dispatcher.join()
+
+    def close(self):
+        ''' Stops the hub thread and removes all streams '''
+        self.stop()
+        with self.lock:
+            for topic in self.topics.values():
+                topic.stream.remove()
+            self.topics = {}
+            self.subscriptions = []
+        self.ut.remove()
+
+    def print_stats(self):
+        print(tabulate.tabulate(self.stats(), headers='keys', tablefmt='fancy_grid'))
+
+    def stats(self):
+        return [{'topics': ', '.join(s.topics), 'policy': s.policy,
+                 'max_rate': 1 / s.interval if s.interval else None, 'queued': len(s.queue),
+                 'delivered': s.delivered, 'coalesced': s.coalesced, 'dropped': s.dropped}
+                for s in self.subscriptions]
@@ -0,0 +1,195 @@
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# fixed record layout, seq first so a torn record is detected before use
+RECORD = np.dtype([
+    ('seq', '<u8'),
+    ('published', '<f8'),
+    ('ut', '<f8'),
+    ('met', '<f8'),
+    ('altitude', '<f8'),
+    ('dynamic_pressure', '<f8'),
+    ('apoapsis', '<f8'),
+    ('periapsis', '<f8'),
+    ('throttle', '<f8'),
+    ('pitch', '<f8'),
+])
+HEADER = np.dtype([('capacity', '<u8'), ('written', '<u8')])
+
+
+class TelemetryRing():
+    '''
+    Single writer, multi reader ring of fixed layout records in
+    multiprocessing.shared_memory.
+
+    Every slot carries a sequence counter used as a seqlock: the writer
+    makes it odd, writes the fields and makes it even again, then bumps
+    the header count. Readers copy a slot and keep it only if the counter
+    was even and unchanged around the copy, so nobody ever takes a lock
+    and a slow reader just loses overwritten records.
+    '''
+    def __init__(self, name=None, capacity=4096, create=False):
+        if create:
+            size = HEADER.itemsize + capacity * RECORD.itemsize
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.header = np.ndarray((), dtype=HEADER, buffer=self.shm.buf)
+        if create:
+            self.header['capacity'] = capacity
+            self.header['written'] = 0
+        self.capacity = int(self.header['capacity'])
+        self.records = np.ndarray((self.capacity,), dtype=RECORD, buffer=self.shm.buf, offset=HEADER.itemsize)
+        self.seq = self.records['seq']
+        if create:
+            self.records[:] = 0
+        self.owner = create
+        self.cursor = 0
+
+    @classmethod
+    def create(cls, capacity=4096, name=None):
+        return cls(name=name, capacity=capacity, create=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name=name)
+
+    # writer
+
+    def publish(self, **values):
+        ''' Writes one record, fields that are not given are NaN '''
+        n = int(self.header['written'])
+        i = n % self.capacity
+        seq = 2 * (n // self.capacity + 1)
+        # whole record with an odd seq first, then the even seq releases it
+        self.records[i] = (seq - 1, time.monotonic()) + tuple(values.get(f, np.nan) for f in RECORD.names[2:])
+        self.seq[i] = seq
+        self.header['written'] = n + 1
+
+    # readers
+
+    def written(self):
+        return int(self.header['written'])
+
+    def view(self):
+        ''' The raw ring, zero copy; check seq before trusting a slot '''
+        return self.records
+
+    def read(self, start, stop):
+        '''
+        Consistent copies of records start..stop-1 (write counts), skipping
+        those being written or already overwritten
+        '''
+        start = max(start, stop - self.capacity)
+        if start >= stop:
+            return np.empty(0, dtype=RECORD)
+        first, last = start % self.capacity, (stop - 1) % self.capacity
+        if first <= last:
+            # contiguous, plain slices are much cheaper than fancy indexing
+            before = self.seq[first:last + 1].copy()
+            copy = self.records[first:last + 1].copy()
+            after = self.seq[first:last + 1]
+        else:
+            slots = np.arange(start, stop) % self.capacity
+            before = self.seq[slots]
+            copy = self.records[slots]
+            after = self.seq[slots]
+        expected = 2 * (np.arange(start, stop, dtype=np.uint64) // self.capacity + 1)
+        valid = (before == expected) & (after == expected) & (copy['seq'] == expected)
+        return copy[valid]
+
+    def read_new(self):
+        ''' Records written since the last call of this reader '''
+        stop = self.written()
+        records = self.read(self.cursor, stop)
+        self.cursor = stop
+        return records
+
+    def latest(self):
+        ''' Newest consistent record or None '''
+        stop = self.written()
+        records = self.read(max(stop - 2, 0), stop)
+        return records[-1] if len(records) else None
+
+    def close(self):
+        del self.header, self.records, self.seq
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _launch_process(ring_name, launch_kwargs, rate, stop):
+    ''' Control process: runs the ascent and publishes telemetry into the ring '''
+    from launch import LaunchManager
+
+    ring = TelemetryRing.attach(ring_name)
+    launch = LaunchManager(**launch_kwargs)
+    pilot = launch.vessel.auto_pilot
+    control = launch.vessel.control
+
+    def publisher():
+        # topics are read from the telemetry hub, only throttle and pitch cost RPCs
+        while not launch.launch_finished and not stop.is_set():
+            ring.publish(ut=launch.ut(), met=launch.met(), altitude=launch.flight_mean_altitude(),
+                         dynamic_pressure=launch.flight_dynamic_pressure(), apoapsis=launch.apoapsis(),
+                         periapsis=launch.periapsis(), throttle=control.throttle,
+                         pitch=pilot.target_pitch)
+            time.sleep(1 / rate)
+
+    def watcher():
+        # LaunchProcess.stop ends the ascent through cancel instead of running into terminate()
+        stop.wait()
+        launch.cancel()
+
+    thread = threading.Thread(target=publisher, daemon=True)
+    thread.start()
+    threading.Thread(target=watcher, daemon=True).start()
+    try:
+        launch.ascent()
+    finally:
+        stop.set()
+        thread.join()
+        ring.close()
+
+
+class LaunchProcess():
+    '''
+    LaunchManager.ascent in its own process, telemetry comes back through
+    a TelemetryRing so the UI process never shares a GIL with control.
+
+    process = LaunchProcess(target_altitude=150000)
+    process.start()
+    process.ring.read_new()
+    '''
+    def __init__(self, rate=20, capacity=4096, **launch_kwargs):
+        self.ring = TelemetryRing.create(capacity)
+        self.rate = rate
+        self.launch_kwargs = launch_kwargs
+        self.stop_event = multiprocessing.Event()
+        self.process = None
+
+    def start(self):
+        self.process = multiprocessing.Process(
+            target=_launch_process, args=(self.ring.name, self.launch_kwargs, self.rate, self.stop_event),
+            daemon=True)
+        self.process.start()
+        return self
+
+    def running(self):
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+
+    def close(self):
+        self.stop()
+        self.ring.close()
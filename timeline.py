@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import math
+import time
+
+import krpc
+from utils.lazy import lazy_import
+tabulate = lazy_import('tabulate')
+
+from nodes import NodeManager
+
+G0 = 9.80665
+
+
+def estimate_burn_time(delta_v, thrust, isp, mass):
+    ''' Burn time from the rocket equation, isp in seconds '''
+    if thrust <= 0 or isp <= 0:
+        return None
+    exhaust_velocity = isp * G0
+    final_mass = mass / math.exp(delta_v / exhaust_velocity)
+    flow_rate = thrust / exhaust_velocity
+    return (mass - final_mass) / flow_rate
+
+
+class BurnWindow():
+    ''' One planned node on one vessel and the time span it occupies '''
+    def __init__(self, vessel, node, burn_time, lead_time, switch_margin):
+        self.vessel = vessel
+        self.node = node
+        self.burn_time = burn_time
+        self.lead_time = lead_time
+        self.switch_margin = switch_margin
+        self.update(node.ut)
+
+    def update(self, ut):
+        self.ut = ut
+        # executor starts lead_time before the burn, we switch switch_margin before that
+        self.start = ut - self.burn_time / 2 - self.lead_time - self.switch_margin
+        self.end = ut + self.burn_time / 2
+
+    def overlaps(self, other):
+        return self.start < other.end and other.start < self.end
+
+
+class ManeuverTimeline():
+    '''
+    Fleet-wide maneuver scheduler.
+
+    Keeps every planned node of every vessel in a UT ordered priority queue.
+    Overlapping burn windows are resolved by moving the later node one orbit
+    ahead. While running, time is warped through the gaps, the right vessel
+    is made active just before each burn and the node is executed with
+    MechJeb's node executor.
+    '''
+    def __init__(self, lead_time=10, switch_margin=15, tolerance=0.1, default_burn_time=60):
+        self.conn = krpc.connect(name='ManeuverTimeline')
+        self.sc = self.conn.space_center
+        self.mj = self.conn.mech_jeb
+        print('ManeuverTimeline connected ...')
+
+        self.ut = self.conn.add_stream(getattr, self.sc, 'ut')
+
+        self.lead_time = lead_time
+        self.switch_margin = switch_margin
+        self.tolerance = tolerance
+        # used for vessels with no usable engine, e.g. RCS only
+        self.default_burn_time = default_burn_time
+
+        self.node_manager = NodeManager()
+        self.queue = []
+        self.counter = itertools.count()
+
+    def add_node(self, vessel, node):
+        ''' Adds a single node of vessel to the timeline '''
+        burn_time = estimate_burn_time(node.delta_v, vessel.available_thrust,
+                                       vessel.specific_impulse, vessel.mass)
+        if burn_time is None:
+            burn_time = self.default_burn_time
+        window = BurnWindow(vessel, node, burn_time, self.lead_time, self.switch_margin)
+        heapq.heappush(self.queue, (window.start, next(self.counter), window))
+        return window
+
+    def add_vessels(self, vessels):
+        ''' Adds all planned nodes of the given vessels '''
+        for vessel in vessels:
+            self.sc.active_vessel = vessel
+            for node in vessel.control.nodes:
+                self.add_node(vessel, node)
+        self.resolve_overlaps()
+
+    def windows(self):
+        return [w for _, _, w in sorted(self.queue)]
+
+    def resolve_overlaps(self):
+        '''
+        Moves nodes whose window overlaps an earlier one by whole orbits of
+        their vessel until the timeline is conflict free.
+        '''
+        scheduled = []
+        pending = self.queue
+        self.queue = []
+        while pending:
+            _, _, window = heapq.heappop(pending)
+            conflict = next((w for w in scheduled if w.overlaps(window)), None)
+            if conflict is None:
+                scheduled.append(window)
+                heapq.heappush(self.queue, (window.start, next(self.counter), window))
+                continue
+
+            period = window.vessel.orbit.period
+            print(f'Burn of {window.vessel.name} at UT {window.ut:.0f} overlaps '
+                  f'{conflict.vessel.name}, moving it by one orbit')
+            self.sc.active_vessel = window.vessel
+            window.node.ut = window.ut + period
+            window.update(window.ut + period)
+            heapq.heappush(pending, (window.start, next(self.counter), window))
+
+    def print_timeline(self):
+        rows = [[w.vessel.name, w.ut, w.ut - self.ut(), w.burn_time, w.node.delta_v]
+                for w in self.windows()]
+        print(tabulate.tabulate(rows, headers=['Vessel', 'UT', 'Time to', 'Burn time', 'Delta v'],
+                                tablefmt='fancy_grid'))
+
+    def run(self, before_burn=None):
+        '''
+        Executes the queued burns in UT order.
+        before_burn(vessel) is called after switching to a vessel,
+        e.g. to set up RCS for vessels without engines.
+        '''
+        self.print_timeline()
+        while self.queue:
+            _, _, window = heapq.heappop(self.queue)
+
+            if window.start > self.ut():
+                print(f'Warping to UT {window.start:.0f} for {window.vessel.name}')
+                self.sc.warp_to(window.start)
+
+            if self.sc.active_vessel != window.vessel:
+                self.sc.active_vessel = window.vessel
+                time.sleep(2)
+
+            if before_burn is not None:
+                before_burn(window.vessel)
+
+            self.mj.smart_ass.autopilot_mode = self.mj.SmartASSAutopilotMode.node
+            self.mj.smart_ass.update(False)
+
+            print(f'Burning {window.vessel.name}')
+            self.node_manager.execute_node(lead_time=self.lead_time, tolerance=self.tolerance)
@@ -0,0 +1,93 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import krpc
+import numpy as np
+import pandas as pd
+import tabulate
+
+from utils.ascent_sim import AscentPlant, simulate_ascent
+
+
+def _simulate_chunk(args):
+    ''' Process pool worker, simulates one chunk of the gain grid '''
+    plant, gains, kwargs = args
+    return simulate_ascent(plant, gains[:, 0], gains[:, 1], gains[:, 2], **kwargs)
+
+
+class PIDTuner():
+    '''
+    Sweeps PID gains for the LaunchManager max Q throttle controller
+    against a simulated ascent instead of a live flight.
+
+    tuner = PIDTuner(plant, max_q=20000)
+    df = tuner.sweep(P=np.logspace(-4, -2, 20), I=..., D=...)
+    P, I, D = tuner.best_gains()
+    '''
+    def __init__(self, plant=None, max_q=20000, turn_start_altitude=2500,
+                 turn_end_altitude=120000, target_altitude=150000, end_stage=-1,
+                 dt=0.1, max_time=600., conn=None):
+        if plant is None:
+            # only a plant read from the active vessel needs a connection
+            if conn is None:
+                conn = krpc.connect(name='PIDTuner')
+                print('PIDTuner connected ...')
+            plant = AscentPlant.from_vessel(conn)
+        self.plant = plant
+
+        self.sim_kwargs = {
+            'max_q': max_q,
+            'turn_start_altitude': turn_start_altitude,
+            'turn_end_altitude': turn_end_altitude,
+            'target_altitude': target_altitude,
+            'end_stage': end_stage,
+            'dt': dt,
+            'max_time': max_time,
+        }
+        self.df = None
+
+    def sweep(self, P, I, D, processes=None, chunk_size=2048):
+        '''
+        Simulates every combination of the given gains.
+        processes=None runs a single vectorized pass in this process,
+        otherwise the grid is split into chunks over a process pool
+        (processes=0 uses all cores).
+        '''
+        start = time.time()
+        gains = np.array(list(itertools.product(P, I, D)), dtype=float)
+
+        if processes is None:
+            results = [_simulate_chunk((self.plant, gains, self.sim_kwargs))]
+        else:
+            processes = processes or os.cpu_count()
+            chunks = np.array_split(gains, max(processes, int(np.ceil(len(gains) / chunk_size))))
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(_simulate_chunk,
+                                        [(self.plant, c, self.sim_kwargs) for c in chunks if len(c)]))
+
+        self.df = pd.concat([pd.DataFrame(r) for r in results], ignore_index=True)
+        self.df.insert(0, 'P', gains[:, 0])
+        self.df.insert(1, 'I', gains[:, 1])
+        self.df.insert(2, 'D', gains[:, 2])
+        print(f'PIDTuner: {len(gains)} gain combinations simulated in {time.time() - start:.2f} s')
+        return self.df
+
+    def ranked(self, max_overshoot=0.05):
+        ''' Returns the sweep results that reach the target, best first '''
+        df = self.df[self.df['reached_target']]
+        df = df.assign(within_overshoot=df['max_q_overshoot'] <= max_overshoot)
+        return df.sort_values(by=['within_overshoot', 'dv_loss', 'settling_time'],
+                              ascending=[False, True, True])
+
+    def best_gains(self, max_overshoot=0.05):
+        ''' Returns (P, I, D) with the least delta v loss within the overshoot limit '''
+        best = self.ranked(max_overshoot).iloc[0]
+        return best['P'], best['I'], best['D']
+
+    def print_results(self, n=10, max_overshoot=0.05):
+        columns = ['P', 'I', 'D', 'max_q_overshoot', 'settling_time', 'q_rms_error',
+                   'dv_loss', 'dv_drag_loss', 'dv_gravity_loss']
+        print(tabulate.tabulate(self.ranked(max_overshoot)[columns].head(n),
+                                headers='keys', tablefmt='fancy_grid'))
@@ -0,0 +1,255 @@
+'''
+Simple ascent plant used to evaluate launch settings offline.
+
+The vessel is a point mass flying in the equatorial plane of a spherical,
+rotating body with an exponential atmosphere. Every state variable is a
+NumPy array with one element per candidate, so thousands of controller
+gains or ascent profiles are integrated in lock-step in a single pass.
+'''
+import numpy as np
+
+G0 = 9.80665
+
+# Kerbin defaults, see the KSP wiki
+KERBIN = {
+    'gravitational_parameter': 3.5316e12,
+    'equatorial_radius': 600000.,
+    'rotational_period': 21549.425,
+    'atmosphere_depth': 70000.,
+    'surface_density': 1.225,
+    'scale_height': 5600.,
+}
+
+
+def gravity_turn_pitch(altitude, turn_start_altitude, turn_end_altitude):
+    '''
+    Target pitch of the quadratic gravity turn used by LaunchManager.
+    Holds 90 deg below turn_start_altitude and 0 deg above turn_end_altitude.
+    '''
+    frac = np.clip(np.asarray(altitude, dtype=float) / turn_end_altitude, 0., 1.)
+    pitch = 90 - (-90 * frac * (frac - 2))
+    return np.where(np.asarray(altitude) < turn_start_altitude, 90., pitch)
+
+
+class AscentPlant():
+    '''
+    Launch vehicle and body description for the ascent simulation.
+
+    stages is a list of dicts in activation order (first stage first) with the
+    keys 'propellant_mass', 'dry_mass', 'thrust' (vacuum, N), 'isp_vac',
+    'isp_sl' and optionally 'stage', the KSP stage number while that stage is
+    burning. Masses in kg, drag_area is Cd * A in m^2.
+    '''
+    def __init__(self, stages, payload_mass=0., drag_area=1.0, body=None):
+        self.stages = list(stages)
+        self.payload_mass = payload_mass
+        self.drag_area = drag_area
+        self.body = dict(KERBIN if body is None else body)
+
+        n = len(self.stages)
+        self.propellant = np.array([s['propellant_mass'] for s in self.stages], dtype=float)
+        self.dry = np.array([s['dry_mass'] for s in self.stages], dtype=float)
+        self.isp_vac = np.array([s['isp_vac'] for s in self.stages], dtype=float)
+        self.isp_sl = np.array([s.get('isp_sl', s['isp_vac']) for s in self.stages], dtype=float)
+        self.mass_flow = np.array([s['thrust'] for s in self.stages], dtype=float) / (self.isp_vac * G0)
+        self.stage_number = np.array([s.get('stage', n - 1 - i) for i, s in enumerate(self.stages)])
+        # mass of everything above stage i, payload included
+        stage_mass = self.propellant + self.dry
+        self.upper_mass = payload_mass + np.concatenate([np.cumsum(stage_mass[::-1])[::-1][1:], [0.]])
+
+    @classmethod
+    def from_vessel(cls, conn, vessel=None, drag_area=1.0):
+        '''
+        Builds a single stage plant from the currently burning stage of a vessel.
+        Everything above that stage is treated as payload.
+        '''
+        sc = conn.space_center
+        if vessel is None:
+            vessel = sc.active_vessel
+        current_stage = vessel.control.current_stage
+        resources = vessel.resources_in_decouple_stage(current_stage - 1, cumulative=False)
+        propellant = sum(resources.amount(name) * sc.Resources.density(name)
+                         for name in resources.names)
+        engines = [e for e in vessel.parts.engines if e.part.stage == current_stage - 1 or e.active]
+        dry = sum(p.dry_mass for p in vessel.parts.in_decouple_stage(current_stage - 1))
+
+        stage = {
+            'propellant_mass': propellant,
+            'dry_mass': dry,
+            'thrust': sum(e.max_vacuum_thrust for e in engines),
+            'isp_vac': vessel.vacuum_specific_impulse,
+            'isp_sl': vessel.kerbin_sea_level_specific_impulse,
+            'stage': current_stage,
+        }
+        from bodies import body_catalogue
+        body = body_catalogue(conn)[vessel.orbit.body.name]
+        body_description = dict(KERBIN)
+        body_description.update({
+            'gravitational_parameter': body.gravitational_parameter,
+            'equatorial_radius': body.equatorial_radius,
+            'rotational_period': body.rotational_period,
+            'atmosphere_depth': body.atmosphere_depth,
+        })
+        return cls([stage], payload_mass=vessel.mass - propellant - dry,
+                   drag_area=drag_area, body=body_description)
+
+    def density(self, altitude):
+        ''' Exponential atmosphere, zero above atmosphere_depth '''
+        rho = self.body['surface_density'] * np.exp(-np.maximum(altitude, 0.) / self.body['scale_height'])
+        return np.where(altitude < self.body['atmosphere_depth'], rho, 0.)
+
+
+def simulate_ascent(plant, kp, ki, kd, max_q, turn_start_altitude, turn_end_altitude,
+                    target_altitude, end_stage=-1, dt=0.1, control_period=1.0,
+                    staging_period=2.0, max_time=600., settle_tolerance=0.05):
+    '''
+    Integrates the ascent for every candidate at once.
+
+    All gain and profile arguments broadcast against each other, one element
+    per candidate. The throttle loop mirrors LaunchManager: a PID on dynamic
+    pressure updated every control_period, autostaging every staging_period
+    and engine cut-off once the apoapsis reaches target_altitude.
+
+    Returns a dict of metric arrays.
+    '''
+    kp, ki, kd, max_q, turn_start_altitude, turn_end_altitude, target_altitude, end_stage = (
+        np.atleast_1d(a).astype(float) for a in np.broadcast_arrays(
+            kp, ki, kd, max_q, turn_start_altitude, turn_end_altitude, target_altitude, end_stage))
+    n = kp.shape[0]
+
+    mu = plant.body['gravitational_parameter']
+    radius = plant.body['equatorial_radius']
+    omega = 2 * np.pi / plant.body['rotational_period']
+    rho0 = plant.body['surface_density']
+    last_stage = len(plant.stages) - 1
+
+    # state
+    r = np.full(n, radius)
+    vr = np.zeros(n)
+    vt = np.full(n, omega * radius)
+    stage = np.zeros(n, dtype=int)
+    propellant = np.full(n, plant.propellant[0])
+    throttle = np.zeros(n)
+    done = np.zeros(n, dtype=bool)
+    reached = np.zeros(n, dtype=bool)
+
+    # PID state, same update rule as utils.pid.PID
+    integral = np.zeros(n)
+    last_q = np.zeros(n)
+
+    # metrics
+    q_peak = np.zeros(n)
+    dv_spent = np.zeros(n)
+    dv_drag = np.zeros(n)
+    dv_gravity = np.zeros(n)
+    t_in_band = np.full(n, np.nan)
+    t_last_out = np.full(n, np.nan)
+    sq_error = np.zeros(n)
+    limited_samples = np.zeros(n)
+    apoapsis = np.zeros(n)
+    t_end = np.full(n, max_time)
+
+    control_every = max(int(round(control_period / dt)), 1)
+    staging_every = max(int(round(staging_period / dt)), 1)
+
+    for step in range(int(max_time / dt)):
+        t = step * dt
+        running = ~done
+        if not running.any():
+            break
+
+        altitude = r - radius
+        rho = plant.density(altitude)
+        vs_t = vt - omega * r
+        v_surface = np.sqrt(vr ** 2 + vs_t ** 2)
+        q = 0.5 * rho * v_surface ** 2
+
+        if step % staging_every == 0:
+            can_stage = (propellant <= 0) & (stage < last_stage) & (plant.stage_number[stage] > end_stage)
+            stage = np.where(can_stage, stage + 1, stage)
+            propellant = np.where(can_stage, plant.propellant[np.minimum(stage, last_stage)], propellant)
+
+        if step % control_every == 0:
+            error = max_q - q
+            integral = np.clip(integral + error, -max_q, max_q)
+            derivative = (q - last_q) / control_period
+            last_q = q
+            throttle = np.clip(kp * error + ki * integral - kd * derivative, 0., 1.)
+
+            limited = running & (throttle < 0.999) & ~np.isnan(t_in_band)
+            out_of_band = limited & (np.abs(q - max_q) > settle_tolerance * max_q)
+            t_last_out = np.where(out_of_band, t, t_last_out)
+            sq_error += np.where(limited, ((q - max_q) / max_q) ** 2, 0.)
+            limited_samples += limited
+
+        entered = running & np.isnan(t_in_band) & (q >= (1 - settle_tolerance) * max_q)
+        t_in_band = np.where(entered, t, t_in_band)
+        q_peak = np.where(running, np.maximum(q_peak, q), q_peak)
+
+        # propulsion
+        burning = running & (propellant > 0)
+        mass = plant.upper_mass[stage] + plant.dry[stage] + np.maximum(propellant, 0.)
+        isp = plant.isp_vac[stage] + (plant.isp_sl[stage] - plant.isp_vac[stage]) * rho / rho0
+        mass_flow = np.where(burning, plant.mass_flow[stage] * throttle, 0.)
+        accel_thrust = mass_flow * isp * G0 / mass
+
+        pitch = np.radians(gravity_turn_pitch(altitude, turn_start_altitude, turn_end_altitude))
+        accel_drag = 0.5 * rho * v_surface ** 2 * plant.drag_area / mass
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drag_r = np.where(v_surface > 0, -accel_drag * vr / v_surface, 0.)
+            drag_t = np.where(v_surface > 0, -accel_drag * vs_t / v_surface, 0.)
+        gravity = mu / r ** 2
+
+        ar = accel_thrust * np.sin(pitch) + drag_r - gravity + vt ** 2 / r
+        at = accel_thrust * np.cos(pitch) + drag_t - vr * vt / r
+
+        speed = np.sqrt(vr ** 2 + vt ** 2)
+        dv_spent += np.where(running, accel_thrust * dt, 0.)
+        dv_drag += np.where(running, accel_drag * dt, 0.)
+        dv_gravity += np.where(running, gravity * vr / np.maximum(speed, 1e-9) * dt, 0.)
+
+        vr = np.where(running, vr + ar * dt, vr)
+        vt = np.where(running, vt + at * dt, vt)
+        r = np.where(running, r + vr * dt, r)
+        propellant = np.where(running, propellant - mass_flow * dt, propellant)
+
+        # apoapsis from the inertial state
+        energy = 0.5 * (vr ** 2 + vt ** 2) - mu / r
+        h = r * vt
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sma = -mu / (2 * energy)
+            ecc = np.sqrt(np.maximum(1 + 2 * energy * h ** 2 / mu ** 2, 0.))
+            apo = np.where(energy < 0, sma * (1 + ecc), np.inf)
+        apoapsis = np.where(running, apo - radius, apoapsis)
+
+        finished = running & (apoapsis >= target_altitude)
+        crashed = running & (t > 10) & (r < radius)
+        stranded = running & (propellant <= 0) & ((stage >= last_stage) | (plant.stage_number[stage] <= end_stage)) & (vr < 0)
+        reached |= finished
+        newly_done = finished | crashed | stranded
+        t_end = np.where(newly_done, t + dt, t_end)
+        done |= newly_done
+
+    # circularization at apoapsis with vis-viva
+    r_apo = apoapsis + radius
+    with np.errstate(invalid='ignore', divide='ignore'):
+        v_apo = r * vt / r_apo
+        dv_circularize = np.where(reached, np.sqrt(mu / r_apo) - v_apo, np.nan)
+
+    settling_time = np.where(np.isnan(t_last_out), 0., t_last_out - t_in_band)
+    settling_time = np.where(np.isnan(t_in_band), np.nan, settling_time)
+
+    return {
+        'max_q_reached': q_peak,
+        'max_q_overshoot': np.maximum(q_peak - max_q, 0.) / max_q,
+        'settling_time': settling_time,
+        'q_rms_error': np.sqrt(sq_error / np.maximum(limited_samples, 1)),
+        'dv_spent': dv_spent,
+        'dv_drag_loss': dv_drag,
+        'dv_gravity_loss': dv_gravity,
+        'dv_loss': dv_drag + dv_gravity,
+        'dv_circularize': dv_circularize,
+        'apoapsis': apoapsis,
+        'ascent_time': t_end,
+        'reached_target': reached,
+    }
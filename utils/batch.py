@@ -0,0 +1,44 @@
+import time
+
+from krpc.decoder import Decoder
+import krpc.schema.KRPC_pb2 as KRPC
+
+from utils.rpc_profiler import profiler
+
+
+def batch_call(conn, calls):
+    '''
+    Runs calls, a list of (func, *args) like conn.add_stream takes, in a
+    single KRPC.Request and returns their results in order. A failed call
+    gives its exception instead of a result.
+
+    gm, radius = batch_call(conn, [(getattr, body, 'gravitational_parameter'),
+                                   (getattr, body, 'equatorial_radius')])
+    '''
+    if not calls:
+        return []
+    request = KRPC.Request()
+    return_types = []
+    for func, *args in calls:
+        return_types.append(conn._get_return_type(func, *args))
+        request.calls.extend([conn.get_call(func, *args)])
+
+    # same framing as Client._invoke, just more than one call
+    start = time.perf_counter()
+    with conn._rpc_connection_lock:
+        conn._rpc_connection.send_message(request)
+        response = conn._rpc_connection.receive_message(KRPC.Response)
+    if profiler.enabled:
+        profiler.record(f'batch of {len(calls)}', time.perf_counter() - start)
+    if response.HasField('error'):
+        raise conn._build_error(response.error)
+
+    results = []
+    for result, return_type in zip(response.results, return_types):
+        if result.HasField('error'):
+            results.append(conn._build_error(result.error))
+        elif return_type is None:
+            results.append(None)
+        else:
+            results.append(Decoder.decode(conn, result.value, return_type))
+    return results
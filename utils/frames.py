@@ -0,0 +1,188 @@
+'''
+Reference frame math on NumPy arrays.
+
+kRPC answers every transform_position/transform_direction with an RPC.
+Here a frame is snapshotted once, relative to a common base frame, as an
+origin, a rotation quaternion and the velocity and angular velocity at
+the snapshot UT. Any number of vectors can then be converted locally, at
+the snapshot time or propagated to a later UT (exact for the constant
+spin of a body, linear for moving origins).
+
+Quaternions are (x, y, z, w) like kRPC. kRPC frames are left handed, the
+algebra is the same as long as every quaternion comes from the server.
+'''
+import numpy as np
+
+
+def quat_multiply(a, b):
+    ''' Hamilton product a * b, broadcasts over leading axes '''
+    ax, ay, az, aw = np.moveaxis(np.asarray(a, dtype=float), -1, 0)
+    bx, by, bz, bw = np.moveaxis(np.asarray(b, dtype=float), -1, 0)
+    return np.stack([
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+        aw * bw - ax * bx - ay * by - az * bz,
+    ], axis=-1)
+
+
+def quat_conjugate(q):
+    q = np.array(q, dtype=float)
+    q[..., :3] *= -1
+    return q
+
+
+def quat_from_axis_angle(axis, angle):
+    axis = np.asarray(axis, dtype=float)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
+    half = np.asarray(angle, dtype=float)[..., None] / 2
+    return np.concatenate([axis * np.sin(half), np.cos(half)], axis=-1)
+
+
+def quat_to_matrix(q):
+    ''' 3x3 rotation matrix of a unit quaternion, rotate(q, v) == matrix @ v '''
+    x, y, z, w = np.asarray(q, dtype=float)
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def rotate(q, v):
+    ''' Rotates vectors v (..., 3) by unit quaternions q (..., 4), q v q* '''
+    q = np.asarray(q, dtype=float)
+    v = np.asarray(v, dtype=float)
+    u, w = q[..., :3], q[..., 3:]
+    t = 2 * np.cross(u, v)
+    return v + w * t + np.cross(u, t)
+
+
+def norm(v):
+    return np.linalg.norm(v, axis=-1)
+
+
+def normalize(v):
+    v = np.asarray(v, dtype=float)
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def angle_between(a, b):
+    '''
+    Angle in radians between vectors, any length, broadcasts. atan2 of
+    cross and dot stays accurate for nearly parallel vectors, where acos
+    of the dot product loses half the digits.
+    '''
+    ax, ay, az = np.moveaxis(np.asarray(a, dtype=float), -1, 0)
+    bx, by, bz = np.moveaxis(np.asarray(b, dtype=float), -1, 0)
+    # components by hand, np.cross is several times slower on large arrays
+    cross = np.sqrt((ay * bz - az * by) ** 2 + (az * bx - ax * bz) ** 2 + (ax * by - ay * bx) ** 2)
+    return np.arctan2(cross, ax * bx + ay * by + az * bz)
+
+
+class Frame():
+    '''
+    One reference frame relative to a base frame: vectors given in the
+    frame map into the base as rotation * v + origin. velocity and
+    angular_velocity (both in base coordinates) let the frame be evaluated
+    at other times than its snapshot ut.
+    '''
+    def __init__(self, origin=(0., 0., 0.), rotation=(0., 0., 0., 1.), ut=0.,
+                 velocity=(0., 0., 0.), angular_velocity=(0., 0., 0.)):
+        self.origin = np.asarray(origin, dtype=float)
+        self.rotation = np.asarray(rotation, dtype=float)
+        self.ut = ut
+        self.velocity = np.asarray(velocity, dtype=float)
+        self.angular_velocity = np.asarray(angular_velocity, dtype=float)
+
+    def at(self, ut=None):
+        ''' Origin and rotation at ut, the snapshot if None '''
+        if ut is None or ut == self.ut:
+            return self.origin, self.rotation
+        dt = ut - self.ut
+        rate = norm(self.angular_velocity)
+        rotation = self.rotation
+        if rate > 0:
+            rotation = quat_multiply(quat_from_axis_angle(self.angular_velocity, rate * dt), rotation)
+        return self.origin + self.velocity * dt, rotation
+
+    def to_base(self, vectors, ut=None, direction=False):
+        origin, rotation = self.at(ut)
+        vectors = rotate(rotation, vectors)
+        return vectors if direction else vectors + origin
+
+    def from_base(self, vectors, ut=None, direction=False):
+        origin, rotation = self.at(ut)
+        if not direction:
+            vectors = np.asarray(vectors, dtype=float) - origin
+        return rotate(quat_conjugate(rotation), vectors)
+
+
+def relative(source, target, ut=None):
+    '''
+    Matrix and offset taking positions in source to target, p @ M.T + c.
+    One 3x3 product per call, the vectors only see a single matmul.
+    '''
+    source_origin, source_rotation = source.at(ut)
+    target_origin, target_rotation = target.at(ut)
+    inverse = quat_to_matrix(target_rotation).T
+    return inverse @ quat_to_matrix(source_rotation), inverse @ (source_origin - target_origin)
+
+
+def transform_position(vectors, source, target, ut=None):
+    ''' Positions (..., 3) in frame source to frame target, both Frames of the same base '''
+    matrix, offset = relative(source, target, ut)
+    return np.asarray(vectors, dtype=float) @ matrix.T + offset
+
+
+def transform_direction(vectors, source, target, ut=None):
+    matrix, _ = relative(source, target, ut)
+    return np.asarray(vectors, dtype=float) @ matrix.T
+
+
+def transform_rotation(rotation, source, target, ut=None):
+    ''' Quaternion in frame source to frame target '''
+    _, source_rotation = source.at(ut)
+    _, target_rotation = target.at(ut)
+    return quat_multiply(quat_conjugate(target_rotation), quat_multiply(source_rotation, rotation))
+
+
+def snapshot_frames(conn, base, frames):
+    '''
+    Frames relative to the kRPC reference frame base in one batched request.
+    frames maps names to kRPC ReferenceFrames, e.g.
+
+    snapshot_frames(conn, body.non_rotating_reference_frame,
+                    {'body': body.reference_frame, 'vessel': vessel.reference_frame})
+    '''
+    from utils.batch import batch_call
+
+    sc = conn.space_center
+    names = list(frames)
+    n = len(names)
+    # the angular velocity of a frame follows from the velocity unit offsets
+    # along its axes pick up beyond the origin's
+    calls = [(sc.transform_position, (0., 0., 0.), frames[name], base) for name in names]
+    calls += [(sc.transform_rotation, (0., 0., 0., 1.), frames[name], base) for name in names]
+    calls += [(sc.transform_velocity, offset, (0., 0., 0.), frames[name], base)
+              for name in names for offset in ((0., 0., 0.), (1., 0., 0.), (0., 1., 0.), (0., 0., 1.))]
+    calls += [(getattr, sc, 'ut')]
+    values = batch_call(conn, calls)
+    for value in values:
+        if isinstance(value, Exception):
+            raise value
+    ut = values[-1]
+    velocities = np.array(values[2 * n:-1], dtype=float).reshape(n, 4, 3)
+
+    snapshot = {}
+    for i, name in enumerate(names):
+        origin = np.asarray(values[i], dtype=float)
+        rotation = np.asarray(values[n + i], dtype=float)
+        velocity = velocities[i, 0]
+        # v(unit axis) - v(origin) = omega x R e_k, solved for omega
+        spin = velocities[i, 1:] - velocity
+        axes_in_base = rotate(rotation, np.eye(3))
+        omega = 0.5 * np.sum(np.cross(axes_in_base, spin), axis=0)
+        snapshot[name] = Frame(origin, rotation, ut, velocity, omega)
+    snapshot['base'] = Frame(ut=ut)
+    return snapshot
@@ -1,4 +1,3 @@
-import numpy as np
 import time
 
 def orientate_vessel(conn, vessel, new_orientation, accuracy_cutoff=1e-2, block=True, sas_mode=True):
@@ -25,18 +24,26 @@ def orientate_vessel(conn, vessel, new_orientation, accuracy_cutoff=1e-2, block=
             control.sas_mode = conn.space_center.SASMode.maneuver
 
     if block:
+        from utils.frames import angle_between
+
         print(f'Blocked: Orientating {vessel} to ' + new_orientation)
 
-        direction = conn.add_stream(getattr, vessel.flight(), 'direction')
+        # flight() vectors are in the vessel's surface frame, the burn vector
+        # is asked for in the same frame so the angle between them means something
+        frame = vessel.surface_reference_frame
+        direction = conn.add_stream(getattr, vessel.flight(frame), 'direction')
 
         if new_orientation == 'node':
-            target_direction = conn.add_stream(getattr, vessel.control.nodes[0], 'remaining_burn_vector')
+            target_direction = conn.add_stream(vessel.control.nodes[0].remaining_burn_vector, frame)
         else:
-            target_direction = conn.add_stream(getattr, vessel.flight(), new_orientation)
+            target_direction = conn.add_stream(getattr, vessel.flight(frame), new_orientation)
 
-        while np.any((np.abs(np.subtract(direction(), target_direction())) < accuracy_cutoff) == False):
+        # accuracy_cutoff is the pointing error in radians
+        while angle_between(direction(), target_direction()) > accuracy_cutoff:
             # time.sleep(0.1)
             pass
+        direction.remove()
+        target_direction.remove()
         # motion = True
         # while motion:
             # diff = np.abs(np.subtract(direction(), sas_direction()))
@@ -1,5 +1,6 @@
 # import krpc
-import tabulate
+from utils.lazy import lazy_import
+tabulate = lazy_import('tabulate')
 # import numpy as np
 # import matplotlib.pyplot as plt
 # import pandas as pd
@@ -0,0 +1,133 @@
+'''
+Vectorized two-body helpers.
+
+All functions take NumPy arrays (or scalars) and broadcast, so whole fleets
+are handled in one call without a round trip to the server. Angles are in
+radians and distances in metres, like kRPC.
+'''
+import numpy as np
+
+
+def orbital_period(semi_major_axis, mu):
+    return 2 * np.pi * np.sqrt(np.asarray(semi_major_axis, dtype=float) ** 3 / mu)
+
+
+def semi_major_axis_from_period(period, mu):
+    return np.cbrt(mu * (np.asarray(period, dtype=float) / (2 * np.pi)) ** 2)
+
+
+def circular_velocity(radius, mu):
+    return np.sqrt(mu / np.asarray(radius, dtype=float))
+
+
+def vis_viva(radius, semi_major_axis, mu):
+    ''' Orbital speed at radius on an orbit with the given semi-major axis '''
+    return np.sqrt(mu * (2 / np.asarray(radius, dtype=float) - 1 / np.asarray(semi_major_axis, dtype=float)))
+
+
+def wrap_angle(angle):
+    ''' Wraps radians into [-pi, pi) '''
+    return (np.asarray(angle) + np.pi) % (2 * np.pi) - np.pi
+
+
+def true_to_mean_anomaly(true_anomaly, eccentricity):
+    nu = np.asarray(true_anomaly, dtype=float)
+    e = np.asarray(eccentricity, dtype=float)
+    eccentric = 2 * np.arctan2(np.sqrt(1 - e) * np.sin(nu / 2), np.sqrt(1 + e) * np.cos(nu / 2))
+    return (eccentric - e * np.sin(eccentric)) % (2 * np.pi)
+
+
+def mean_to_eccentric_anomaly(mean_anomaly, eccentricity, iterations=8):
+    ''' Newton iteration on Kepler's equation, fixed count so it vectorizes '''
+    M = np.asarray(mean_anomaly, dtype=float) % (2 * np.pi)
+    e = np.asarray(eccentricity, dtype=float)
+    E = np.where(e < 0.8, M, np.pi)
+    for _ in range(iterations):
+        E = E - (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+    return E
+
+
+def mean_to_true_anomaly(mean_anomaly, eccentricity):
+    e = np.asarray(eccentricity, dtype=float)
+    E = mean_to_eccentric_anomaly(mean_anomaly, e)
+    return 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2), np.sqrt(1 - e) * np.cos(E / 2)) % (2 * np.pi)
+
+
+def mean_motion(semi_major_axis, mu):
+    return np.sqrt(mu / np.asarray(semi_major_axis, dtype=float) ** 3)
+
+
+def orbit_normal(inclination, longitude_of_ascending_node):
+    ''' Unit angular momentum vectors, shape (..., 3) '''
+    inc = np.asarray(inclination, dtype=float)
+    lan = np.asarray(longitude_of_ascending_node, dtype=float)
+    return np.stack([np.sin(inc) * np.sin(lan), -np.sin(inc) * np.cos(lan), np.cos(inc)], axis=-1)
+
+
+def perifocal_axes(inclination, longitude_of_ascending_node, argument_of_periapsis):
+    '''
+    Unit vectors towards periapsis (P) and 90 degrees ahead of it in the
+    orbit plane (Q), each shape (..., 3). A position on the orbit is
+    x * P + y * Q with x, y in the orbit plane.
+    '''
+    cos_o, sin_o = np.cos(longitude_of_ascending_node), np.sin(longitude_of_ascending_node)
+    cos_i, sin_i = np.cos(inclination), np.sin(inclination)
+    cos_w, sin_w = np.cos(argument_of_periapsis), np.sin(argument_of_periapsis)
+    P = np.stack([cos_o * cos_w - sin_o * sin_w * cos_i,
+                  sin_o * cos_w + cos_o * sin_w * cos_i,
+                  sin_w * sin_i], axis=-1)
+    Q = np.stack([-cos_o * sin_w - sin_o * cos_w * cos_i,
+                  -sin_o * sin_w + cos_o * cos_w * cos_i,
+                  cos_w * sin_i], axis=-1)
+    return P, Q
+
+
+def position_from_elements(semi_major_axis, eccentricity, inclination,
+                           longitude_of_ascending_node, argument_of_periapsis, mean_anomaly):
+    '''
+    Position relative to the central body, shape (..., 3), in the frame the
+    elements are given in (z along the body's pole).
+    '''
+    a = np.asarray(semi_major_axis, dtype=float)
+    e = np.asarray(eccentricity, dtype=float)
+    E = mean_to_eccentric_anomaly(mean_anomaly, e)
+    x = a * (np.cos(E) - e)
+    y = a * np.sqrt(1 - e ** 2) * np.sin(E)
+    P, Q = perifocal_axes(np.asarray(inclination, dtype=float), np.asarray(longitude_of_ascending_node, dtype=float),
+                          np.asarray(argument_of_periapsis, dtype=float))
+    return x[..., None] * P + y[..., None] * Q
+
+
+def propagate_positions(elements, mu, times):
+    '''
+    Positions of every orbit at every time, shape (len(times), n, 3).
+    elements is a dict (or DataFrame) of arrays with semi_major_axis,
+    eccentricity, inclination, longitude_of_ascending_node,
+    argument_of_periapsis and mean_anomaly at times == 0.
+    '''
+    times = np.asarray(times, dtype=float)[:, None]
+    sma = np.asarray(elements['semi_major_axis'], dtype=float)
+    mean_anomaly = np.asarray(elements['mean_anomaly'], dtype=float) + mean_motion(sma, mu) * times
+    return position_from_elements(sma,
+                                  np.asarray(elements['eccentricity'], dtype=float),
+                                  np.asarray(elements['inclination'], dtype=float),
+                                  np.asarray(elements['longitude_of_ascending_node'], dtype=float),
+                                  np.asarray(elements['argument_of_periapsis'], dtype=float),
+                                  mean_anomaly)
+
+
+def orbit_polylines(semi_major_axis, eccentricity, inclination,
+                    longitude_of_ascending_node, argument_of_periapsis, points=128):
+    '''
+    Closed orbit outlines, shape (n, points, 3), sampled evenly in eccentric
+    anomaly so eccentric orbits keep detail near periapsis. Hyperbolic
+    orbits come back as NaN.
+    '''
+    e = np.asarray(eccentricity, dtype=float)[:, None]
+    E = np.linspace(0, 2 * np.pi, points)[None, :]
+    elliptic = np.where(e < 1, e, np.nan)
+    return position_from_elements(np.asarray(semi_major_axis, dtype=float)[:, None], elliptic,
+                                  np.asarray(inclination, dtype=float)[:, None],
+                                  np.asarray(longitude_of_ascending_node, dtype=float)[:, None],
+                                  np.asarray(argument_of_periapsis, dtype=float)[:, None],
+                                  E - elliptic * np.sin(E))
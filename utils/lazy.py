@@ -0,0 +1,29 @@
+import importlib
+import importlib.util
+import types
+
+
+class LazyModule(types.ModuleType):
+    '''
+    Stand-in that imports the real module on first attribute access and
+    then takes over its namespace. The import goes through the regular
+    import machinery, so concurrent first accesses from stream or worker
+    threads are serialized by the module import lock.
+    '''
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    '''
+    Module that is only executed on first attribute access.
+    Keeps pandas, numpy and tabulate out of the way until a manager
+    actually builds a table, so scripts reach their first RPC quickly.
+
+    pd = lazy_import('pandas')
+    '''
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    return LazyModule(name)
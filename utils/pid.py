@@ -67,7 +67,7 @@ class PID(object):
         self.D = (measure - self.LastMeasure) / (change_in_time)
 
         self.LastMeasure = measure  # store data for next update
-        self.lastTime = now
+        self.LastTime = now
 
         return (self.Kp * self.P) + (self.Ki * self.I) - (self.Kd * self.D)
 
@@ -0,0 +1,242 @@
+import os
+import sys
+import threading
+import time
+
+from krpc.client import Client
+
+KRPC_DIR = os.path.dirname(os.path.abspath(sys.modules[Client.__module__].__file__))
+
+
+class LatencyHistogram():
+    '''
+    HDR style histogram of durations in microseconds.
+
+    Values below 2**bits get one bucket each, above that every power of two
+    is split into 2**(bits - 1) buckets, so the relative error stays below
+    2**(1 - bits) (under 2 % for the default) at a fixed memory cost.
+    '''
+    def __init__(self, bits=7, max_value=2 ** 36):
+        self.bits = bits
+        self.half = 1 << (bits - 1)
+        self.counts = [0] * self.index(max_value)
+        self.max_value = max_value
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def index(self, value):
+        shift = value.bit_length() - self.bits
+        if shift <= 0:
+            return value
+        return (1 << self.bits) + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def bucket_value(self, index):
+        ''' Upper end of a bucket in microseconds '''
+        if index < 1 << self.bits:
+            return index
+        shift, offset = divmod(index - (1 << self.bits), self.half)
+        shift += 1
+        return ((offset + self.half) << shift) + (1 << shift) - 1
+
+    def record(self, seconds):
+        value = min(int(seconds * 1e6), self.max_value - 1)
+        self.counts[self.index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def percentile(self, q):
+        ''' Value at percentile q (0-100) in milliseconds '''
+        if not self.count:
+            return 0.
+        rank = max(1, int(round(q / 100 * self.count)))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(self.bucket_value(i), self.max) / 1e3
+        return self.max / 1e3
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+
+class RPCProfiler():
+    '''
+    Counts and times every kRPC procedure call, stream creation and
+    optionally time.sleep, attributed to the calling manager method.
+
+    The client is patched at class level, so enable it before the managers
+    connect. Connections made while enabled keep a thin wrapper that only
+    checks a flag once the profiler is disabled again.
+
+    from utils.rpc_profiler import profiler
+    profiler.enable()
+    ves = VesselManager()
+    profiler.print_summary()
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.callers = {}
+        self.lock = threading.Lock()
+        self.started = None
+        self.live_thread = None
+
+        self.original_invoke = Client._invoke
+        self.original_add_stream = Client.add_stream
+        self.original_sleep = time.sleep
+
+    def enable(self, sleep=False):
+        ''' Starts recording, sleep=True also records time.sleep calls '''
+        profiler = self
+        invoke, add_stream, original_sleep = self.original_invoke, self.original_add_stream, self.original_sleep
+
+        def instrumented_invoke(client, service, procedure, *args):
+            if not profiler.enabled:
+                return invoke(client, service, procedure, *args)
+            start = time.perf_counter()
+            try:
+                return invoke(client, service, procedure, *args)
+            finally:
+                profiler.record(f'{service}.{procedure}', time.perf_counter() - start)
+
+        def instrumented_add_stream(client, func, *args, **kwargs):
+            if not profiler.enabled:
+                return add_stream(client, func, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return add_stream(client, func, *args, **kwargs)
+            finally:
+                name = args[1] if func is getattr and len(args) > 1 else getattr(func, '__name__', str(func))
+                profiler.record(f'add_stream {name}', time.perf_counter() - start)
+
+        def instrumented_sleep(seconds):
+            start = time.perf_counter()
+            original_sleep(seconds)
+            profiler.record('time.sleep', time.perf_counter() - start)
+
+        Client._invoke = instrumented_invoke
+        Client.add_stream = instrumented_add_stream
+        if sleep:
+            time.sleep = instrumented_sleep
+        self.started = time.perf_counter()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        Client._invoke = self.original_invoke
+        Client.add_stream = self.original_add_stream
+        time.sleep = self.original_sleep
+        self.stop_live()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.started = time.perf_counter()
+
+    def caller(self, code):
+        '''
+        Label for a code object: its qualified name with nested functions
+        folded into the enclosing method, None for kRPC and profiler frames
+        '''
+        if code not in self.callers:
+            filename = os.path.abspath(code.co_filename)
+            if filename.startswith(KRPC_DIR) or filename == os.path.abspath(__file__) \
+                    or filename.startswith('<'):
+                self.callers[code] = None
+            else:
+                name = getattr(code, 'co_qualname', code.co_name).split('.<locals>')[0]
+                if '.' not in name:
+                    name = f'{os.path.splitext(os.path.basename(filename))[0]}.{name}'
+                self.callers[code] = name
+        return self.callers[code]
+
+    def attribute(self):
+        ''' Innermost calling method, or the innermost repo function if no method is on the stack '''
+        frame = sys._getframe(3)
+        fallback = None
+        while frame is not None:
+            name = self.caller(frame.f_code)
+            if name is not None:
+                if 'self' in frame.f_code.co_varnames[:1]:
+                    return name
+                fallback = fallback or name
+            frame = frame.f_back
+        return fallback or '<unknown>'
+
+    def record(self, procedure, seconds):
+        key = (self.attribute(), procedure)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def summary(self, by=None):
+        '''
+        DataFrame of calls and latency percentiles in milliseconds per
+        (caller, procedure), or grouped by 'caller' or 'procedure'
+        '''
+        import pandas as pd
+
+        with self.lock:
+            items = list(self.histograms.items())
+        groups = {}
+        for (caller, procedure), histogram in items:
+            key = (caller, procedure) if by is None else (caller if by == 'caller' else procedure,)
+            if key not in groups:
+                groups[key] = LatencyHistogram()
+            groups[key].merge(histogram)
+
+        rows = [{
+            **dict(zip(['caller', 'procedure'] if by is None else [by], key)),
+            'calls': h.count,
+            'total_ms': h.total / 1e3,
+            'mean_ms': h.total / h.count / 1e3,
+            'p50_ms': h.percentile(50),
+            'p90_ms': h.percentile(90),
+            'p99_ms': h.percentile(99),
+            'max_ms': h.max / 1e3,
+        } for key, h in groups.items()]
+        df = pd.DataFrame(rows)
+        if len(df):
+            df = df.sort_values(by='total_ms', ascending=False).reset_index(drop=True)
+        return df
+
+    def print_summary(self, by=None, n=20):
+        from tabulate import tabulate
+
+        elapsed = time.perf_counter() - self.started if self.started else 0.
+        print(f'RPCProfiler: {elapsed:.1f} s recorded')
+        print(tabulate(self.summary(by).head(n), headers='keys', tablefmt='fancy_grid', floatfmt='.2f'))
+
+    def live(self, interval=5., by='caller', n=20):
+        ''' Prints the summary every interval seconds from a daemon thread '''
+        if self.live_thread is not None:
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.print_summary(by, n)
+
+        self.live_thread = (threading.Thread(target=run, daemon=True), stop)
+        self.live_thread[0].start()
+
+    def stop_live(self):
+        if self.live_thread is not None:
+            self.live_thread[1].set()
+            self.live_thread = None
+
+
+profiler = RPCProfiler()
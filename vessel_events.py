@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+
+import krpc
+
+
+class VesselEventFeed():
+    '''
+    Vessel lifecycle events from stream diffs instead of rescanning sc.vessels.
+
+    One stream watches the vessel list, one the active vessel and, with
+    track_names, one low rate stream per vessel watches its name. Stream
+    callbacks only enqueue, a dispatcher thread diffs against the known
+    fleet and emits vessel_added, vessel_removed, vessel_renamed and
+    vessel_switched events to subscribers.
+
+    feed = VesselEventFeed()
+    feed.subscribe(print, ['vessel_added'])
+    feed.start()
+    '''
+    def __init__(self, track_names=True, rate=10., name_rate=1.):
+        self.conn = krpc.connect(name='VesselEventFeed')
+        self.sc = self.conn.space_center
+        print('VesselEventFeed connected ...')
+
+        self.track_names = track_names
+        self.rate = rate
+        self.name_rate = name_rate
+
+        self.ut = self.conn.add_stream(getattr, self.sc, 'ut')
+        self.ut.rate = rate
+
+        self.names = {}
+        self.name_streams = {}
+        self.active = None
+        self.subscribers = []
+        self.updates = queue.Queue()
+        self.lock = threading.Lock()
+        self.running = False
+        self.dispatcher = None
+        self.streams = []
+
+        # baseline without events
+        for vessel in self.sc.vessels:
+            self.track(vessel)
+        self.active = self.sc.active_vessel
+
+    def subscribe(self, callback, event_types=None):
+        ''' callback(event) for every event, or only for the given event types '''
+        self.subscribers.append((callback, None if event_types is None else set(event_types)))
+
+    def unsubscribe(self, callback):
+        self.subscribers = [(c, t) for c, t in self.subscribers if c is not callback]
+
+    def add_stream(self, key, rate, func, *args):
+        stream = self.conn.add_stream(func, *args)
+        stream.rate = rate
+        stream.add_callback(lambda value, key=key: self.updates.put((key, value)))
+        return stream
+
+    def track(self, vessel):
+        ''' Remembers a vessel and its name, one RPC for the name '''
+        name = vessel.name
+        with self.lock:
+            self.names[vessel] = name
+        if self.track_names and self.running:
+            self.name_streams[vessel] = self.add_stream(('name', vessel), self.name_rate, getattr, vessel, 'name')
+        return name
+
+    def untrack(self, vessel):
+        stream = self.name_streams.pop(vessel, None)
+        if stream is not None:
+            stream.remove()
+        with self.lock:
+            return self.names.pop(vessel, None)
+
+    def named(self, name, exact=True):
+        ''' Known vessels by name, from the cache without RPCs '''
+        with self.lock:
+            return [v for v, n in self.names.items() if (n == name if exact else name in n)]
+
+    def apply(self, key, value):
+        ''' Folds one update into the fleet model, returns a list of events '''
+        kind = key[0] if isinstance(key, tuple) else key
+        events = []
+        if kind == 'vessels':
+            current = dict.fromkeys(value)
+            with self.lock:
+                known = list(self.names)
+            for vessel in current:
+                if vessel not in self.names:
+                    events.append({'type': 'vessel_added', 'vessel': vessel, 'name': self.track(vessel)})
+            for vessel in known:
+                if vessel not in current:
+                    events.append({'type': 'vessel_removed', 'vessel': vessel, 'name': self.untrack(vessel)})
+
+        elif kind == 'active':
+            if value != self.active:
+                old, self.active = self.active, value
+                events.append({'type': 'vessel_switched', 'vessel': value, 'name': self.names.get(value),
+                               'old': old, 'new': value})
+
+        elif kind == 'name':
+            vessel = key[1]
+            with self.lock:
+                old = self.names.get(vessel)
+                if old is None or old == value:
+                    return events
+                self.names[vessel] = value
+            events.append({'type': 'vessel_renamed', 'vessel': vessel, 'name': value, 'old': old, 'new': value})
+        return events
+
+    def emit(self, event):
+        for callback, types in self.subscribers:
+            if types is None or event['type'] in types:
+                callback(event)
+
+    def dispatch(self):
+        while self.running:
+            try:
+                key, value = self.updates.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            for event in self.apply(key, value):
+                event['ut'] = self.ut()
+                self.emit(event)
+
+    def start(self):
+        ''' Starts streaming and the dispatcher thread, events are emitted from there '''
+        if self.running:
+            return
+        self.running = True
+        self.streams = [
+            self.add_stream('vessels', self.rate, getattr, self.sc, 'vessels'),
+            self.add_stream('active', self.rate, getattr, self.sc, 'active_vessel'),
+        ]
+        if self.track_names:
+            for vessel in list(self.names):
+                self.name_streams[vessel] = self.add_stream(('name', vessel), self.name_rate,
+                                                            getattr, vessel, 'name')
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def stop(self):
+        self.running = False
+        if self.dispatcher is not None:
+            self.dispatcher.join()
+        for stream in self.streams + list(self.name_streams.values()):
+            stream.remove()
+        self.streams = []
+        self.name_streams = {}
+
+    def wait_for(self, event_type, predicate=None, timeout=None):
+        '''
+        Blocks until the next event of event_type (matching predicate)
+        and returns it, None on timeout. Must not be called from a subscriber.
+        '''
+        found = queue.Queue()
+
+        def callback(event):
+            if predicate is None or predicate(event):
+                found.put(event)
+
+        self.subscribe(callback, [event_type])
+        try:
+            return found.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        finally:
+            self.unsubscribe(callback)
+
+    def watch(self):
+        ''' Prints events until interrupted '''
+        self.subscribe(lambda e: print(f"[UT {e['ut']:.0f}] {e['type']}: {e['name']}"))
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
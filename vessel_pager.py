@@ -0,0 +1,153 @@
+import krpc
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+
+from orbits import ORBIT_ATTRIBUTES
+from vessels import VesselManager
+
+
+class VesselPager():
+    '''
+    Server side paging and sorting of the vessel table.
+
+    The index of the whole fleet is just vessels and names. Orbit streams
+    are only open for the rows of the current page plus prefetch rows on
+    either side, rows that leave that window lose their streams, so server
+    load follows the page size and not the fleet size.
+
+    Sorting by name uses the index. Sorting by an orbit column reads that
+    one attribute once per vessel without streams; values of streamed rows
+    refresh the sort keys whenever the page is read.
+
+    pager = VesselPager(page_size=10)
+    pager.sort('semi_major_axis')
+    pager.next_page()
+    pager.rows()
+    '''
+    def __init__(self, name='', page_size=10, prefetch=5, orbit_flag=True, feed=None, conn=None):
+        self.conn = krpc.connect(name='VesselPager') if conn is None else conn
+        self.sc = self.conn.space_center
+        print('VesselPager connected ...')
+
+        # a running VesselEventFeed keeps the name index current without rescans
+        self.feed = feed
+        self.manager = VesselManager(vessel_list=[], orbit_flag=orbit_flag, conn=self.conn)
+        self.columns = ['name'] + (['body'] + list(ORBIT_ATTRIBUTES) if orbit_flag else [])
+
+        self.name = name
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.page = 0
+        self.sort_column = 'name'
+        self.ascending = True
+
+        self.names = {}
+        self.sort_keys = {}
+        self.order = []
+        self.reload()
+
+    # index
+
+    def reload(self):
+        ''' Rescans vessel names and sort keys, one RPC per vessel each and no streams '''
+        if self.feed is not None:
+            with self.feed.lock:
+                self.names = dict(self.feed.names)
+        else:
+            self.names = {v: v.name for v in self.sc.vessels}
+        self.sort_keys = {}
+        self.reorder()
+
+    def search(self, name):
+        ''' Only vessels whose name contains name, back to the first page '''
+        self.name = name
+        self.page = 0
+        self.reorder()
+
+    def sort(self, column='name', ascending=True):
+        self.sort_column = column
+        self.ascending = ascending
+        self.page = 0
+        self.reorder()
+
+    def reorder(self):
+        vessels = [v for v, n in self.names.items() if self.name in n]
+        if self.sort_column == 'name':
+            keys = self.names
+        else:
+            keys = self.load_sort_keys(self.sort_column, vessels)
+        # vessels without a key, e.g. gone since the scan, go last either way
+        known = sorted((v for v in vessels if keys.get(v) is not None),
+                       key=lambda v: keys[v], reverse=not self.ascending)
+        self.order = known + [v for v in vessels if keys.get(v) is None]
+        self.page = min(self.page, self.pages() - 1)
+        self.sync()
+
+    def load_sort_keys(self, column, vessels):
+        ''' One unstreamed read of column for vessels without a cached key '''
+        keys = self.sort_keys.setdefault(column, {})
+        for v in vessels:
+            if v in keys:
+                continue
+            try:
+                if column == 'body':
+                    keys[v] = v.orbit.body.name
+                else:
+                    keys[v] = getattr(v.orbit, ORBIT_ATTRIBUTES[column])
+            except Exception:
+                keys[v] = None
+        return keys
+
+    # viewport
+
+    def pages(self):
+        return max(1, -(-len(self.order) // self.page_size))
+
+    def go_to(self, page):
+        self.page = min(max(page, 0), self.pages() - 1)
+        self.sync()
+
+    def next_page(self):
+        self.go_to(self.page + 1)
+
+    def previous_page(self):
+        self.go_to(self.page - 1)
+
+    def visible(self):
+        start = self.page * self.page_size
+        return self.order[start:start + self.page_size]
+
+    def window(self):
+        ''' Visible rows plus prefetch rows before and after '''
+        start = self.page * self.page_size
+        return self.order[max(start - self.prefetch, 0):start + self.page_size + self.prefetch]
+
+    def sync(self):
+        ''' Opens streams for rows entering the window, closes them for rows leaving it '''
+        window = self.window()
+        keep = set(window)
+        self.manager.remove_vessels([v for v in self.manager.vessel_list if v not in keep])
+        self.manager.add_vessels(window)
+
+    def rows(self):
+        ''' Evaluated dataframe of the visible rows, streamed values also refresh sort keys '''
+        visible = [v for v in self.visible() if v in self.manager.vessels]
+        if self.manager.df is None or not visible:
+            return pd.DataFrame(index=pd.Index([], name='vessel'), columns=self.columns)
+        df = self.manager.df.loc[visible]
+        df = df.apply(lambda x: x.apply(lambda y: y() if callable(y) else y))
+        for column, keys in self.sort_keys.items():
+            if column in df.columns:
+                keys.update(df[column].items())
+        return df
+
+    def streamed(self):
+        ''' Number of vessels with open streams '''
+        return len(self.manager.vessel_list)
+
+    def status(self):
+        return (f'page {self.page + 1}/{self.pages()}, {len(self.order)} vessels, '
+                f'{self.streamed()} streamed')
+
+    def close(self):
+        self.manager.remove_vessels(list(self.manager.vessel_list))
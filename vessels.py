@@ -1,10 +1,9 @@
 import time
 
 import krpc
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import tabulate
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+tabulate = lazy_import('tabulate')
 
 from orbits import Orbit
 from nodes import Node
@@ -18,8 +17,9 @@ from utils.handle_vessels import (
     switch_vessel,
 )
 class VesselManager():
-    def __init__(self, name=None, vessel_list=None, orbit_flag=False, node_flag=False, exact_name=False, instance_name='VesselManager'):
-        self.conn = krpc.connect(name="VesselManager")
+    def __init__(self, name=None, vessel_list=None, orbit_flag=False, node_flag=False, exact_name=False, instance_name='VesselManager', conn=None):
+        # conn lets a Fleet point the manager at another server
+        self.conn = krpc.connect(name="VesselManager") if conn is None else conn
         self.sc = self.conn.space_center
 
         self.orbit_flag = orbit_flag
@@ -28,19 +28,51 @@ class VesselManager():
         self.exact_name = exact_name
 
         if vessel_list is None and name is None:
-            self.vessel_list = self.sc.vessels
-        elif vessel_list is not None:
-            self.vessel_list = vessel_list
-        else:
-            self.vessel_list = self.search_by_name(name=name)
+            vessel_list = self.sc.vessels
+        elif vessel_list is None:
+            vessel_list = self.search_by_name(name=name)
 
-        self.df = self.setup_df()
+        # Vessel objects by vessel, they own the streams of their rows
+        self.vessels = {}
+        self.vessel_list = []
+        self.df = None
+        self.df = self.setup_df(vessel_list)
 
-    def setup_df(self):
+    def setup_df(self, vessel_list=None):
         ''' Returns a dataframe of Vessel objects '''
-        self.df = pd.concat([Vessel(v, orbit_flag=self.orbit_flag, node_flag=self.node_flag, conn=self.conn).df for v in self.vessel_list])
+        vessel_list = list(self.vessel_list if vessel_list is None else vessel_list)
+        self.remove_vessels(list(self.vessels))
+        self.df = None
+        self.add_vessels(vessel_list)
         return self.df
 
+    def add_vessels(self, vessels):
+        '''
+        Adds rows for vessels that are not tracked yet, existing rows and
+        their streams are left alone. Returns the new rows.
+        '''
+        new = [v for v in dict.fromkeys(vessels) if v not in self.vessels]
+        for v in new:
+            self.vessels[v] = Vessel(v, orbit_flag=self.orbit_flag, node_flag=self.node_flag, conn=self.conn)
+        self.vessel_list.extend(new)
+
+        rows = pd.concat([self.vessels[v].df for v in new]) if new else None
+        if self.df is None:
+            self.df = rows
+        elif rows is not None:
+            self.df = pd.concat([self.df, rows])
+        return rows
+
+    def remove_vessels(self, vessels):
+        ''' Drops the rows of vessels and removes their streams '''
+        gone = [v for v in dict.fromkeys(vessels) if v in self.vessels]
+        for v in gone:
+            self.vessels.pop(v).remove_streams()
+        self.vessel_list = [v for v in self.vessel_list if v not in gone]
+        if self.df is not None and gone:
+            self.df = self.df.drop(index=gone)
+        return gone
+
     def search_by_name(self, name='*'):
         if self.exact_name:
             self.vessel_list = [v for v in self.sc.vessels if name == v.name]
@@ -73,9 +105,13 @@ class Vessel():
             self.orbit = Orbit(self.vessel, conn=self.conn)
             self.df = pd.merge(self.df, self.orbit.df, how='inner', left_index=True, right_index=True)
         if node_flag:
-            self.node = Node(self.vessel)
+            self.node = Node(self.vessel, conn=self.conn)
             self.df = pd.merge(self.df, self.node.df, how='inner', left_index=True, right_index=True)
 
+    def remove_streams(self):
+        if hasattr(self, 'orbit'):
+            self.orbit.remove_streams()
+
     def setup_df(self):
         """ Returns a dataframe of vessel attributes """
         df = pd.DataFrame([{